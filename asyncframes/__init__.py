@@ -5,22 +5,27 @@
 import abc
 import collections
 import collections.abc
+import concurrent.futures
 import datetime
 import enum
 import inspect
 import logging
+import math
 import sys
 import threading
+import time
+import types
 import os
 import queue
 import warnings
 
 
 __all__ = [
-    'all_', 'animate', 'any_', 'Awaitable', 'AbstractEventLoop', 'Event',
-    'find_parent', 'Frame', 'FrameMeta', 'FrameStartupBehaviour',
-    'FreeEventArgs', 'get_current_eventloop_index', 'InvalidOperationException',
-    'hold', 'PFrame', 'Primitive', 'sleep'
+    'all_', 'animate', 'any_', 'as_completed', 'Awaitable', 'AbstractEventLoop', 'Batcher', 'Channel',
+    'ChannelClosedException', 'ConcurrencyLimit', 'deadline', 'Event', 'EventRouter', 'every', 'find_parent', 'first_n',
+    'Frame', 'FrameExecutor', 'FrameMeta', 'FrameStartupBehaviour', 'FreeEventArgs', 'get_current_eventloop_index',
+    'InvalidOperationException', 'hold', 'LRU', 'PFrame', 'pipeline', 'pmap', 'pmap_unordered', 'Primitive', 'race',
+    'RateLimiter', 'sleep', 'Stage', 'StageStats', 'timeout'
 ]
 __version__ = '2.2.0'
 
@@ -29,6 +34,8 @@ class ThreadLocals(threading.local):
     def __init__(self):
         self.__dict__['_current_eventloop'] = None
         self.__dict__['_current_frame'] = None
+        self.__dict__['_worklist'] = None
+        self.__dict__['_inline_depth'] = 0
 _THREAD_LOCALS = ThreadLocals()
 
 class FrameStartupBehaviour(enum.Enum):
@@ -85,8 +92,117 @@ class _AtomicCounter(object):
             if self._value != 0: return
         self.on_zero(*self.on_zero_args)
 
+class _Timer(object):
+    """A delayed callback that can be cancelled before it expires.
+
+    The backend handle of the timer is only accessed from the eventloop that runs the timer, so timers don't need a lock.
+
+    Args:
+        eventloop (AbstractEventLoop): The eventloop that runs the timer.
+        callback (function): The function to be called when the timer expires.
+        args (tuple): The arguments to pass to the callback.
+        timers (set, optional): Defaults to None. A set of pending timers of the owner of this timer.
+            The timer is part of the set until it expires or is cancelled.
+    """
+
+    def __init__(self, eventloop, callback, args, timers=None):
+        self.eventloop = eventloop
+        self.callback = callback
+        self.args = args
+        self.timers = timers
+        self.handle = None
+        self.cancelled = False
+        if timers is not None:
+            timers.add(self)
+
+    def _start(self, deadline):
+        if not self.cancelled:
+            if self.timers is not None:
+                self.timers.add(self)
+            self.handle = self.eventloop._post(max(0.0, deadline - time.monotonic()), self._fire, ())
+
+    def restart(self, deadline):
+        """Schedule the expired timer again, reusing its registration. This function is threadsafe.
+
+        Args:
+            deadline (float): The time, as returned by :func:`time.monotonic`, at which the timer expires.
+        """
+
+        if _THREAD_LOCALS._current_eventloop == self.eventloop:
+            self._start(deadline)
+        else:
+            self.eventloop._invoke(0, self._start, (deadline,))
+
+    def _fire(self):
+        self.handle = None
+        if self.timers is not None:
+            self.timers.discard(self)
+        if not self.cancelled:
+            self.callback(*self.args)
+
+    def cancel(self):
+        """Cancel the timer and release its backend handle. This function is threadsafe."""
+
+        self.cancelled = True
+        if self.timers is not None:
+            self.timers.discard(self)
+        if _THREAD_LOCALS._current_eventloop == self.eventloop:
+            self._release()
+        else:
+            self.eventloop._invoke(0, self._release, ())
+
+    def _release(self):
+        if self.handle is not None:
+            self.eventloop._cancel(self.handle)
+            self.handle = None
+
+class _Submission(object):
+    """Passes the result of a frame started with :meth:`AbstractEventLoop.submit` to a concurrent.futures.Future."""
+
+    def __init__(self, eventloop, future):
+        self.eventloop = eventloop
+        self.future = future
+        self._eventloop_affinity = None
+
+    def start(self, factory, frameargs, framekwargs):
+        try:
+            if isinstance(factory, Frame.Factory) and factory.cache is None:
+                frame = factory._create(frameargs, framekwargs, self._handle_exception)
+            else: # If factory returns a shared frame or another awaitable, ...
+                # Await it from a frame that hands exceptions to the future
+                frame = _await_submission._create((factory, frameargs, framekwargs), {}, self._handle_exception)
+        except Exception as err:
+            self.eventloop._complete(self.future, exception=err)
+            return
+
+        # Start listening before checking whether the frame finished, since frames can finish on other threads
+        frame._listeners.add(self)
+        if frame:
+            try:
+                frame._listeners.remove(self)
+            except KeyError:
+                pass # The finishing thread already woke this listener
+            else:
+                self.eventloop._complete(self.future, frame._result)
+
+    def process(self, sender, msg, process_counter=None, blocking=False):
+        self.eventloop._complete(self.future, msg)
+        if process_counter:
+            process_counter.sub(1)
+
+    def _handle_exception(self, frame, err):
+        # Submitted frames don't have a parent, so unhandled exceptions fail the future instead of stopping the eventloop
+        self.eventloop._complete(self.future, exception=err)
+
 class AbstractEventLoop(metaclass=abc.ABCMeta):
-    """Abstract base class of event loops."""
+    """Abstract base class of event loops.
+
+    Attributes:
+        max_inline_depth (int): The maximum number of nested listeners resumed inline by non-blocking events.
+            Listeners beyond this depth are enqueued on the eventloop. Set to 0 to always enqueue listeners.
+    """
+
+    max_inline_depth = 16
 
     @abc.abstractmethod
     def _run(self):
@@ -141,10 +257,27 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
             delay (float): The time to wait before executing the callback.
             callback (function): The function to be called.
             args (tuple): The arguments to pass to the callback.
+
+        Returns:
+            A handle that can be passed to :meth:`AbstractEventLoop._cancel`, or None.
         """
 
         raise NotImplementedError # pragma: no cover
 
+    def _cancel(self, handle):
+        """Cancel a callback that was scheduled with :meth:`AbstractEventLoop._post`.
+
+        The concrete eventloop class should overwrite this method to release the callback from its timer queue.
+        By default, cancelled callbacks stay scheduled and are ignored when they expire.
+
+        This function is **not** threadsafe. It is only called from the thread that this eventloop was started on.
+
+        Args:
+            handle: The handle returned by :meth:`AbstractEventLoop._post`.
+        """
+
+        pass
+
     @abc.abstractmethod
     def _invoke(self, delay, callback, args):
         """Execute the given callback after ``delay`` seconds.
@@ -196,6 +329,10 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
         self._eventloop_affinity = self
         self._result = None
         self._exception = None
+        self._animation_drivers = {}
+        self._submit_lock = threading.Lock()
+        self._submissions = None # Submitted frames that haven't been started yet or None while not running
+        self._submitted = set() # Futures of submitted frames that haven't finished yet
 
     def run(self, frame, *frameargs, num_threads=0, **framekwargs):
         if num_threads <= 0:  # If no specific number of threads was requested, ...
@@ -240,6 +377,9 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
         self._idle = False
         self._result = None
         self._exception = None
+        self._animation_drivers = {} # Drivers of the previous run lost their pending ticks when the eventloop was cleared
+        with self._submit_lock:
+            self._submissions = [] # Accept submissions from other threads
 
         try:
             mainframe = frame(*frameargs, **framekwargs)
@@ -264,6 +404,14 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
                 except queue.Empty:
                     break
 
+            # Fail submitted frames that didn't finish
+            with self._submit_lock:
+                self._submissions = None
+                submitted, self._submitted = self._submitted, set()
+            for future in submitted:
+                if not future.cancel(): # If the frame was already started, ...
+                    future.set_exception(InvalidOperationException("The event loop stopped before the frame finished"))
+
             # Clear main eventloop
             self._clear()
             self._idle = True
@@ -272,7 +420,81 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
             for eventloop in self.eventloops[1:]: eventloop._invoke(0, eventloop._stop, ())
             for worker in workers: self._jointhread(worker)
 
-    def _enqueue(self, delay, callback, args, eventloop_affinity=None):
+    def submit(self, factory, *frameargs, **framekwargs):
+        """Start a frame on this running event loop. This function is threadsafe.
+
+        Unlike calling a frame factory, submitting a frame works from threads that don't run an eventloop, for example
+        the request handler threads of a web server. Submissions that arrive before the eventloop picked up earlier
+        submissions are started together, with a single wakeup of the eventloop.
+
+        Example: ::
+
+            # On a web server thread
+            future = loop.submit(render_page, request)
+            response = future.result(timeout=5)
+
+        Args:
+            factory (Callable): The frame factory to call, or any callable that returns an awaitable.
+            *frameargs: Positional arguments to pass to `factory`.
+            **framekwargs: Keyword arguments to pass to `factory`.
+
+        Returns:
+            concurrent.futures.Future: A future for the result of the frame. If the frame or one of its child frames
+                raises an unhandled exception, the future fails with that exception instead of stopping the event loop.
+                The futures of frames that are still running when the event loop stops fail with
+                InvalidOperationException.
+
+        Raises:
+            InvalidOperationException: Raised when this event loop isn't running.
+        """
+
+        future = concurrent.futures.Future()
+        with self._submit_lock:
+            if self._submissions is None:
+                raise InvalidOperationException("Can't submit frames without a running event loop")
+            self._submissions.append((future, factory, frameargs, framekwargs))
+            self._submitted.add(future)
+            wakeup = len(self._submissions) == 1
+        if wakeup: # If this submission started a new batch, ...
+            self._invoke(0, self._start_submissions, ())
+        return future
+
+    def _start_submissions(self):
+        with self._submit_lock:
+            submissions = self._submissions
+            if not submissions:
+                return
+            self._submissions = []
+
+        currentframe = _THREAD_LOCALS._current_frame
+        _THREAD_LOCALS._current_frame = None # Submitted frames don't have a parent
+        try:
+            for future, factory, frameargs, framekwargs in submissions:
+                if future.set_running_or_notify_cancel():
+                    _Submission(self, future).start(factory, frameargs, framekwargs)
+                else: # If the future was cancelled before the frame was started, ...
+                    with self._submit_lock:
+                        self._submitted.discard(future)
+        finally:
+            _THREAD_LOCALS._current_frame = currentframe
+
+    def _complete(self, future, result=None, exception=None):
+        """Set the result or exception of the future of a submitted frame, unless the future already completed."""
+
+        with self._submit_lock:
+            try:
+                self._submitted.remove(future)
+            except KeyError:
+                return # The future already completed or failed when the event loop stopped
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def _enqueue(self, delay, callback, args, eventloop_affinity=None, timers=None):
+        if delay > 0.0:
+            return self._start_timer(delay, callback, args, eventloop_affinity, timers)
+
         if len(self.eventloops) == 1: # If running singlethreaded, ...
             # Execute callback from current eventloop
             if _THREAD_LOCALS._current_eventloop == self:
@@ -286,23 +508,102 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
             else:
                 eventloop_affinity._invoke(delay, callback, args)
         else: # If no target eventloop was provided, ...
-            if delay > 0.0:
-                # Call _enqueue again with 0 delay after 'delay' seconds
-                #TODO: Consider running a dedicated event loop instead of eventloops[-1] for delays
-                if _THREAD_LOCALS._current_eventloop == self.eventloops[-1]:
-                    self.eventloops[-1]._post(delay, self.eventloops[-1]._enqueue, (0.0, callback, args))
+            # Place the callback on the event queue
+            self.event_queue.put((callback, args))
+
+            # Wake up an idle event (if any)
+            for eventloop in self.eventloops:
+                if eventloop._idle:
+                    eventloop._idle = False
+                    eventloop._invoke(0, eventloop._dequeue, ())
+                    break
+
+    def _start_timer(self, delay, callback, args, eventloop_affinity=None, timers=None):
+        """Execute the given callback after ``delay`` seconds.
+
+        Like :meth:`AbstractEventLoop._enqueue`, the callback runs on `eventloop_affinity` or, if None, on any eventloop.
+
+        Args:
+            delay (float): The time to wait before executing the callback.
+            callback (function): The function to be called.
+            args (tuple): The arguments to pass to the callback.
+            eventloop_affinity (AbstractEventLoop, optional): Defaults to None. The eventloop to execute the callback on.
+            timers (set, optional): Defaults to None. A set of pending timers to add the timer to until it expires.
+
+        Returns:
+            _Timer: A timer that can be cancelled before it expires.
+        """
+
+        if len(self.eventloops) == 1: # If running singlethreaded, ...
+            eventloop = self
+        elif eventloop_affinity: # If a target eventloop was provided, ...
+            eventloop = eventloop_affinity
+        else: # If no target eventloop was provided, ...
+            # Call _enqueue again with 0 delay after 'delay' seconds
+            #TODO: Consider running a dedicated event loop instead of eventloops[-1] for delays
+            eventloop = self.eventloops[-1]
+            callback, args = eventloop._enqueue, (0.0, callback, args)
+
+        timer = _Timer(eventloop, callback, args, timers)
+        if _THREAD_LOCALS._current_eventloop == eventloop:
+            timer.handle = eventloop._post(delay, timer._fire, ())
+        else:
+            eventloop._invoke(0, timer._start, (time.monotonic() + delay,))
+        return timer
+
+    def _wakeup(self, listeners, sender, msg, inline=True):
+        """Wake up the listeners of a non-blocking event.
+
+        Listeners that would be dispatched to this eventloop are resumed inline instead of taking a round trip through
+        the eventloop backend. To preserve fairness, inline resumption is limited to :attr:`max_inline_depth` nested
+        wakeups per thread. All other listeners are enqueued, with one invoke per foreign eventloop.
+
+        Args:
+            listeners (Iterable[Awaitable]): The listeners to wake up.
+            sender (Awaitable): The source of the event.
+            msg: The event arguments.
+            inline (bool, optional): Defaults to True. If False, all listeners are enqueued.
+        """
+
+        if len(self.eventloops) > 1:
+            # Wake up listeners of other eventloops first, with one invoke per eventloop
+            foreign_listeners = None
+            local_listeners = []
+            for listener in listeners:
+                eventloop_affinity = listener._eventloop_affinity
+                if eventloop_affinity is not None and eventloop_affinity != self:
+                    if foreign_listeners is None:
+                        foreign_listeners = collections.defaultdict(list)
+                    foreign_listeners[eventloop_affinity].append(listener)
                 else:
-                    self.eventloops[-1]._invoke(delay, self.eventloops[-1]._enqueue, (0.0, callback, args))
-            else: # If delay == 0, ...
-                # Place the callback on the event queue
-                self.event_queue.put((callback, args))
-
-                # Wake up an idle event (if any)
-                for eventloop in self.eventloops:
-                    if eventloop._idle:
-                        eventloop._idle = False
-                        eventloop._invoke(0, eventloop._dequeue, ())
-                        break
+                    local_listeners.append(listener)
+            if foreign_listeners is not None:
+                for eventloop, batch in foreign_listeners.items():
+                    eventloop._invoke(0, AbstractEventLoop._process_batch, (batch, sender, msg))
+            listeners = local_listeners
+
+        error = None
+        for listener in listeners:
+            eventloop_affinity = listener._eventloop_affinity
+            if inline and _THREAD_LOCALS._inline_depth < self.max_inline_depth and (
+                    eventloop_affinity == self or
+                    (eventloop_affinity is None and (len(self.eventloops) == 1 or not isinstance(listener, Frame)))):
+                # Resume listener inline
+                currentframe = _THREAD_LOCALS._current_frame
+                _THREAD_LOCALS._inline_depth += 1
+                try:
+                    listener.process(sender, msg)
+                except BaseException as err:
+                    if error is None:
+                        error = err # Delay raising the exception until all listeners have been woken
+                finally:
+                    _THREAD_LOCALS._inline_depth -= 1
+                    _THREAD_LOCALS._current_frame = currentframe
+            else:
+                self._enqueue(0, listener.process, (sender, msg), eventloop_affinity)
+
+        if error is not None:
+            raise error
 
     def _dequeue(self):
         try:
@@ -318,6 +619,10 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
 
     @staticmethod
     def sendevent(eventsource, event, process_counter=None, blocking=False):
+        if blocking:
+            AbstractEventLoop._trampoline([(eventsource, eventsource, event, process_counter)])
+            return
+
         # Save current frame, since it will be modified inside Awaitable.process()
         currentframe = _THREAD_LOCALS._current_frame
 
@@ -327,8 +632,104 @@ class AbstractEventLoop(metaclass=abc.ABCMeta):
             # Restore current frame
             _THREAD_LOCALS._current_frame = currentframe
 
+    @staticmethod
+    def _trampoline(stack):
+        """Process blocking events and all blocking events they cause on the current thread.
+
+        Instead of recursively calling `process()` for every woken listener, listeners are collected in a
+        per-thread work list (see :meth:`AbstractEventLoop._dispatch`) and processed iteratively in depth-first order.
+        This function only returns once the work list is empty, so the events have been fully processed on this thread.
+
+        Args:
+            stack (list): The events to process as (awaitable, sender, msg, process_counter) tuples, where `awaitable`
+                processes the event and `process_counter` determins when the event has been fully processed.
+                Events are processed from the end of the list.
+        """
+
+        # Save current frame and work list, since both will be modified while processing the event
+        currentframe = _THREAD_LOCALS._current_frame
+        outer_worklist = _THREAD_LOCALS._worklist
+
+        error = None
+        try:
+            while stack:
+                awaitable, sender, msg, process_counter = stack.pop()
+                worklist = _THREAD_LOCALS._worklist = []
+                try:
+                    awaitable.process(sender, msg, process_counter, True)
+                except BaseException as err:
+                    if error is None:
+                        error = err # Delay raising the exception until all listeners have been processed
+                # Push listeners in reverse order, so that they are processed in the order they were dispatched
+                stack.extend(reversed(worklist))
+        finally:
+            # Restore current frame and work list
+            _THREAD_LOCALS._worklist = outer_worklist
+            _THREAD_LOCALS._current_frame = currentframe
+
+        if error is not None:
+            raise error
+
+    @staticmethod
+    def _dispatch(listener, sender, msg, process_counter):
+        """Process a blocking event on the current thread without nesting stack frames.
+
+        If a blocking event is already being processed on this thread, `listener` is added to the work list of the active
+        trampoline. Otherwise a new trampoline is started.
+
+        Args:
+            listener (Awaitable): The awaitable to process the event.
+            sender (Awaitable): The source of the event.
+            msg: The event arguments.
+            process_counter (_AtomicCounter): A thread-safe counter that determins when an event has been fully processed.
+        """
+
+        worklist = _THREAD_LOCALS._worklist
+        if worklist is not None:
+            worklist.append((listener, sender, msg, process_counter))
+        else:
+            AbstractEventLoop._trampoline([(listener, sender, msg, process_counter)])
+
+    @staticmethod
+    def _dispatch_batch(listeners, sender, msg, process_counter):
+        """Process a blocking event for a batch of listeners that were invoked on this eventloop together.
+
+        Args:
+            listeners (list): The awaitables to process the event.
+            sender (Awaitable): The source of the event.
+            msg: The event arguments.
+            process_counter (_AtomicCounter): A thread-safe counter that determins when an event has been fully processed.
+        """
+
+        AbstractEventLoop._trampoline([(listener, sender, msg, process_counter) for listener in reversed(listeners)])
+
+    @staticmethod
+    def _process_batch(listeners, sender, msg):
+        """Process a non-blocking event for a batch of listeners that were invoked on this eventloop together.
+
+        Args:
+            listeners (list): The awaitables to process the event.
+            sender (Awaitable): The source of the event.
+            msg: The event arguments.
+        """
+
+        currentframe = _THREAD_LOCALS._current_frame
+        error = None
+        for listener in listeners:
+            try:
+                listener.process(sender, msg)
+            except BaseException as err:
+                if error is None:
+                    error = err # Delay raising the exception until all listeners have been woken
+            finally:
+                _THREAD_LOCALS._current_frame = currentframe
+
+        if error is not None:
+            raise error
+
     def postevent(self, eventsource, event, delay=0):
-        self._enqueue(delay, AbstractEventLoop.sendevent, (eventsource, event, None, False), eventsource._eventloop_affinity)
+        self._enqueue(delay, AbstractEventLoop.sendevent, (eventsource, event, None, False), eventsource._eventloop_affinity,
+                      getattr(eventsource, '_timers', None))
 
     def process(self, sender, msg, process_counter=None, blocking=False):
         self._result = msg
@@ -380,27 +781,14 @@ class Awaitable(collections.abc.Awaitable):
 
         # Remove self from parent frame
         if self._parent is not None:
-            self._parent._children.remove(self)
+            children = self._parent._children
+            if children and children[-1] is self: # Frames remove their children from the end, so avoid searching the list
+                children.pop()
+            else:
+                children.remove(self)
 
         if self.lifebound:
-            # Wake up listeners
-            self.fired = True
-            if self._listeners:
-                listeners = self._listeners
-                self._listeners = set()
-
-                if blocking:
-                    if process_counter:
-                        process_counter.add(len(listeners))
-
-                    for listener in listeners:
-                        if listener._eventloop_affinity is None or listener._eventloop_affinity == _THREAD_LOCALS._current_eventloop:
-                            listener.process(self, self._result, process_counter, blocking)
-                        else:
-                            listener._eventloop_affinity._invoke(0, listener.process, (self, self._result, process_counter, blocking))
-                else:
-                    for listener in listeners:
-                        _THREAD_LOCALS._current_eventloop._enqueue(0, listener.process, (self, self._result), listener._eventloop_affinity)
+            self._wake_listeners(process_counter, blocking, inline=False)
 
         self._ondispose()
         del self
@@ -409,6 +797,60 @@ class Awaitable(collections.abc.Awaitable):
             process_counter.sub(1)
         return
 
+    def _wake_listeners(self, process_counter, blocking, inline=True):
+        """Mark this awaitable as fired and wake up all listeners.
+
+        Args:
+            process_counter (_AtomicCounter): A thread-safe counter that determins when an event has been fully processed.
+            blocking (bool): If True, listeners are processed before the event is considered processed.
+            inline (bool, optional): Defaults to True. If False, listeners of non-blocking events are always enqueued.
+        """
+
+        self.fired = True
+        if self._listeners:
+            listeners = self._listeners
+            self._listeners = set()
+
+            if blocking:
+                if process_counter:
+                    process_counter.add(len(listeners))
+
+                foreign_listeners = None
+                for listener in listeners:
+                    if listener._eventloop_affinity is None or listener._eventloop_affinity == _THREAD_LOCALS._current_eventloop:
+                        AbstractEventLoop._dispatch(listener, self, self._result, process_counter)
+                    else:
+                        # Collect listeners of other eventloops, to wake up each eventloop only once
+                        if foreign_listeners is None:
+                            foreign_listeners = collections.defaultdict(list)
+                        foreign_listeners[listener._eventloop_affinity].append(listener)
+
+                if foreign_listeners is not None:
+                    for eventloop, batch in foreign_listeners.items():
+                        eventloop._invoke(0, AbstractEventLoop._dispatch_batch, (batch, self, self._result, process_counter))
+            else:
+                _THREAD_LOCALS._current_eventloop._wakeup(listeners, self, self._result, inline)
+
+    def _remove_finished(self, process_counter, blocking):
+        """Remove this awaitable after it finished processing an event.
+
+        Listeners of non-blocking events are detached before removal and woken afterwards with :meth:`_wake_listeners`,
+        so that listeners resumed inline never run while this awaitable is still being removed.
+
+        Args:
+            process_counter (_AtomicCounter): A thread-safe counter that determins when an event has been fully processed.
+            blocking (bool): If True, listeners are processed before the event is considered processed.
+        """
+
+        if process_counter:
+            process_counter.add(1)
+        if blocking:
+            self._remove(process_counter, blocking)
+        else:
+            listeners, self._listeners = self._listeners, set()
+            self._remove(process_counter, blocking)
+            self._listeners.update(listeners)
+
     def remove(self):
         """Remove this awaitable from the frame hierarchy.
 
@@ -508,28 +950,9 @@ class Awaitable(collections.abc.Awaitable):
                             maineventloop._eventloop_affinity._invoke(0, maineventloop._stop, ())
 
             if self.singleshot:
-                if process_counter:
-                    process_counter.add(1)
-                self._remove(process_counter, blocking) # Remove awaitable and propagate event
+                self._remove_finished(process_counter, blocking) # Remove awaitable and propagate event
 
-            # Wake up listeners
-            self.fired = True
-            if self._listeners:
-                listeners = self._listeners
-                self._listeners = set()
-
-                if blocking:
-                    if process_counter:
-                        process_counter.add(len(listeners))
-
-                    for listener in listeners:
-                        if listener._eventloop_affinity is None or listener._eventloop_affinity == _THREAD_LOCALS._current_eventloop:
-                            listener.process(self, self._result, process_counter, blocking)
-                        else:
-                            listener._eventloop_affinity._invoke(0, listener.process, (self, self._result, process_counter, blocking))
-                else:
-                    for listener in listeners:
-                        _THREAD_LOCALS._current_eventloop._enqueue(0, listener.process, (self, self._result), listener._eventloop_affinity)
+            self._wake_listeners(process_counter, blocking)
 
             # if self.singleshot:
             #     return # Don't decrease process_counter, since it was already decreased by self._remove()
@@ -574,14 +997,36 @@ class Event(Awaitable):
     For example, key-up and key-down events should be implemented by two separate events.
     Events represent leave nodes in the frame hierarchy.
 
+    Posts to high-frequency events can be buffered, so that superseded posts are dropped before they are dispatched.
+    A buffered event holds at most one pending post. Further posts replace its event arguments, so listeners only
+    receive the latest value.
+
+    Delayed posts that are still pending when the event is removed are cancelled.
+
     Args:
         name (str): The name of the event.
         singleshot (bool, optional): Defaults to False. If True, removes the event after it has been woken.
+        coalesce (bool, optional): Defaults to False. If True, posts while another post is pending only replace the
+            pending event arguments.
+        throttle (float, optional): Defaults to None. If set, dispatches posts at most `throttle` times per second.
+            Implies `coalesce`.
+        debounce (float, optional): Defaults to None. If set, dispatches a post only once no other post followed
+            within `debounce` seconds. Implies `coalesce`.
     """
 
-    def __init__(self, name, singleshot=False, lifebound=False):
+    def __init__(self, name, singleshot=False, lifebound=False, coalesce=False, throttle=None, debounce=None):
         super().__init__(name, singleshot, lifebound)
         self.eventloop = _THREAD_LOCALS._current_eventloop # Store creating eventloop, as a fallback in case self.post() is called from a thread without an eventloop
+        self.coalesce = coalesce or throttle is not None or debounce is not None
+        self.throttle = throttle
+        self.debounce = debounce
+        self._post_lock = threading.Lock()
+        self._pending_post = False
+        self._pending_args = None
+        self._pending_deadline = None
+        self._last_dispatch = None
+        self._timers = set()
+        self._filters = set()
 
     def _step(self, sender, msg):
         """Handle incoming events.
@@ -598,9 +1043,33 @@ class Event(Awaitable):
         stop.value = msg
         raise stop
 
+    def process(self, sender, msg, process_counter=None, blocking=False):
+        if type(self)._step is not Event._step: # If _step() was overloaded, ...
+            super().process(sender, msg, process_counter, blocking)
+            return
+
+        # Event._step() always finishes with `msg` and events don't have a ready state to propagate,
+        # so skip straight to storing the result and waking up listeners
+        self._result = msg
+        if self.singleshot:
+            self._remove_finished(process_counter, blocking)
+        self._wake_listeners(process_counter, blocking)
+
+        if process_counter:
+            process_counter.sub(1)
+
+    def _wake_listeners(self, process_counter, blocking, inline=True):
+        filters = self._filters
+        if filters:
+            # Filters stay subscribed until they match, so that events aren't missed while a filter processes another event
+            self._listeners.update(filters)
+        super()._wake_listeners(process_counter, blocking, inline)
+
     def send(self, args=None):
         """Dispatch and immediately process an event.
 
+        Sent events bypass the buffer of coalesced, throttled or debounced events.
+
         Args:
             args (optional): Defaults to None. Event arguments, for example, the progress value on a progress-update event.
         """
@@ -613,57 +1082,131 @@ class Event(Awaitable):
     def post(self, args=None, delay=0):
         """Enqueue an event in the event loop.
 
+        If the event is buffered and a post is already pending, only the pending event arguments are replaced.
+
         Args:
             args (optional): Defaults to None. Event arguments, for example, the progress value on a progress-update event.
             delay (float, optional): Defaults to 0. The time in seconds to wait before posting the event.
         """
 
-        (_THREAD_LOCALS._current_eventloop or self.eventloop).postevent(self, args, delay)
+        eventloop = _THREAD_LOCALS._current_eventloop or self.eventloop
+        if not self.coalesce:
+            eventloop.postevent(self, args, delay)
+            return
 
-class all_(Awaitable):
-    """An awaitable that blocks the awaiting frame until all passed awaitables have woken up.
+        with self._post_lock:
+            self._pending_args = args
+            if self.debounce is not None:
+                self._pending_deadline = time.perf_counter() + delay + self.debounce
+            if self._pending_post:
+                return # Supersede the pending post
+            self._pending_post = True
+
+            if self.debounce is not None:
+                delay += self.debounce
+            if self.throttle is not None and self._last_dispatch is not None:
+                delay = max(delay, self._last_dispatch + 1.0 / self.throttle - time.perf_counter())
+        eventloop._enqueue(delay, self._dispatch_pending, (), self._eventloop_affinity, self._timers)
+
+    def where(self, predicate):
+        """Create an awaitable that only wakes up when this event fires with matching event arguments.
+
+        The predicate is evaluated on the thread that dispatches the event. Non-matching events don't resume awaiting
+        frames.
+
+        Example: ::
+
+            await keypress.where(lambda key: key == 'q')
+
+        Args:
+            predicate (Callable[object, bool]): A function that receives the event arguments and returns True on a match.
+
+        Returns:
+            Awaitable: An awaitable that finishes with the event arguments of the first matching event.
+        """
+
+        return _Where(self, predicate)
+
+    def _dispatch_pending(self):
+        """Dispatch the pending post of a buffered event."""
+
+        with self._post_lock:
+            if self._pending_deadline is not None:
+                delay = self._pending_deadline - time.perf_counter()
+                if delay > 0.0: # If posts arrived since this dispatch was scheduled, ...
+                    # Wait until no post followed for `debounce` seconds
+                    _THREAD_LOCALS._current_eventloop._enqueue(delay, self._dispatch_pending, (), self._eventloop_affinity, self._timers)
+                    return
+            args = self._pending_args
+            self._pending_post = False
+            self._pending_args = None
+            self._pending_deadline = None
+            self._last_dispatch = time.perf_counter()
+        AbstractEventLoop.sendevent(self, args)
+
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self._timers: # If delayed posts are pending, ...
+            # Cancel pending posts, so that they don't keep occupying the eventloop's timer queue
+            timers, self._timers = self._timers, set()
+            for timer in list(timers): # Copy the set, since cancelled timers remove themselves from it
+                timer.cancel()
+        super()._remove(process_counter, blocking, ondone)
+
+class _Where(Awaitable):
+    """An awaitable that wakes up when `event` fires with event arguments that match `predicate`.
+
+    See :meth:`Event.where`.
 
     Args:
-        awaitables (Awaitable[]): A list of all awaitables to await.
+        event (Event): The event to filter.
+        predicate (Callable[object, bool]): A function that receives the event arguments and returns True on a match.
     """
 
-    def __init__(self, *awaitables):
-        super().__init__("all({})".format(", ".join(str(a) for a in awaitables)), singleshot=True, lifebound=True)
+    def __init__(self, event, predicate):
+        super().__init__("{}.where({})".format(event, getattr(predicate, '__name__', predicate)), singleshot=True, lifebound=True)
         self._remove_lock = threading.Lock()
-
-        self._awaitables = collections.defaultdict(list)
-        self._result = [None] * len(awaitables)
-        for i, awaitable in enumerate(awaitables):
-            if awaitable:
-                self._result[i] = awaitable._result
-            else:
-                self._awaitables[awaitable].append(i)
-                awaitable._listeners.add(self)
-
-        if not self._awaitables:
-            self._remove()
-            return
+        self._event = event
+        self.predicate = predicate
+        event._filters.add(self)
 
     def _step(self, sender, msg):
-        """Respond to an awaking child.
+        """Respond to the event firing.
 
         Args:
-            sender (Awaitable): The awaking child.
-            msg: The awaking child's result or an exception raised in a child frame.
+            sender (Event): The filtered event.
+            msg: The event arguments.
 
         Raises:
-            StopIteration: Once all children woke up, this raises a StopIteration with `value` set to a dict of all children's results.
-            BaseException: If msg is an Exception other than GeneratorExit or StopIteration, the exception is re-raised.
+            StopIteration: If `msg` matches the predicate, this raises a StopIteration with `value` set to `msg`.
         """
 
-        for i in self._awaitables.pop(sender, ()):
-            self._result[i] = msg
-
-        if not self._awaitables:
+        if self.predicate(msg):
             stop = StopIteration()
-            stop.value = self._result
+            stop.value = msg
             raise stop
 
+    def process(self, sender, msg, process_counter=None, blocking=False):
+        if type(self)._step is not _Where._step: # If _step() was overloaded, ...
+            super().process(sender, msg, process_counter, blocking)
+            return
+
+        try:
+            matched = self.predicate(msg)
+        except BaseException:
+            # Let the generic handling evaluate the predicate again to propagate its exception
+            super().process(sender, msg, process_counter, blocking)
+            return
+
+        # _Where._step() only raises StopIteration on a match and _Where doesn't have a ready state to propagate,
+        # so non-matching events are simply ignored
+        if matched:
+            self._result = msg
+            self._remove_finished(process_counter, blocking)
+            self._wake_listeners(process_counter, blocking)
+
+        if process_counter:
+            process_counter.sub(1)
+
     def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
         if self.removed:
             ondone(False)
@@ -672,33 +1215,308 @@ class all_(Awaitable):
             return
 
         with self._remove_lock:
-            if self.removed: # If this frame was closed while acquiring the lock, ...
+            if self.removed: # If this awaitable was closed while acquiring the lock, ...
                 ondone(False)
                 if process_counter:
                     process_counter.sub(1)
                 return
 
-            for awaitable in self._awaitables:
-                awaitable._listeners.discard(self)
-            self._awaitables.clear()
+            self._event._filters.discard(self)
+            self._event._listeners.discard(self)
 
             # Remove awaitable
             super()._remove(process_counter, blocking, ondone)
-            return
-        if process_counter:
-            process_counter.sub(1)
-        ondone(False)
 
-class any_(Awaitable):
-    """An awaitable that blocks the awaiting frame until any of the passed awaitables wakes up.
+class EventRouter(object):
+    """A threadsafe dispatcher of keyed events to the frames waiting for their key.
+
+    ``await router[key]`` only listens to events posted for `key`, so posting an event costs the same, regardless of how
+    many frames wait for other keys. Keys can be any hashable values.
+
+    Events posted for a key without waiting frames are dropped, like events without listeners.
+
+    Example: ::
+
+        router = EventRouter('responses')
+
+        @PFrame
+        async def request(request_id):
+            response = router[request_id] # Listen before sending the request
+            send_request(request_id)
+            return await response
+
+        # On any thread
+        router.post(request_id, response)
 
     Args:
-        awaitables (Awaitable[]): A list of all awaitables to await.
+        name (str, optional): Defaults to "EventRouter". The name of the router.
     """
 
-    def __init__(self, *awaitables):
-        super().__init__("any({})".format(", ".join(str(a) for a in awaitables)), singleshot=True, lifebound=True)
-        self._remove_lock = threading.Lock()
+    def __init__(self, name="EventRouter"):
+        self.__name__ = name
+        self.eventloop = _THREAD_LOCALS._current_eventloop # Store creating eventloop, as a fallback in case self.post() is called from a thread without an eventloop
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def __getitem__(self, key):
+        """Create an awaitable that wakes up with the event arguments of the next event posted for `key`.
+
+        The awaitable listens from the moment it is created, so events posted before it is awaited aren't lost.
+
+        Args:
+            key: The hashable key to listen to.
+
+        Returns:
+            Awaitable: A singleshot awaitable.
+        """
+
+        route = _Route(self, key)
+        with self._lock:
+            routes = self._routes.get(key)
+            if routes is None:
+                routes = self._routes[key] = set()
+            routes.add(route)
+        return route
+
+    def __len__(self):
+        """The number of keys with waiting frames."""
+        return len(self._routes)
+
+    def post(self, key, args=None):
+        """Enqueue an event for all frames currently waiting for `key`. This function is threadsafe.
+
+        Args:
+            key: The hashable key of the event.
+            args (optional): Defaults to None. Event arguments.
+        """
+
+        with self._lock:
+            routes = self._routes.pop(key, None)
+        if routes:
+            eventloop = _THREAD_LOCALS._current_eventloop or self.eventloop
+            eventloop._enqueue(0, EventRouter._dispatch, (routes, args))
+
+    @staticmethod
+    def _dispatch(routes, args):
+        error = None
+        for route in routes:
+            try:
+                AbstractEventLoop.sendevent(route, args)
+            except BaseException as err:
+                if error is None:
+                    error = err # Delay raising the exception until all routes have been woken
+        if error is not None:
+            raise error
+
+    def _discard(self, route):
+        with self._lock:
+            routes = self._routes.get(route.key)
+            if routes is not None:
+                routes.discard(route)
+                if not routes:
+                    del self._routes[route.key]
+
+class _Route(Awaitable):
+    """A singleshot awaitable that is woken by events posted to `router` for `key`.
+
+    See :meth:`EventRouter.__getitem__`.
+
+    Args:
+        router (EventRouter): The router that dispatches events to this awaitable.
+        key: The hashable key to listen to.
+    """
+
+    def __init__(self, router, key):
+        super().__init__("{}[{!r}]".format(router.__name__, key), singleshot=True, lifebound=False)
+        self.router = router
+        self.key = key
+
+    def _step(self, sender, msg):
+        stop = StopIteration()
+        stop.value = msg
+        raise stop
+
+    def process(self, sender, msg, process_counter=None, blocking=False):
+        if type(self)._step is not _Route._step: # If _step() was overloaded, ...
+            super().process(sender, msg, process_counter, blocking)
+            return
+
+        # Like Event.process(), skip straight to storing the result and waking up listeners
+        self._result = msg
+        self._remove_finished(process_counter, blocking)
+        self._wake_listeners(process_counter, blocking)
+
+        if process_counter:
+            process_counter.sub(1)
+
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if not self.removed:
+            self.router._discard(self) # Stop listening, so that the router doesn't keep keys without waiting frames
+        super()._remove(process_counter, blocking, ondone)
+
+class _Waiter(object):
+    """An awaitable that is woken on the eventloop of the frame that created it.
+
+    Frames start listening to an awaitable after their coroutine yielded it. A wakeup from another thread in between
+    would be lost. Eventloops process one callback at a time, so waking the waiter on the eventloop of the awaiting frame
+    guarantees that the frame is already listening.
+
+    Args:
+        name (str): The name of the waiter.
+    """
+
+    def __init__(self, name):
+        self.event = Event(name, singleshot=True)
+        self.eventloop = _THREAD_LOCALS._current_eventloop
+
+    def __await__(self):
+        return self.event.__await__()
+
+    def wake(self, args=None):
+        """Wake up the awaiting frame. This function is threadsafe.
+
+        Args:
+            args (optional): Defaults to None. The result of the await expression.
+        """
+
+        self.eventloop._enqueue(0, AbstractEventLoop.sendevent, (self.event, args, None, True), self.eventloop)
+
+class all_(Awaitable):
+    """An awaitable that blocks the awaiting frame until all passed awaitables have woken up.
+
+    With ``fail_fast=True``, the first awaited frame that raises an exception wakes up the awaiting frame immediately.
+    The awaitables that are still running are removed and the await expression re-raises the exception.
+
+    Example: ::
+
+        try:
+            results = await all_(*[download(url) for url in urls], fail_fast=True)
+        except ConnectionError:
+            results = None # All remaining downloads have been removed
+
+    Args:
+        awaitables (Awaitable[]): A list of all awaitables to await.
+        fail_fast (bool, optional): Defaults to False. If True, stop waiting and remove the remaining awaitables as soon as
+            one awaitable finishes with an exception.
+
+    Raises:
+        Exception: If `fail_fast` is True, the first exception raised by one of the awaitables.
+    """
+
+    def __init__(self, *awaitables, fail_fast=False):
+        super().__init__("all({})".format(", ".join(str(a) for a in awaitables)), singleshot=True, lifebound=True)
+        self._remove_lock = threading.Lock()
+        self.fail_fast = fail_fast
+        self.exception = None
+
+        self._awaitables = collections.defaultdict(list)
+        self._result = [None] * len(awaitables)
+        for i, awaitable in enumerate(awaitables):
+            if awaitable:
+                self._result[i] = awaitable._result
+                if fail_fast and self.exception is None and isinstance(awaitable._result, Exception):
+                    self.exception = awaitable._result
+            else:
+                self._awaitables[awaitable].append(i)
+                awaitable._listeners.add(self)
+
+        if not self._awaitables or self.exception is not None:
+            self._remove()
+            return
+
+    def __await__(self):
+        result = yield from super().__await__()
+        if self.exception is not None:
+            raise self.exception
+        return result
+
+    def _failed(self, msg):
+        """Return True if `msg` ends waiting early, because it is an exception and `fail_fast` is True."""
+
+        if self.fail_fast and isinstance(msg, Exception):
+            if self.exception is None:
+                self.exception = msg
+            return True
+        return False
+
+    def _step(self, sender, msg):
+        """Respond to an awaking child.
+
+        Args:
+            sender (Awaitable): The awaking child.
+            msg: The awaking child's result or an exception raised in a child frame.
+
+        Raises:
+            StopIteration: Once all children woke up, this raises a StopIteration with `value` set to a dict of all children's results.
+                With `fail_fast`, this is also raised as soon as a child finishes with an exception.
+        """
+
+        for i in self._awaitables.pop(sender, ()):
+            self._result[i] = msg
+
+        if not self._awaitables or self._failed(msg):
+            stop = StopIteration()
+            stop.value = self._result
+            raise stop
+
+    def process(self, sender, msg, process_counter=None, blocking=False):
+        if type(self)._step is not all_._step: # If _step() was overloaded, ...
+            super().process(sender, msg, process_counter, blocking)
+            return
+
+        # all_._step() never raises exceptions other than StopIteration and all_ doesn't have a ready state to propagate,
+        # so only store the result and wake up listeners once all awaitables woke up (or one failed)
+        for i in self._awaitables.pop(sender, ()):
+            self._result[i] = msg
+
+        if not self._awaitables or self._failed(msg):
+            self._remove_finished(process_counter, blocking)
+            self._wake_listeners(process_counter, blocking)
+
+        if process_counter:
+            process_counter.sub(1)
+
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self.removed:
+            ondone(False)
+            if process_counter:
+                process_counter.sub(1)
+            return
+
+        with self._remove_lock:
+            if self.removed: # If this frame was closed while acquiring the lock, ...
+                ondone(False)
+                if process_counter:
+                    process_counter.sub(1)
+                return
+
+            awaitables = list(self._awaitables)
+            self._awaitables.clear()
+            for awaitable in awaitables:
+                awaitable._listeners.discard(self)
+            if self.exception is not None: # If a failing awaitable ended waiting early, ...
+                # Remove the frames that are still running. Their results are no longer needed.
+                for awaitable in awaitables:
+                    if isinstance(awaitable, Frame):
+                        awaitable._remove()
+
+            # Remove awaitable
+            super()._remove(process_counter, blocking, ondone)
+            return
+        if process_counter:
+            process_counter.sub(1)
+        ondone(False)
+
+class any_(Awaitable):
+    """An awaitable that blocks the awaiting frame until any of the passed awaitables wakes up.
+
+    Args:
+        awaitables (Awaitable[]): A list of all awaitables to await.
+    """
+
+    def __init__(self, *awaitables):
+        super().__init__("any({})".format(", ".join(str(a) for a in awaitables)), singleshot=True, lifebound=True)
+        self._remove_lock = threading.Lock()
 
         self._awaitables = set()
         for awaitable in awaitables:
@@ -726,6 +1544,20 @@ class any_(Awaitable):
         stop.value = (sender, msg)
         raise stop
 
+    def process(self, sender, msg, process_counter=None, blocking=False):
+        if type(self)._step is not any_._step: # If _step() was overloaded, ...
+            super().process(sender, msg, process_counter, blocking)
+            return
+
+        # any_._step() always finishes with the first awaking child and any_ doesn't have a ready state to propagate,
+        # so skip straight to storing the result and waking up listeners
+        self._result = (sender, msg)
+        self._remove_finished(process_counter, blocking)
+        self._wake_listeners(process_counter, blocking)
+
+        if process_counter:
+            process_counter.sub(1)
+
     def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
         if self.removed:
             ondone(False)
@@ -752,476 +1584,2109 @@ class any_(Awaitable):
         ondone(False)
 
 
-class sleep(Event):
-    """An awaitable event used for suspending execution by the specified amount of time.
-
-    A duration of 0 seconds will resume the awaiting frame as soon as possible.
-    This is useful to implement non-blocking loops.
+class first_n(Awaitable):
+    """An awaitable that blocks the awaiting frame until the first k of the passed awaitables have woken up.
 
-    Args:
-        seconds (float, optional): Defaults to 0. The duration to wait.
-    """
+    The await expression returns a list of ``(sender, result)`` tuples in the order the awaitables woke up. Awaitables
+    that finish with an exception count as woken up, like in :class:`any_`. As soon as k awaitables woke up, this
+    awaitable stops listening to the other awaitables and removes the other frames.
 
-    def __init__(self, seconds=0.0):
-        super().__init__("sleep({})".format(seconds), singleshot=True, lifebound=False)
+    Example: ::
 
-        # Raise event
-        self.post(None, max(0, seconds))
+        # Run a computation on 3 replicas and accept the result once 2 of them agree
+        (_, a), (_, b) = await first_n(2, *[replica(i) for i in range(3)])
 
-class hold(Event):
-    """An awaitable event used for suspending execution indefinitely.
+    Args:
+        k (int): The number of awaitables to wait for.
+        awaitables (Awaitable[]): A list of all awaitables to await.
 
-    Frames are automatically removed when the frame coroutine finishes.
-    If you would like the frame to remain open until it is removed, write `await hold()` at the end of the coroutine.
+    Raises:
+        ValueError: If k is smaller than 1 or larger than the number of awaitables.
     """
 
-    def __init__(self):
-        super().__init__("hold()", singleshot=True, lifebound=False)
-    def _step(self, sender, msg):
-        """ Ignore any incoming events."""
-
-        pass
+    def __init__(self, k, *awaitables):
+        if k < 1 or k > len(set(awaitables)):
+            raise ValueError("k must be between 1 and the number of awaitables")
+        super().__init__("first_n({}, {})".format(k, ", ".join(str(a) for a in awaitables)), singleshot=True, lifebound=True)
+        awaitables = list(dict.fromkeys(awaitables)) # Remove duplicates, but keep order
+        self._remove_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.k = k
+        self._winners = []
 
-class animate(Event):
-    """An awaitable event used for periodically calling a callback function for the specified amount of time.
+        # Start listening before checking whether awaitables finished, since frames can finish on other threads
+        self._awaitables = set(awaitables)
+        for awaitable in awaitables:
+            awaitable._listeners.add(self)
+        for awaitable in awaitables:
+            if awaitable and self._finish(awaitable, awaitable._result):
+                self._remove()
+                return
 
-    Args:
-        seconds (float): The duration of the animation.
-        callback (Callable[float, None]): The function to be called on every iteration. The first parameter of `callback` indicates animation progress between 0 and 1.
-        interval (float, optional): Defaults to 0.0. The minimum time in seconds between two consecutive calls of the callback.
-    """
+    def _finish(self, sender, msg):
+        """Count `sender` as woken up, unless k awaitables already woke up.
 
-    def __init__(self, seconds, callback, interval=0.0):
-        super().__init__("animate()", singleshot=True, lifebound=False)
-        self.seconds = seconds
-        self.callback = callback
-        self.interval = interval
-        self.startTime = datetime.datetime.now()
-        self._final_event = False
+        Returns:
+            bool: True if `sender` was the k-th awaitable to wake up. The result of this awaitable is set at that point.
+        """
 
-        # Raise event
-        if seconds <= interval:
-            self._final_event = True
-            self.post(None, max(0, seconds))
-        else:
-            self.post(None, interval)
+        with self._lock:
+            if sender not in self._awaitables: # If sender already woke up or isn't awaited anymore, ...
+                return False
+            self._awaitables.discard(sender)
+            sender._listeners.discard(self)
+            self._winners.append((sender, msg))
+            if len(self._winners) != self.k:
+                return False
+        self._result = self._winners
+        return True
 
     def _step(self, sender, msg):
-        """Resend the animation event until the timeout is reached."""
-        t = (datetime.datetime.now() - self.startTime).total_seconds()
+        """Respond to an awaking child.
+
+        Args:
+            sender (Awaitable): The awaking child.
+            msg: The awaking child's result or an exception raised in a child frame.
+
+        Raises:
+            StopIteration: Once k children woke up, this raises a StopIteration with `value` set to their results.
+        """
 
-        if t >= self.seconds or self._final_event:
-            self.callback(1.0)
+        if self._finish(sender, msg):
             stop = StopIteration()
-            stop.value = msg
+            stop.value = self._result
             raise stop
-        else:
-            self.callback(t / self.seconds)
-            t = (datetime.datetime.now() - self.startTime).total_seconds() # Recompute t after callback
 
-            # Reraise event
-            if self.seconds - t <= self.interval:
-                self._final_event = True
-                self.post(None, max(0, self.seconds - t))
-            else:
-                self.post(None, self.interval)
+    def process(self, sender, msg, process_counter=None, blocking=False):
+        if type(self)._step is not first_n._step: # If _step() was overloaded, ...
+            super().process(sender, msg, process_counter, blocking)
+            return
 
-class FrameMeta(abc.ABCMeta):
-    def __new__(mcs, name, bases, dct):
-        frameclass = super().__new__(mcs, name, bases, dct)
-        if bases != (Awaitable,): # If frameclass != Frame, ...
-            frameclass.Factory = type(frameclass.__name__ + '.Factory', (frameclass.Factory,), {}) # Derive factory from base class factory
-        frameclass.Factory.frameclass = frameclass
-        return frameclass
+        # first_n._step() never raises exceptions other than StopIteration and first_n doesn't have a ready state to
+        # propagate, so only store the result and wake up listeners once k awaitables woke up
+        if self._finish(sender, msg):
+            self._remove_finished(process_counter, blocking)
+            self._wake_listeners(process_counter, blocking)
 
-    def __enter__(self):
-        return self().__enter__()
+        if process_counter:
+            process_counter.sub(1)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        return self().__exit__(exc_type, exc_val, exc_tb)
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self.removed:
+            ondone(False)
+            if process_counter:
+                process_counter.sub(1)
+            return
 
-class Frame(Awaitable, metaclass=FrameMeta):
-    """An object within the frame hierarchy.
+        with self._remove_lock:
+            if self.removed: # If this awaitable was closed while acquiring the lock, ...
+                ondone(False)
+                if process_counter:
+                    process_counter.sub(1)
+                return
 
-    This class represents the default frame class. All other frame classes have
-    to be derived from :class:`Frame`.
+            with self._lock:
+                losers = list(self._awaitables)
+                self._awaitables.clear()
+                finished = len(self._winners) == self.k
+            for awaitable in losers:
+                awaitable._listeners.discard(self)
+            if finished: # If k awaitables woke up, ...
+                # Remove the frames that lost. Their results are no longer needed.
+                for awaitable in losers:
+                    if isinstance(awaitable, Frame):
+                        awaitable._remove()
+
+            # Remove awaitable
+            super()._remove(process_counter, blocking, ondone)
+            return
+
+class race(first_n):
+    """An awaitable that blocks the awaiting frame until the first of the passed awaitables wakes up.
+
+    Like :class:`any_`, the await expression returns a ``(sender, result)`` tuple of the first awaitable that woke up.
+    Unlike :class:`any_`, the other frames are removed as soon as the first awaitable wakes up.
+
+    Example: ::
+
+        # Send a hedged request to two servers and cancel the slower one
+        server, response = await race(request(server1), request(server2))
+
+    Args:
+        awaitables (Awaitable[]): A list of all awaitables to await.
+    """
+
+    def __init__(self, *awaitables):
+        super().__init__(1, *awaitables)
+        self.__name__ = "race({})".format(", ".join(str(a) for a in awaitables))
+
+    def _finish(self, sender, msg):
+        if not super()._finish(sender, msg):
+            return False
+        self._result = self._winners[0]
+        return True
+
+class as_completed(Awaitable):
+    """An asynchronous iterator over the passed awaitables in the order they wake up.
+
+    Iterating with ``async for`` yields a ``(sender, result)`` tuple as soon as each awaitable wakes up.
+    Only results that haven't been consumed by the iterating frame yet are kept.
+    If the iterating frame is removed, this awaitable stops listening to all remaining awaitables.
+
+    Example: ::
+
+        async for frame, result in as_completed(*frames):
+            print(frame, result)
+
+    Args:
+        awaitables (Awaitable[]): A list of all awaitables to await.
+    """
+
+    def __init__(self, *awaitables):
+        super().__init__("as_completed({})".format(", ".join(str(a) for a in awaitables)), singleshot=False, lifebound=True)
+        self._remove_lock = threading.Lock()
+
+        self._awaitables = set()
+        self._completed = collections.deque()
+        self._waiter = None
+        for awaitable in awaitables:
+            if awaitable:
+                self._completed.append((awaitable, awaitable._result))
+            elif awaitable not in self._awaitables:
+                self._awaitables.add(awaitable)
+                awaitable._listeners.add(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Wait for the next awaitable to wake up.
+
+        Returns:
+            tuple: The awaking awaitable and its result.
+
+        Raises:
+            StopAsyncIteration: If all awaitables woke up and their results have been consumed.
+        """
+
+        while True:
+            with self._remove_lock:
+                if self._completed:
+                    return self._completed.popleft()
+                if not self._awaitables or self.removed:
+                    break
+                waiter = self._waiter = _Waiter(str(self.__name__) + ".next")
+            await waiter
+
+        self._remove()
+        raise StopAsyncIteration
+
+    def _step(self, sender, msg):
+        """Respond to an awaking child.
+
+        Buffer the child's result and wake up the iterating frame.
+
+        Args:
+            sender (Awaitable): The awaking child.
+            msg: The awaking child's result or an exception raised in a child frame.
+        """
+
+        with self._remove_lock:
+            if sender in self._awaitables:
+                self._awaitables.discard(sender)
+                self._completed.append((sender, msg))
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.wake()
+
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self.removed:
+            ondone(False)
+            if process_counter:
+                process_counter.sub(1)
+            return
+
+        with self._remove_lock:
+            if self.removed: # If this frame was closed while acquiring the lock, ...
+                ondone(False)
+                if process_counter:
+                    process_counter.sub(1)
+                return
+
+            for awaitable in self._awaitables:
+                awaitable._listeners.discard(self)
+            self._awaitables.clear()
+            self._completed.clear()
+            waiter, self._waiter = self._waiter, None
+
+            # Remove awaitable
+            super()._remove(process_counter, blocking, ondone)
+
+        # Let the iterating frame stop iterating
+        if waiter is not None:
+            waiter.wake()
+
+
+class sleep(Event):
+    """An awaitable event used for suspending execution by the specified amount of time.
+
+    A duration of 0 seconds will resume the awaiting frame as soon as possible.
+    This is useful to implement non-blocking loops.
+
+    Args:
+        seconds (float, optional): Defaults to 0. The duration to wait.
+    """
+
+    def __init__(self, seconds=0.0):
+        super().__init__("sleep({})".format(seconds), singleshot=True, lifebound=False)
+
+        # Raise event
+        self.post(None, max(0, seconds))
+
+class hold(Event):
+    """An awaitable event used for suspending execution indefinitely.
+
+    Frames are automatically removed when the frame coroutine finishes.
+    If you would like the frame to remain open until it is removed, write `await hold()` at the end of the coroutine.
+    """
+
+    def __init__(self):
+        super().__init__("hold()", singleshot=True, lifebound=False)
+    def _step(self, sender, msg):
+        """ Ignore any incoming events."""
+
+        pass
+
+class _AnimationDriver(object):
+    """A shared timer that ticks all animations of an eventloop with the same interval in one callback.
+
+    Like a display's vertical sync, all animations are advanced together, using a single clock read per tick.
+    Drivers are only accessed from their eventloop, so they don't need a lock. Animations that were removed on another
+    thread are dropped on the next tick.
+
+    Args:
+        eventloop (AbstractEventLoop): The eventloop that runs the driver.
+        interval (float): The time in seconds between two consecutive ticks.
+    """
+
+    def __init__(self, eventloop, interval):
+        self.eventloop = eventloop
+        self.interval = interval
+        self.animations = {} # An insertion-ordered set of active animations
+        self.running = False
+        self.next_tick = None
+
+    @staticmethod
+    def add(animation, interval):
+        """Start ticking `animation` with the driver of the current eventloop for the given interval.
+
+        Args:
+            animation (animate): The animation to tick.
+            interval (float): The time in seconds between two consecutive ticks.
+        """
+
+        eventloop = _THREAD_LOCALS._current_eventloop or animation.eventloop
+        driver = eventloop._animation_drivers.get(interval)
+        if driver is None:
+            driver = eventloop._animation_drivers[interval] = _AnimationDriver(eventloop, interval)
+        driver.animations[animation] = None
+        if not driver.running:
+            driver.running = True
+            driver.next_tick = time.monotonic() + interval
+            eventloop._post(interval, driver._tick, ())
+
+    def _tick(self):
+        now = time.monotonic()
+        animations = self.animations
+        try:
+            for animation in list(animations): # Copy the animations, since callbacks may start new animations
+                if animation.removed:
+                    del animations[animation] # Drop removed animations
+                    continue
+                try:
+                    advancing = animation._advance(now)
+                except Exception as err:
+                    # Finish the failed animation through its regular event processing, so that exception handlers run
+                    del animations[animation]
+                    animation._error = err
+                    AbstractEventLoop.sendevent(animation, None)
+                else:
+                    if not advancing:
+                        del animations[animation] # Drop finished animations
+        finally:
+            if animations:
+                # Schedule the next tick at an absolute time, skipping ticks that were missed while the eventloop was busy
+                self.next_tick += self.interval
+                if self.next_tick <= now:
+                    self.next_tick = now + self.interval
+                self.eventloop._post(max(0.0, self.next_tick - time.monotonic()), self._tick, ())
+            else:
+                self.running = False
+
+class animate(Event):
+    """An awaitable event used for periodically calling a callback function for the specified amount of time.
+
+    All animations of an eventloop with the same interval are ticked together by a shared driver.
+    Only the final call of the callback is scheduled separately, so that the animation ends on time.
+
+    Args:
+        seconds (float): The duration of the animation.
+        callback (Callable[float, None]): The function to be called on every iteration. The first parameter of `callback` indicates animation progress between 0 and 1.
+        interval (float, optional): Defaults to 0.0. The minimum time in seconds between two consecutive calls of the callback.
+    """
+
+    def __init__(self, seconds, callback, interval=0.0):
+        super().__init__("animate()", singleshot=True, lifebound=False)
+        self.seconds = seconds
+        self.callback = callback
+        self.interval = interval
+        self.startTime = datetime.datetime.now()
+        self._start_time = time.monotonic()
+        self._error = None # An exception raised by the callback on a tick of the animation driver
+
+        # Raise event
+        if seconds <= interval:
+            self.post(None, max(0, seconds))
+        else:
+            _AnimationDriver.add(self, interval)
+
+    def _advance(self, now):
+        """Call the callback on a tick of the animation driver.
+
+        Args:
+            now (float): The time of the tick, as returned by :func:`time.monotonic`.
+
+        Returns:
+            bool: False, if the animation left the driver to finish with a final event.
+        """
+
+        t = now - self._start_time
+        if t < self.seconds:
+            self.callback(t / self.seconds)
+        if self.seconds - t <= self.interval:
+            # Post the final event
+            self.post(None, max(0, self.seconds - t))
+            return False
+        return True
+
+    def _step(self, sender, msg):
+        """Finish the animation with a final call of the callback, or with the exception of a failed tick."""
+
+        if self._error is not None:
+            raise self._error
+        self.callback(1.0)
+        stop = StopIteration()
+        stop.value = msg
+        raise stop
+
+class every(Event):
+    """An awaitable event that wakes up periodically.
+
+    Ticks are scheduled at absolute times ``start + k * interval``, so slow listeners don't make the period drift.
+    All ticks are driven by a single timer, which is re-armed after each tick.
+
+    Ticks are never queued up. If a tick expires while nobody is listening, the timer is paused and the next listener
+    is woken immediately with the latest expired tick. The event argument of each tick is the number of ticks that were
+    skipped since the previous tick that woke up a listener.
+
+    The event stops when it is removed, either explicitly or together with its parent frame.
+
+    Example: ::
+
+        async for missed in every(0.1):
+            if missed:
+                print("skipped {} ticks".format(missed))
+
+    Args:
+        interval (float): The time in seconds between two consecutive ticks.
+
+    Raises:
+        ValueError: If `interval` isn't positive.
+    """
+
+    def __init__(self, interval):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        super().__init__("every({})".format(interval), singleshot=False, lifebound=True)
+        self.interval = interval
+        self._tick_lock = threading.Lock()
+        self._start_time = time.monotonic()
+        self._scheduled_tick = 1 # Index of the next tick
+        self._delivered_tick = 0 # Index of the last tick that woke up listeners
+        self._paused = False
+
+        # Run the timer on the creating eventloop, so that ticks don't pass through the shared event queue
+        eventloop = _THREAD_LOCALS._current_eventloop or self.eventloop
+        self._timer = eventloop._start_timer(interval, self._tick, (), self._eventloop_affinity or eventloop, self._timers)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Wait for the next tick.
+
+        Returns:
+            int: The number of ticks skipped since the previous tick that was delivered.
+
+        Raises:
+            StopAsyncIteration: If the event was removed.
+        """
+
+        missed = await self
+        if self.removed:
+            raise StopAsyncIteration
+        return missed
+
+    def __bool__(self):
+        """Check whether a tick expired while nobody was listening.
+
+        Awaiting frames check this after they start listening, so a paused tick is consumed by the first frame that
+        checks it. Consuming the tick resumes the timer.
+        """
+
+        if super().__bool__():
+            return True
+        with self._tick_lock:
+            if not self._paused or self.removed:
+                return False
+            self._paused = False
+            self._result = self._deliver(int((time.monotonic() - self._start_time) / self.interval))
+            return True
+
+    def _deliver(self, tick):
+        """Mark `tick` as delivered and schedule the next tick. The caller must hold `_tick_lock`.
+
+        Returns:
+            int: The number of ticks skipped since the previous delivered tick.
+        """
+
+        missed = tick - self._delivered_tick - 1
+        self._delivered_tick = tick
+        self._scheduled_tick = tick + 1
+        self._timer.restart(self._start_time + self._scheduled_tick * self.interval)
+        return missed
+
+    def _tick(self):
+        """Wake up listeners, or pause the timer until the next listener arrives."""
+
+        with self._tick_lock:
+            if self.removed: # If the timer expired while this event was being removed, ...
+                return
+            if not self._listeners: # If nobody is listening, ...
+                # Stop ticking until a listener consumes this tick, instead of firing ticks that nobody receives
+                self._paused = True
+                return
+
+            # Skip ticks that expired while the timer was waiting to be processed
+            missed = self._deliver(max(self._scheduled_tick, int((time.monotonic() - self._start_time) / self.interval)))
+        AbstractEventLoop.sendevent(self, missed)
+
+class timeout(Awaitable):
+    """An awaitable that bounds the time spent waiting for another awaitable.
+
+    If `awaitable` wakes up first, the timer is cancelled and the await expression returns the result of `awaitable`.
+    If the timer expires first and `awaitable` is a frame, the frame is removed and the await expression raises a
+    TimeoutError.
+
+    If `awaitable` is a frame, its :attr:`Frame.deadline` is set to the expiry time of the timer, so that frames created
+    inside it inherit the deadline. The whole subtree is bounded by that one timer: Timeouts started inside a frame with
+    a deadline don't start their own timer if they would outlast the deadline. If the timeout is removed before it
+    expires, the deadline is dropped and those timeouts start their own timers.
+
+    Example: ::
+
+        try:
+            response = await timeout(request(), 1.0)
+        except TimeoutError:
+            response = None
+
+    Args:
+        awaitable (Awaitable): The awaitable to wait for.
+        seconds (float): The maximum time in seconds to wait.
+
+    Raises:
+        TimeoutError: If the timer expired before `awaitable` woke up.
+    """
+
+    def __init__(self, awaitable, seconds):
+        super().__init__("timeout({}, {})".format(awaitable, seconds), singleshot=True, lifebound=True)
+        self._remove_lock = threading.Lock()
+        self.timed_out = False
+        self._awaitable = awaitable
+        self._timer = None
+        self._replaced_deadlines = {} # Previous deadlines of frames that inherited the deadline of this timeout
+        self._dependents = set() # Timeouts without a timer that rely on the timer of this timeout
+        self._owner = None # The timeout whose timer this timeout relies on
+
+        # Start listening before checking whether awaitable finished, since frames can finish on other threads
+        awaitable._listeners.add(self)
+        if awaitable:
+            self._result = awaitable._result
+            self._remove()
+            return
+
+        self._expiry = time.monotonic() + seconds
+        currentframe = _THREAD_LOCALS._current_frame
+        parent_deadline = getattr(currentframe, 'deadline', None)
+        if parent_deadline is not None and parent_deadline <= self._expiry and currentframe._deadline_owner._defer(self):
+            # The timer of the current frame's deadline removes the current frame before this timeout would expire
+            self._requested_expiry = self._expiry
+            self._expiry = parent_deadline
+        else:
+            self._arm()
+
+    def _arm(self):
+        """Start the timer of this timeout and make its expiry the deadline of the awaited frame."""
+
+        # Start listening before posting the timer, since the timer can fire on another thread
+        self._timer = Event("timeout.timer", singleshot=True)
+        self._timer._listeners.add(self)
+        self._timer.post(None, max(0, self._expiry - time.monotonic()))
+        if isinstance(self._awaitable, Frame):
+            self._awaitable._set_deadline(self._expiry, self, self._replaced_deadlines)
+
+    def _defer(self, dependent):
+        """Let `dependent` rely on the timer of this timeout instead of starting its own timer.
+
+        Returns:
+            bool: False, if this timeout has already been removed.
+        """
+
+        with self._remove_lock:
+            if self.removed:
+                return False
+            self._dependents.add(dependent)
+            dependent._owner = self
+            return True
+
+    def _rearm(self):
+        """Start the timer of a timeout that relied on the timer of a timeout that was removed before it expired."""
+
+        with self._remove_lock:
+            if not self.removed:
+                self._owner = None
+                self._expiry = self._requested_expiry
+                self._arm()
+
+    def __await__(self):
+        result = yield from super().__await__()
+        if self.timed_out:
+            raise TimeoutError("{} timed out".format(self._awaitable))
+        return result
+
+    def _step(self, sender, msg):
+        """Respond to the awaitable or the timer waking up.
+
+        Args:
+            sender (Awaitable): The awaiting awaitable or the timer.
+            msg: The result of the awaitable.
+
+        Raises:
+            StopIteration: Finishes with the result of the awaitable, or None if the timer expired.
+        """
+
+        if self.removed: # If awaitable finished before this timeout started listening, ...
+            stop = StopIteration()
+            stop.value = self._result
+            raise stop
+
+        self.timed_out = sender is not self._awaitable
+        stop = StopIteration()
+        stop.value = None if self.timed_out else msg
+        raise stop
+
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self.removed:
+            ondone(False)
+            if process_counter:
+                process_counter.sub(1)
+            return
+
+        with self._remove_lock:
+            if self.removed: # If this awaitable was closed while acquiring the lock, ...
+                ondone(False)
+                if process_counter:
+                    process_counter.sub(1)
+                return
+
+            if self._timer is not None:
+                self._timer._listeners.discard(self)
+                self._timer._remove() # Cancel the timer
+            self._awaitable._listeners.discard(self)
+            if isinstance(self._awaitable, Frame):
+                if self.timed_out:
+                    self._awaitable._remove() # Remove the frame that ran out of time
+                elif self._timer is not None and not self._awaitable.removed:
+                    # Nothing enforces the deadline of this timeout anymore
+                    self._awaitable._release_deadline(self, self._replaced_deadlines)
+            if self._owner is not None:
+                self._owner._dependents.discard(self)
+            dependents, self._dependents = list(self._dependents), set()
+            if not self.timed_out:
+                for dependent in dependents:
+                    dependent._rearm()
+
+            # Remove awaitable
+            super()._remove(process_counter, blocking, ondone)
+            return
+
+class deadline(timeout):
+    """An awaitable that bounds waiting for another awaitable by a point in time.
+
+    This is equivalent to ``timeout(awaitable, when - time.monotonic())``.
+
+    Args:
+        awaitable (Awaitable): The awaitable to wait for.
+        when (float): The time, as returned by :func:`time.monotonic`, at which to stop waiting.
+    """
+
+    def __init__(self, awaitable, when):
+        super().__init__(awaitable, when - time.monotonic())
+        self.__name__ = "deadline({}, {})".format(awaitable, when)
+
+class ConcurrencyLimit(object):
+    """A limit on the number of simultaneously running frames.
+
+    Frames created while the limit is reached are pending. Their frame functions are only started once a running frame
+    finishes or is removed. Pending frames can be awaited and removed like any other frame.
+
+    Pass an instance to ``max_concurrency`` to share one limit between multiple frame functions.
+
+    Example: ::
+
+        @PFrame(max_concurrency=4)
+        async def sub_frame(i):
+            time.sleep(0.001)
+
+        await all_(*[sub_frame(i) for i in range(10000)]) # Runs at most 4 sub_frames at a time
+
+    Args:
+        max_concurrency (int): The maximum number of running frames.
+    """
+
+    def __init__(self, max_concurrency):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._running = 0
+        self._pending = collections.OrderedDict()
+
+    @property
+    def running(self):
+        """The number of frames that have been started and haven't finished yet."""
+        return self._running
+
+    @property
+    def pending(self):
+        """The number of frames waiting to be started."""
+        return len(self._pending)
+
+    def _acquire(self, frame, framefunc, frameargs, framekwargs):
+        """Reserve a slot for a newly created frame.
+
+        Args:
+            frame (Frame): The newly created frame.
+            framefunc (Callable): The frame function to start once a slot is available.
+            frameargs (tuple): Positional arguments to `framefunc`.
+            framekwargs (dict): Keyword arguments to `framefunc`.
+
+        Returns:
+            bool: True, if `frame` can be started immediately. False, if `frame` is pending.
+        """
+
+        with self._lock:
+            frame._limit = self
+            if self._running < self.max_concurrency:
+                self._running += 1
+                return True
+            self._pending[frame] = (framefunc, frameargs, framekwargs)
+            return False
+
+    def _release(self, frame):
+        """Free the slot of a finished or removed frame and start the next pending frame.
+
+        This function is called before the listeners of `frame` are woken. Calling it more than once has no effect.
+
+        Args:
+            frame (Frame): The finished or removed frame.
+        """
+
+        start = None
+        with self._lock:
+            if frame._limit is not self: # If frame was already released
+                return
+            frame._limit = None
+            if self._pending.pop(frame, None) is None: # If frame was running, ...
+                if self._pending:
+                    start = self._pending.popitem(last=False) # Hand the slot to the oldest pending frame
+                else:
+                    self._running -= 1
+
+        if start is not None:
+            frame, (framefunc, frameargs, framekwargs) = start
+            currentframe = _THREAD_LOCALS._current_frame
+            eventloop_affinity = frame._eventloop_affinity
+            if eventloop_affinity is None:
+                # Start a parallel frame on the eventloop that just freed the slot, instead of waking up an idle eventloop
+                frame._eventloop_affinity = _THREAD_LOCALS._current_eventloop
+            try:
+                frame.create(framefunc, *frameargs, **framekwargs)
+            finally:
+                frame._eventloop_affinity = eventloop_affinity
+                _THREAD_LOCALS._current_frame = currentframe
+
+def _cache_key(*frameargs, **framekwargs):
+    """The default cache key of a frame factory with a cache: All frame arguments."""
+    return (frameargs, frozenset(framekwargs.items())) if framekwargs else frameargs
+
+class LRU(object):
+    """A bounded cache of frame results, evicting the least recently used result.
+
+    Pass an instance to the ``cache`` argument of a frame class to share frames between calls with equal arguments.
+    Calling the frame function while a frame with an equal key is running returns an awaitable for the running frame
+    instead of starting another frame. Once the frame finished, its result is cached and further calls with an equal key
+    return it without starting a frame. Results of frames that raised an exception are not cached.
+
+    Calls don't return frames, but awaitables for the shared frame. Removing one of them only removes the shared frame
+    if no other awaitable is waiting for it.
+
+    The ``key`` argument of the frame class computes the cache key from the frame arguments. By default all frame
+    arguments are used, so they have to be hashable.
+
+    Example: ::
+
+        @PFrame(cache=LRU(maxsize=100), key=lambda url, retries: url)
+        async def load(url, retries):
+            ...
+
+        a, b = load(url, 1), load(url, 3) # Both wait for the same frame
+        await all_(a, b)
+        await load(url, 1) # Returns the cached result immediately
+
+    Args:
+        maxsize (int, optional): Defaults to 128. The maximum number of cached results. If 0, only running frames are
+            shared.
+        ttl (float, optional): Defaults to None. If set, results expire ttl seconds after they were cached.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        if maxsize < 0:
+            raise ValueError("maxsize must not be negative")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._results = collections.OrderedDict() # Maps keys to (result, expiry time) in least recently used order
+        self._flights = {} # Maps keys to running shared frames
+
+    def __len__(self):
+        """The number of cached results, including expired results that haven't been evicted yet."""
+        return len(self._results)
+
+    def clear(self):
+        """Remove all cached results. Running shared frames are not affected."""
+        with self._lock:
+            self._results.clear()
+
+    def _call(self, factory, frameargs, framekwargs):
+        """Return an awaitable for a cached result or a shared frame, starting a new frame if necessary.
+
+        Args:
+            factory (Frame.Factory): The frame factory to produce a new shared frame with.
+            frameargs (tuple): Positional arguments to the frame function.
+            framekwargs (dict): Keyword arguments to the frame function.
+
+        Returns:
+            Awaitable: An awaitable for the result.
+        """
+
+        key = (factory, factory.key(*frameargs, **framekwargs))
+        name = factory.framefunc.__name__
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                result, expiry = entry
+                if expiry is None or expiry > time.monotonic():
+                    self._results.move_to_end(key)
+                    hit = True
+                else:
+                    del self._results[key]
+                    hit = False
+            else:
+                hit = False
+            flight = None if hit else self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+        if hit:
+            return _CachedCall(name, self, key, None, result)
+
+        if flight is None:
+            # Start the shared frame outside of the calling frame, so that removing the caller doesn't remove it
+            new_flight = _CacheFlight(_THREAD_LOCALS._current_frame)
+            _THREAD_LOCALS._current_frame = None
+            try:
+                new_flight.frame = factory._create(frameargs, framekwargs, new_flight._handle_exception)
+            finally:
+                _THREAD_LOCALS._current_frame = new_flight.owner
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = new_flight
+                flight.waiters += 1
+            if flight is not new_flight: # If another thread started a frame with an equal key in the meantime, ...
+                new_flight.frame._remove()
+
+        return _CachedCall(name, self, key, flight)
+
+    def _store(self, key, flight):
+        """Stop sharing the frame of `flight` and cache its result. Must be called while holding the lock."""
+
+        if self._flights.get(key) is not flight: # If the result was already stored
+            return
+        del self._flights[key]
+        result = flight.frame._result
+        if isinstance(result, Exception):
+            return
+        self._results[key] = (result, None if self.ttl is None else time.monotonic() + self.ttl)
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def _finish(self, key, flight):
+        """Cache the result of a shared frame that finished."""
+
+        with self._lock:
+            self._store(key, flight)
+
+    def _release(self, key, flight):
+        """Stop waiting for a shared frame and remove the frame if nobody else is waiting for it."""
+
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters:
+                return
+            if flight.frame: # If the frame finished, ...
+                self._store(key, flight)
+                return
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.frame._remove()
+
+class _CacheFlight(object):
+    """A running frame shared by all calls with equal cache keys."""
+
+    def __init__(self, owner):
+        self.frame = None
+        self.owner = owner
+        self.waiters = 0
+
+    def _handle_exception(self, frame, err):
+        # Shared frames don't have a parent, so hand exceptions to the exception handlers of the frame that started them
+        awaitable = self.owner
+        while awaitable is not None:
+            if awaitable.exception_handler:
+                try:
+                    awaitable.exception_handler(frame, err)
+                except Exception as exception_handler_err:
+                    err = exception_handler_err
+                else:
+                    return
+            awaitable = awaitable._parent
+        raise err
+
+class _CachedCall(Awaitable):
+    """An awaitable for a cached result or for a frame shared between calls with equal cache keys."""
+
+    def __init__(self, name, cache, key, flight, result=None):
+        super().__init__("cached({})".format(name), singleshot=True, lifebound=True)
+        self._remove_lock = threading.Lock()
+        self._cache = cache
+        self._key = key
+        self._flight = flight
+
+        if flight is None: # If the result was cached
+            self._result = result
+            self._remove()
+            return
+
+        # Start listening before checking whether the frame finished, since frames can finish on other threads
+        frame = flight.frame
+        frame._listeners.add(self)
+        if frame:
+            try:
+                frame._listeners.remove(self)
+            except KeyError:
+                pass # The finishing thread already woke this awaitable
+            else:
+                self._result = frame._result
+                cache._finish(key, flight)
+                self._remove()
+
+    def _step(self, sender, msg):
+        """Respond to the shared frame finishing.
+
+        Raises:
+            StopIteration: Finishes with the result of the shared frame.
+        """
+
+        self._cache._finish(self._key, self._flight)
+        stop = StopIteration()
+        stop.value = msg
+        raise stop
+
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self.removed:
+            ondone(False)
+            if process_counter:
+                process_counter.sub(1)
+            return
+
+        with self._remove_lock:
+            if self.removed: # If this awaitable was closed while acquiring the lock, ...
+                ondone(False)
+                if process_counter:
+                    process_counter.sub(1)
+                return
+
+            flight = self._flight
+            if flight is not None:
+                flight.frame._listeners.discard(self)
+                self._cache._release(self._key, flight)
+
+            # Remove awaitable
+            super()._remove(process_counter, blocking, ondone)
+
+@types.coroutine
+def _forward_generator_exit(awaitable):
+    """Await `awaitable`, throwing GeneratorExit into it if the awaiting coroutine is closed.
+
+    Closing a coroutine that awaits a step of an async generator only marks the step as closed and leaves the async
+    generator suspended, without running its cleanup code.
+    """
+
+    iterator = awaitable.__await__()
+    msg = None
+    while True:
+        try:
+            yielded = iterator.send(msg)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            msg = yield yielded
+        except GeneratorExit:
+            try:
+                iterator.throw(GeneratorExit)
+            except (GeneratorExit, StopIteration, StopAsyncIteration):
+                pass
+            raise
+
+class FrameMeta(abc.ABCMeta):
+    def __new__(mcs, name, bases, dct):
+        frameclass = super().__new__(mcs, name, bases, dct)
+        if bases != (Awaitable,): # If frameclass != Frame, ...
+            frameclass.Factory = type(frameclass.__name__ + '.Factory', (frameclass.Factory,), {}) # Derive factory from base class factory
+        frameclass.Factory.frameclass = frameclass
+        return frameclass
+
+    def __enter__(self):
+        return self().__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self().__exit__(exc_type, exc_val, exc_tb)
+
+class Frame(Awaitable, metaclass=FrameMeta):
+    """An object within the frame hierarchy.
+
+    This class represents the default frame class. All other frame classes have
+    to be derived from :class:`Frame`.
+
+    A frame is an instance of a frame class. Use the nested Factory class to
+    create frames.
+
+    The factory class is created by decorating a function or coroutine with
+    ``@FRAME``, where ``FRAME`` is the frame class.
+
+    Example: ::
+
+        class MyFrameClass(Frame):
+            pass
+
+        @MyFrameClass
+        async def my_frame_factory():
+            pass
+
+        assert(type(my_frame_factory) == MyFrameClass.Factory)
+        my_frame = my_frame_factory()
+        assert(type(my_frame) == MyFrameClass)
+
+    Args:
+        startup_behaviour (FrameStartupBehaviour, optional): Defaults to FrameStartupBehaviour.delayed.
+            Controls whether the frame is started immediately or queued on the eventloop.
+        thread_idx (int, optional): Defaults to None. If set, forces the scheduler to affiliate this frame with the given thread.
+
+    Attributes:
+        free (Event): An event that fires just before the frame is removed.
+        ready (Event): An event that fires the first time the frame is suspended (using ``await``) or goes out of scope.
+        deadline (float): The time, as returned by :func:`time.monotonic`, at which a :class:`timeout` removes this frame
+            or one of its parents, or None. Frames inherit the deadline of their parent frame.
+
+    Raises:
+        ValueError: If `thread_idx` is outside the range of allocated threads.
+
+            The number of allocated threads is controlled by the `num_threads` parameter of :meth:`AbstractEventLoop.run`.
+    """
+
+    class Factory(object):
+        """A frame function declared in the context of a frame class.
+        
+        Args:
+            framefunc (Callable): The function or coroutine that describes the frame's behaviour.
+            frameclassargs (tuple): Positional arguments to the frame class.
+            frameclasskwargs (dict): Keyword arguments to the frame class.
+                The keyword argument ``max_concurrency`` (int or ConcurrencyLimit) limits the number of simultaneously
+                running frames created by this factory. See :class:`ConcurrencyLimit`.
+                The keyword arguments ``cache`` (int or LRU) and ``key`` (Callable) share frames and cache results of
+                calls with equal keys. See :class:`LRU`.
+                The keyword argument ``buffer`` (int, default 16) sets the number of values an async generator frame
+                function can produce ahead of the consumer. If 0, the buffer is unbounded.
+        """
+
+        def __init__(self, framefunc, frameclassargs, frameclasskwargs):
+            self.framefunc = framefunc
+            self.frameclassargs = frameclassargs
+            self.frameclasskwargs = dict(frameclasskwargs)
+            self.limit = self.frameclasskwargs.pop('max_concurrency', None)
+            if self.limit is not None and not isinstance(self.limit, ConcurrencyLimit):
+                self.limit = ConcurrencyLimit(self.limit)
+            self.cache = self.frameclasskwargs.pop('cache', None)
+            if self.cache is not None and not isinstance(self.cache, LRU):
+                self.cache = LRU(self.cache)
+            self.key = self.frameclasskwargs.pop('key', _cache_key)
+            self.buffer = self.frameclasskwargs.pop('buffer', 16)
+
+        def __call__(self, *frameargs, **framekwargs):
+            """Produce an instance of the frame.
+            
+            Raises:
+                InvalidOperationException: Raised when no event loop is currently running.
+            
+            Returns:
+                Frame: The newly created frame instance, or an awaitable for a shared frame if this factory has a cache.
+            """
+
+            if self.framefunc is None:
+                self.framefunc = frameargs[0]
+                return self
+
+            if _THREAD_LOCALS._current_eventloop is None:
+                raise InvalidOperationException("Can't call frame without a running event loop")
+            if self.cache is not None:
+                return self.cache._call(self, frameargs, framekwargs)
+            return self._create(frameargs, framekwargs)
+
+        def _create(self, frameargs, framekwargs, exception_handler=None):
+            frame = super(Frame, self.__class__.frameclass).__new__(self.__class__.frameclass)
+            frame.__init__(*self.frameclassargs, **self.frameclasskwargs)
+            if exception_handler is not None:
+                frame.exception_handler = exception_handler
+            frame._stream_buffer = self.buffer
+            if self.limit is None or self.limit._acquire(frame, self.framefunc, frameargs, framekwargs):
+                frame.create(self.framefunc, *frameargs, **framekwargs)
+            return frame
+
+        def __enter__(self):
+            if self.framefunc is None:
+                # Instantiate frame class with empty framefunc
+                self.framefunc = lambda: None
+                self.framefunc.__name__ = self.frameclass.__name__
+                with_frame = self._create((), {})
+                self.framefunc = None
+            else:
+                # Instantiate frame class with self.framefunc
+                with_frame = self._create((), {})
+            with_frame._is_inline_frame = True
+
+            # Activate frame instance
+            non_with_frame_parent = _THREAD_LOCALS._current_frame
+            while non_with_frame_parent._is_inline_frame:
+                non_with_frame_parent = non_with_frame_parent._parent
+            non_with_frame_parent._current_inline_frame = with_frame._current_inline_frame
+            _THREAD_LOCALS._current_frame = with_frame._current_inline_frame
+
+            return with_frame
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            # Activate parent
+            non_with_frame_parent = _THREAD_LOCALS._current_frame
+            while non_with_frame_parent._is_inline_frame:
+                non_with_frame_parent = non_with_frame_parent._parent
+            non_with_frame_parent._current_inline_frame = _THREAD_LOCALS._current_frame._parent
+            _THREAD_LOCALS._current_frame = _THREAD_LOCALS._current_frame._parent
+
+    def __new__(cls, *frameclassargs, **frameclasskwargs):
+        if len(frameclassargs) == 1 and not frameclasskwargs and callable(frameclassargs[0]): # If @frame was called without parameters
+            return cls.Factory(frameclassargs[0], (), {})
+        else: # If @frame was called with parameters
+            return cls.Factory(None, frameclassargs, frameclasskwargs)
+
+    def __init__(self, startup_behaviour=FrameStartupBehaviour.delayed, thread_idx=None):
+        if thread_idx is not None and (thread_idx < 0 or thread_idx >= len(_THREAD_LOCALS._current_eventloop.eventloops)):
+            raise ValueError("thread_idx must be an index between 0 and " + str(len(_THREAD_LOCALS._current_eventloop.eventloops)))
+        super().__init__(self.__class__.__name__, singleshot=True, lifebound=True)
+        _THREAD_LOCALS._current_frame = self._current_inline_frame
+        self.startup_behaviour = startup_behaviour
+        self._children = []
+        self._activechild = None
+        self._primitives = []
+        self._generator = None
+        self._generator_eventloop = None
+        self._pending_removal = None
+        self._pending_removal_lock = threading.Lock()
+        self._limit = None
+        self._freeing = False
+        self._ancestors = None # Lazily built mapping from frame class to closest self-or-ancestor of that class (see find_parent)
+        self._stream = None # Channel of generated values, if the frame function is an async generator
+        self._stream_buffer = 16
+        self.deadline = getattr(self._parent, 'deadline', None)
+        self._deadline_owner = getattr(self._parent, '_deadline_owner', None) # The timeout whose timer enforces deadline
+        self.ready = Event(str(self.__name__) + ".ready", True)
+        self.ready.ready = self.ready # Set ready state of ready event to itself. This way the ready event will propagate through `await frame.ready`
+        self.free = Event(str(self.__name__) + ".free", False)
+        self._eventloop_affinity = _THREAD_LOCALS._current_eventloop
+        if thread_idx is not None:
+            self._eventloop_affinity = self._eventloop_affinity.eventloops[thread_idx]
+        self._remove_lock = threading.Lock()
+        _THREAD_LOCALS._current_frame = self._current_inline_frame._parent
+
+    def create(self, framefunc, *frameargs, **framekwargs):
+        """Start the frame function with the given arguments.
+
+        Args:
+            framefunc (function): A coroutine, async generator or regular function controlling the behaviour of this frame.
+                                If `framefunc` is a coroutine, then the frame only exists until the coroutine exits.
+                                If `framefunc` is an async generator, then the frame can be iterated with ``async for``
+                                to receive the generated values.
+        """
+
+        if framefunc and not self.removed and self._generator is None:
+            self.__name__ = framefunc.__name__
+            self.ready.__name__ = str(self.__name__) + ".ready"
+            self.free.__name__ = str(self.__name__) + ".free"
+
+            # Activate self
+            _THREAD_LOCALS._current_frame = self._current_inline_frame
+
+            hasself = 'self' in inspect.signature(framefunc).parameters
+            self._generator = framefunc(self, *frameargs, **framekwargs) if hasself else framefunc(*frameargs, **framekwargs)
+            if inspect.isasyncgen(self._generator): # If framefunc is an async generator, ...
+                # Run a coroutine that passes the generated values to consumers through a bounded channel
+                self._stream = Channel(self._stream_buffer)
+                self._generator = self._produce(self._generator)
+
+            if inspect.isawaitable(self._generator): # If framefunc is a coroutine
+                if self.startup_behaviour == FrameStartupBehaviour.delayed:
+                    # Post coroutine to the event queue
+                    _THREAD_LOCALS._current_eventloop.postevent(self, None, 0.0)
+                elif self.startup_behaviour == FrameStartupBehaviour.immediate:
+                    # Start coroutine
+                    try:
+                        self._step(None, None)
+                    except (StopIteration, GeneratorExit):
+                        pass
+                    finally:
+                        # Activate parent
+                        _THREAD_LOCALS._current_frame = self._current_inline_frame._parent
+                else:
+                    raise ValueError('startup_behaviour must be FrameStartupBehaviour.delayed or FrameStartupBehaviour.immediate')
+            else: # If framefunc is a regular function
+                AbstractEventLoop.sendevent(self.ready, None, None, True) # Send ready event
+
+            # Activate parent
+            _THREAD_LOCALS._current_frame = self._current_inline_frame._parent
+
+    async def _produce(self, generator):
+        """Run an async generator frame function, putting generated values into the stream of this frame."""
+
+        try:
+            while True:
+                try:
+                    value = await _forward_generator_exit(generator.__anext__())
+                except StopAsyncIteration:
+                    break
+                await self._stream.put(value) # Suspend while the buffer is full
+        finally:
+            self._stream.close()
+            if not generator.ag_running: # If the generator was suspended at a yield, ...
+                # Run the generator's cleanup code, unless it awaits something
+                closer = generator.aclose()
+                try:
+                    closer.send(None)
+                except StopIteration:
+                    pass
+                else:
+                    closer.close()
+
+    def __aiter__(self):
+        if self._stream is None:
+            raise TypeError("Only frames of async generator functions can be iterated")
+        return self
+
+    async def __anext__(self):
+        """Receive the next value generated by the frame function.
+
+        If the iterating frame is removed while waiting for a value, this frame is removed as well.
+
+        Raises:
+            StopAsyncIteration: If the frame function returned, raised an exception or the frame was removed.
+        """
+
+        try:
+            return await self._stream.get()
+        except ChannelClosedException:
+            raise StopAsyncIteration
+        except GeneratorExit: # If the consumer was removed, ...
+            self._remove() # Stop the producer
+            raise
+
+    def _step(self, sender, msg):
+        """Resume the frame coroutine.
+
+        Args:
+            sender (Awaitable): The resumed awaitable.
+            msg: A message to be forwarded to the coroutine or None to start the coroutine.
+
+        Raises:
+            StopIteration: Raised if the coroutine finished with a result.
+            GeneratorExit: Raised if the coroutine finished without a result.
+            Exception: Raised if the coroutine encountered an error.
+        """
+
+        if self.removed:
+            stop = StopIteration()
+            stop.value = self._result
+            raise stop
+
+        if self._generator is not None:
+            self._generator_eventloop = _THREAD_LOCALS._current_eventloop
+            try:
+                awaitable = self._generator.send(msg) # Continue coroutine
+            except (StopIteration, GeneratorExit): # If frame finished
+                self._generator_eventloop = None
+                if self._pending_removal is not None: self._finish_removal() # Finish removal requested by another eventloop
+                if msg is None: AbstractEventLoop.sendevent(self.ready, None, None, True) # Send ready event if frame finished without ever being awaited
+                raise # Propagate event
+            except Exception as err: # If frame raised exception
+                self._generator_eventloop = None
+                if self._pending_removal is not None: self._finish_removal() # Finish removal requested by another eventloop
+                raise # Propagate event
+            else: # If frame awaits awaitable
+                self._generator_eventloop = None
+                if self._pending_removal is not None: # If another eventloop requested removal while the coroutine was running
+                    self._finish_removal()
+                    return
+                awaitable._listeners.add(self) # Listen to events of awaitable
+                if awaitable: # If awaitable finished on another thread before this frame started listening, ...
+                    # Awaitables are marked finished before their listeners are woken, so if this frame is still listening,
+                    # it was added after the listeners were woken and has to be resumed here
+                    try:
+                        awaitable._listeners.remove(self)
+                    except KeyError:
+                        pass # The finishing thread already resumed this frame
+                    else:
+                        _THREAD_LOCALS._current_eventloop._enqueue(0, self.process, (awaitable, awaitable._result), self._eventloop_affinity)
+
+                # Send ready event if not yet ready and awaitable is ready or doesn't have a ready event
+                if getattr(awaitable, 'ready', True) and not self.ready: # If awaitable is ready or awaitable doesn't have a ready event
+                    AbstractEventLoop.sendevent(self.ready, None, None, True)
+
+    def _wake_listeners(self, process_counter, blocking, inline=True):
+        limit = self._limit
+        if limit is not None: # If this frame occupies a slot of a concurrency limit, ...
+            limit._release(self) # Free the slot before waking listeners
+        super()._wake_listeners(process_counter, blocking, inline)
+
+    def _set_deadline(self, deadline, owner, replaced):
+        """Tighten the deadline of this frame and all child frames.
+
+        Args:
+            deadline (float): The new deadline.
+            owner (timeout): The timeout whose timer enforces the new deadline.
+            replaced (dict): A mapping from frame to its previous deadline and owner, for frames whose deadline changed.
+        """
+
+        if self.deadline is None or deadline < self.deadline:
+            replaced[self] = (self.deadline, self._deadline_owner)
+            self.deadline = deadline
+            self._deadline_owner = owner
+            for child in self._children[:]:
+                if isinstance(child, Frame):
+                    child._set_deadline(deadline, owner, replaced)
+
+    def _release_deadline(self, owner, replaced):
+        """Drop the deadline of a timeout that was removed before it expired from this frame and all child frames.
+
+        Frames fall back to the deadline they had before, if the timeout that set it is still running, or to the
+        deadline of their parent frame, whichever is earlier.
+
+        Args:
+            owner (timeout): The removed timeout.
+            replaced (dict): The previous deadlines and owners of frames, as collected by :meth:`_set_deadline`.
+        """
+
+        if self._deadline_owner is not owner:
+            return # Child frames only inherit deadlines through their parent frame
+        deadline = getattr(self._parent, 'deadline', None)
+        deadline_owner = getattr(self._parent, '_deadline_owner', None)
+        previous_deadline, previous_owner = replaced.get(self, (None, None))
+        if previous_deadline is not None and not previous_owner.removed and (deadline is None or previous_deadline < deadline):
+            deadline, deadline_owner = previous_deadline, previous_owner
+        self.deadline = deadline
+        self._deadline_owner = deadline_owner
+        for child in self._children[:]:
+            if isinstance(child, Frame):
+                child._release_deadline(owner, replaced)
+
+    def _mark_freeing(self, value):
+        self._freeing = value
+        for child in self._children:
+            if isinstance(child, Frame):
+                child._mark_freeing(value)
+
+    def _send_free_event(self, free_args, process_counter):
+        process_counter.add(len(self._children))
+
+        # Send child frame free events
+        for child in self._children[:]:
+            if not child.removed and isinstance(child, Frame):
+                child._send_free_event(free_args, process_counter)
+            else:
+                process_counter.sub(1)
+
+        # Send current frame free event
+        AbstractEventLoop.sendevent(self.free, free_args, process_counter, True)
+
+    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self._freeing: # If this frame's free event is being processed, ...
+            self._remove_stage2(process_counter, blocking, ondone) # Remove the frame
+        else: # If this frame's free event wasn't send yet, ...
+            self._mark_freeing(True) # Mark this frame and all children for removal
+
+            free_args = FreeEventArgs()
+            def after_free():
+                if free_args.cancel: # If the free event was canceled, ...
+                    self._mark_freeing(False) # Unmark this frame and all children from removal
+                    ondone(False) # Awake awaiting frames with value 'False'
+                    if process_counter:
+                        process_counter.sub(1)
+                elif self._removed: # If this frame was removed as a result of the free event, ...
+                    ondone(True) # Awake awaiting frames with value 'True'
+                    if process_counter:
+                        process_counter.sub(1)
+                else: # If the free event wasn't canceled and didn't remove this frame, ...
+                    self._remove_stage2(process_counter, blocking, ondone) # Remove this frame
+            # Hold an extra count while sending the free event, so that a synchronously processed free event continues
+            # removal from this call instead of from within the free event's trampoline
+            free_counter = _AtomicCounter(2, after_free)
+            self._send_free_event(free_args, free_counter)
+            free_counter.sub(1)
+
+    def _remove_stage2(self, process_counter=None, blocking=False, ondone=lambda result: None):
+        if self.removed or not self._remove_lock.acquire(blocking=False): # If this frame was closed in response to the free event or removal is already in progress, ...
+            ondone(False)
+            if process_counter:
+                process_counter.sub(1) # Remove process: Frame._remove_stage2
+        else:
+            try:
+                # Remove child frames
+                genexit = None
+                if process_counter:
+                    process_counter.add(len(self._children))
+                while self._children:
+                    try:
+                        self._children[-1]._remove(process_counter, blocking)
+                    except GeneratorExit as err:
+                        genexit = err # Delay raising GeneratorExit
+
+                # Remove primitives
+                while self._primitives:
+                    self._primitives[-1].remove()
+
+                # Stop framefunc
+                deferred = False
+                if self._generator: # If framefunc is a coroutine
+                    genevtlp = self._generator_eventloop # Avoid race condition between if and elif
+                    if genevtlp == _THREAD_LOCALS._current_eventloop: # If the coroutine is running on the current eventloop
+                        # Calling coroutine.close() from within the coroutine is illegal, so we throw a GeneratorExit manually instead
+                        try:
+                            self._generator.close()
+                        except ValueError:
+                            genexit = GeneratorExit()
+                        self._generator = None
+                    elif genevtlp is not None: # If the coroutine is running on another eventloop
+                        # Let the eventloop running the coroutine close it and finish removal once the current step
+                        # returns. The remove lock stays acquired until then.
+                        deferred = True
+                        self._pending_removal = (process_counter, blocking, ondone)
+                        if self._generator_eventloop is None: # If the step returned before it could see the request
+                            self._finish_removal()
+                    else: # If the coroutine isn't running
+                        self._generator.close()
+                        self._generator = None
+
+                # Remove awaitable
+                if not deferred:
+                    super()._remove(process_counter, blocking, ondone)
+            finally:
+                if not deferred:
+                    self._remove_lock.release()
+
+                # Raise delayed GeneratorExit exception
+                if genexit:
+                    raise genexit
+
+    def _finish_removal(self):
+        """Close the coroutine and finish a removal that was deferred by :meth:`Frame._remove_stage2`.
+
+        This is called by whichever thread first notices that the coroutine stopped running.
+        """
+
+        with self._pending_removal_lock:
+            pending_removal = self._pending_removal
+            self._pending_removal = None
+        if pending_removal is None: # If another thread already finished removal
+            return
+
+        process_counter, blocking, ondone = pending_removal
+        try:
+            self._generator.close()
+            self._generator = None
+
+            # Remove awaitable
+            super()._remove(process_counter, blocking, ondone)
+        finally:
+            self._remove_lock.release()
+
+class PFrame(Frame):
+    """A parallel :class:`Frame` that can run on any thread.
+
+    Multithreading can be enabled for any frame by changing its base class to
+    :class:`PFrame`.
+
+    The only difference between :class:`Frame` and :class:`PFrame` is that
+    instances of :class:`PFrame` are not restricted to run on the same thread as
+    their parent frame.
+
+    Args:
+        startup_behaviour (FrameStartupBehaviour, optional): Defaults to FrameStartupBehaviour.delayed.
+            Controls whether the frame is started immediately or queued on the eventloop.
+        thread_idx (int, optional): Defaults to None. If set, forces the scheduler to affiliate this frame with the given thread.
+
+    Raises:
+        ValueError: If `thread_idx` is outside the range of allocated threads.
+
+            The number of allocated threads is controlled by the `num_threads` parameter of :meth:`AbstractEventLoop.run`.
+    """
+
+    def __init__(self, startup_behaviour=FrameStartupBehaviour.delayed, thread_idx=None):
+        super().__init__(startup_behaviour, thread_idx)
+        if thread_idx is None:
+            self._eventloop_affinity = None
+
+
+class Primitive(object):
+    """An object owned by a frame of the specified frame class.
+
+    A primitive has to be created within the frame function of its owner or within the frame function of any child frame of its owning frame class.
+    If it is created within a child frame, it will still be registered with the closest parent of the owning frame class.
+
+    Args:
+        owner (class): The owning frame class.
+
+    Raises:
+        TypeError: Raised if owner is not a frame class.
+        Exception: Raised if a primitive is created outside the frame function of its owning frame class.
+    """
+
+    def __init__(self, owner):
+        self._removed = False
+
+        # Validate parameters
+        if not issubclass(owner, Frame):
+            raise TypeError("'owner' must be of type Frame")
+
+        # Find parent frame of class 'owner'
+        self._owner = find_parent(owner)
+        if self._owner is None:
+            raise InvalidOperationException(self.__class__.__name__ + " can't be defined outside " + owner.__name__)
+
+        # Register with parent frame
+        self._owner._primitives.append(self)
+
+    def _ondispose(self):
+        """Virtual function for cleaning up a derived class.
+
+        This function is called before the class is deleted."""
 
-    A frame is an instance of a frame class. Use the nested Factory class to
-    create frames.
+        pass
 
-    The factory class is created by decorating a function or coroutine with
-    ``@FRAME``, where ``FRAME`` is the frame class.
+    def remove(self):
+        """Remove this primitive from its owner.
 
-    Example: ::
+        Returns:
+            bool: If True, this event was removed. If False the request was either canceled, or the event had already been removed before
+        """
 
-        class MyFrameClass(Frame):
-            pass
+        if self._removed:
+            return False
+        self._removed = True
+        self._owner._primitives.remove(self)
+        self._ondispose()
+        del self
+        return True
 
-        @MyFrameClass
-        async def my_frame_factory():
-            pass
 
-        assert(type(my_frame_factory) == MyFrameClass.Factory)
-        my_frame = my_frame_factory()
-        assert(type(my_frame) == MyFrameClass)
+class ChannelClosedException(Exception):
+    """Raised when putting items into a closed channel or getting items from a closed and empty channel.
 
     Args:
-        startup_behaviour (FrameStartupBehaviour, optional): Defaults to FrameStartupBehaviour.delayed.
-            Controls whether the frame is started immediately or queued on the eventloop.
-        thread_idx (int, optional): Defaults to None. If set, forces the scheduler to affiliate this frame with the given thread.
+        msg (str): Human readable string describing the exception.
+    """
 
-    Attributes:
-        free (Event): An event that fires just before the frame is removed.
-        ready (Event): An event that fires the first time the frame is suspended (using ``await``) or goes out of scope.
+    def __init__(self, msg):
+        super().__init__(msg)
 
-    Raises:
-        ValueError: If `thread_idx` is outside the range of allocated threads.
+class Channel(object):
+    """A threadsafe queue for passing items between frames.
 
-            The number of allocated threads is controlled by the `num_threads` parameter of :meth:`AbstractEventLoop.run`.
+    Unlike events, items put into a channel are buffered until a frame gets them.
+    If the channel is full, producers are suspended until consumers make room.
+    Producers and consumers can be frames or parallel frames running on different eventloops.
+
+    Example: ::
+
+        channel = Channel(16)
+
+        @PFrame
+        async def producer():
+            for i in range(100):
+                await channel.put(i)
+            channel.close()
+
+        @PFrame
+        async def consumer():
+            async for item in channel:
+                print(item)
+
+    Args:
+        maxsize (int, optional): Defaults to 0. The maximum number of buffered items. If 0, the channel is unbounded.
     """
 
-    class Factory(object):
-        """A frame function declared in the context of a frame class.
-        
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items = collections.deque()
+        self._getters = collections.deque()
+        self._putters = collections.deque()
+        self._closed = False
+
+    def __len__(self):
+        """The number of buffered items."""
+        return len(self._items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Get the next item.
+
+        Raises:
+            StopAsyncIteration: If the channel was closed and all items have been consumed.
+        """
+
+        try:
+            return await self.get()
+        except ChannelClosedException:
+            raise StopAsyncIteration
+
+    @property
+    def closed(self):
+        """Boolean property, indicating whether this channel has been closed."""
+        return self._closed
+
+    def close(self):
+        """Close the channel.
+
+        Items that have already been put into the channel can still be received.
+        All suspended producers and consumers are woken up.
+        """
+
+        with self._lock:
+            self._closed = True
+            waiters = list(self._getters) + list(self._putters)
+            self._getters.clear()
+            self._putters.clear()
+        for waiter in waiters:
+            waiter.wake()
+
+    async def put(self, item):
+        """Put an item into the channel, waiting while the channel is full.
+
         Args:
-            framefunc (Callable): The function or coroutine that describes the frame's behaviour.
-            frameclassargs (tuple): Positional arguments to the frame class.
-            frameclasskwargs (dict): Keyword arguments to the frame class.
+            item: The item to put into the channel.
+
+        Raises:
+            ChannelClosedException: If the channel has been closed.
         """
 
-        def __init__(self, framefunc, frameclassargs, frameclasskwargs):
-            self.framefunc = framefunc
-            self.frameclassargs = frameclassargs
-            self.frameclasskwargs = frameclasskwargs
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise ChannelClosedException("Can't put items into a closed channel")
+                if self.maxsize <= 0 or len(self._items) < self.maxsize:
+                    self._items.append(item)
+                    getter = self._getters.popleft() if self._getters else None
+                    break
+                waiter = self._wait(self._putters)
+            await self._suspend(waiter, self._putters)
+        if getter is not None:
+            getter.wake()
 
-        def __call__(self, *frameargs, **framekwargs):
-            """Produce an instance of the frame.
-            
-            Raises:
-                InvalidOperationException: Raised when no event loop is currently running.
-            
-            Returns:
-                Frame: The newly created frame instance.
-            """
+    async def put_batch(self, items):
+        """Put multiple items into the channel, waiting whenever the channel is full.
 
-            if self.framefunc is None:
-                self.framefunc = frameargs[0]
-                return self
+        As many items as fit into the channel are moved at once.
 
-            if _THREAD_LOCALS._current_eventloop is None:
-                raise InvalidOperationException("Can't call frame without a running event loop")
-            frame = super(Frame, self.__class__.frameclass).__new__(self.__class__.frameclass)
-            frame.__init__(*self.frameclassargs, **self.frameclasskwargs)
-            frame.create(self.framefunc, *frameargs, **framekwargs)
-            return frame
+        Args:
+            items (Iterable): The items to put into the channel.
 
-        def __enter__(self):
-            if self.framefunc is None:
-                # Instantiate frame class with empty framefunc
-                self.framefunc = lambda: None
-                self.framefunc.__name__ = self.frameclass.__name__
-                with_frame = self()
-                self.framefunc = None
+        Raises:
+            ChannelClosedException: If the channel has been closed.
+        """
+
+        items = list(items)
+        start = 0
+        while start < len(items):
+            with self._lock:
+                if self._closed:
+                    raise ChannelClosedException("Can't put items into a closed channel")
+                end = len(items) if self.maxsize <= 0 else min(len(items), start + self.maxsize - len(self._items))
+                if end > start:
+                    self._items.extend(items[start:end])
+                    getters = [self._getters.popleft() for _ in range(min(end - start, len(self._getters)))]
+                    start = end
+                    waiter = None
+                else:
+                    waiter = self._wait(self._putters)
+            if waiter is not None:
+                await self._suspend(waiter, self._putters)
             else:
-                # Instantiate frame class with self.framefunc
-                with_frame = self()
-            with_frame._is_inline_frame = True
+                for getter in getters:
+                    getter.wake()
 
-            # Activate frame instance
-            non_with_frame_parent = _THREAD_LOCALS._current_frame
-            while non_with_frame_parent._is_inline_frame:
-                non_with_frame_parent = non_with_frame_parent._parent
-            non_with_frame_parent._current_inline_frame = with_frame._current_inline_frame
-            _THREAD_LOCALS._current_frame = with_frame._current_inline_frame
+    async def get(self):
+        """Get an item from the channel, waiting while the channel is empty.
 
-            return with_frame
+        Returns:
+            The oldest item in the channel.
 
-        def __exit__(self, exc_type, exc_val, exc_tb):
-            # Activate parent
-            non_with_frame_parent = _THREAD_LOCALS._current_frame
-            while non_with_frame_parent._is_inline_frame:
-                non_with_frame_parent = non_with_frame_parent._parent
-            non_with_frame_parent._current_inline_frame = _THREAD_LOCALS._current_frame._parent
-            _THREAD_LOCALS._current_frame = _THREAD_LOCALS._current_frame._parent
+        Raises:
+            ChannelClosedException: If the channel has been closed and all items have been consumed.
+        """
 
-    def __new__(cls, *frameclassargs, **frameclasskwargs):
-        if len(frameclassargs) == 1 and not frameclasskwargs and callable(frameclassargs[0]): # If @frame was called without parameters
-            return cls.Factory(frameclassargs[0], (), {})
-        else: # If @frame was called with parameters
-            return cls.Factory(None, frameclassargs, frameclasskwargs)
+        while True:
+            with self._lock:
+                if self._items:
+                    item = self._items.popleft()
+                    putter = self._putters.popleft() if self._putters else None
+                    break
+                if self._closed:
+                    raise ChannelClosedException("Can't get items from a closed channel")
+                waiter = self._wait(self._getters)
+            await self._suspend(waiter, self._getters)
+        if putter is not None:
+            putter.wake()
+        return item
 
-    def __init__(self, startup_behaviour=FrameStartupBehaviour.delayed, thread_idx=None):
-        if thread_idx is not None and (thread_idx < 0 or thread_idx >= len(_THREAD_LOCALS._current_eventloop.eventloops)):
-            raise ValueError("thread_idx must be an index between 0 and " + str(len(_THREAD_LOCALS._current_eventloop.eventloops)))
-        super().__init__(self.__class__.__name__, singleshot=True, lifebound=True)
-        _THREAD_LOCALS._current_frame = self._current_inline_frame
-        self.startup_behaviour = startup_behaviour
-        self._children = []
-        self._activechild = None
-        self._primitives = []
-        self._generator = None
-        self._generator_eventloop = None
-        self._freeing = False
-        self.ready = Event(str(self.__name__) + ".ready", True)
-        self.ready.ready = self.ready # Set ready state of ready event to itself. This way the ready event will propagate through `await frame.ready`
-        self.free = Event(str(self.__name__) + ".free", False)
-        self._eventloop_affinity = _THREAD_LOCALS._current_eventloop
-        if thread_idx is not None:
-            self._eventloop_affinity = self._eventloop_affinity.eventloops[thread_idx]
-        self._remove_lock = threading.Lock()
-        _THREAD_LOCALS._current_frame = self._current_inline_frame._parent
+    async def get_batch(self, max_items=None):
+        """Get all buffered items at once, waiting while the channel is empty.
 
-    def create(self, framefunc, *frameargs, **framekwargs):
-        """Start the frame function with the given arguments.
+        Args:
+            max_items (int, optional): Defaults to None. If set, at most `max_items` items are returned.
+
+        Returns:
+            list: The oldest items in the channel. The list contains at least one item.
+
+        Raises:
+            ChannelClosedException: If the channel has been closed and all items have been consumed.
+        """
+
+        while True:
+            with self._lock:
+                if self._items:
+                    count = len(self._items) if max_items is None else min(max_items, len(self._items))
+                    items = [self._items.popleft() for _ in range(count)]
+                    putters = [self._putters.popleft() for _ in range(min(count, len(self._putters)))]
+                    break
+                if self._closed:
+                    raise ChannelClosedException("Can't get items from a closed channel")
+                waiter = self._wait(self._getters)
+            await self._suspend(waiter, self._getters)
+        for putter in putters:
+            putter.wake()
+        return items
+
+    def _wait(self, waiters):
+        """Register the current frame as waiting for the channel.
+
+        This function must be called while holding `self._lock`.
 
         Args:
-            framefunc (function): A coroutine or regular function controlling the behaviour of this frame.
-                                If `framefunc` is a coroutine, then the frame only exists until the coroutine exits.
+            waiters (collections.deque): Either the list of waiting consumers or the list of waiting producers.
+
+        Returns:
+            _Waiter: The waiter to pass to :meth:`Channel._suspend`.
         """
 
-        if framefunc and not self.removed and self._generator is None:
-            self.__name__ = framefunc.__name__
-            self.ready.__name__ = str(self.__name__) + ".ready"
-            self.free.__name__ = str(self.__name__) + ".free"
+        waiter = _Waiter("Channel.wait")
+        waiters.append(waiter)
+        return waiter
 
-            # Activate self
-            _THREAD_LOCALS._current_frame = self._current_inline_frame
+    async def _suspend(self, waiter, waiters):
+        """Await a waiter registered with :meth:`Channel._wait`.
 
-            hasself = 'self' in inspect.signature(framefunc).parameters
-            self._generator = framefunc(self, *frameargs, **framekwargs) if hasself else framefunc(*frameargs, **framekwargs)
+        If the awaiting frame is removed, its place in line is handed to the next waiter.
+        """
 
-            if inspect.isawaitable(self._generator): # If framefunc is a coroutine
-                if self.startup_behaviour == FrameStartupBehaviour.delayed:
-                    # Post coroutine to the event queue
-                    _THREAD_LOCALS._current_eventloop.postevent(self, None, 0.0)
-                elif self.startup_behaviour == FrameStartupBehaviour.immediate:
-                    # Start coroutine
-                    try:
-                        self._step(None, None)
-                    except (StopIteration, GeneratorExit):
-                        pass
-                    finally:
-                        # Activate parent
-                        _THREAD_LOCALS._current_frame = self._current_inline_frame._parent
+        try:
+            await waiter
+        except GeneratorExit: # If the awaiting frame was removed
+            with self._lock:
+                try:
+                    waiters.remove(waiter)
+                except ValueError: # If the waiter was already woken, ...
+                    # Wake the next waiter instead
+                    next_waiter = waiters.popleft() if waiters else None
                 else:
-                    raise ValueError('startup_behaviour must be FrameStartupBehaviour.delayed or FrameStartupBehaviour.immediate')
-            else: # If framefunc is a regular function
-                AbstractEventLoop.sendevent(self.ready, None, None, True) # Send ready event
+                    next_waiter = None
+            if next_waiter is not None:
+                next_waiter.wake()
+            raise
 
-            # Activate parent
-            _THREAD_LOCALS._current_frame = self._current_inline_frame._parent
+class RateLimiter(object):
+    """A threadsafe token bucket limiting the rate of operations.
 
-    def _step(self, sender, msg):
-        """Resume the frame coroutine.
+    The bucket holds up to `capacity` tokens and is refilled with `rate` tokens per second. Frames take tokens with
+    ``await limiter.acquire(n)``, waiting while not enough tokens are available. Waiting frames are served in order, so
+    frames asking for many tokens aren't starved by frames asking for few. A single timer wakes the first waiting frames
+    as soon as the bucket holds enough tokens for them. Frames and parallel frames on any eventloop can share a limiter.
+
+    Example: ::
+
+        limiter = RateLimiter(10) # 10 requests per second
+
+        @PFrame
+        async def request(url):
+            await limiter.acquire()
+            ...
+
+    Args:
+        rate (float): The number of tokens added per second.
+        capacity (float, optional): Defaults to max(1, rate). The maximum number of tokens in the bucket. This limits the
+            size of bursts after the limiter wasn't used for a while. The bucket starts full. Tokens that would overflow
+            the bucket are lost, so capacities below a few milliseconds worth of tokens reduce the achieved rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, rate) if capacity is None else capacity
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiters = collections.deque() # (n, _Waiter) tuples in arrival order
+        self._timer = None
+        self._timer_armed = False
+
+    @property
+    def tokens(self):
+        """The number of currently available tokens."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    @property
+    def waiting(self):
+        """The number of frames waiting for tokens."""
+        return len(self._waiters)
+
+    def try_acquire(self, n=1):
+        """Take `n` tokens if they are available and no other frame is waiting for tokens.
 
         Args:
-            sender (Awaitable): The resumed awaitable.
-            msg: A message to be forwarded to the coroutine or None to start the coroutine.
+            n (float, optional): Defaults to 1. The number of tokens to take.
 
-        Raises:
-            StopIteration: Raised if the coroutine finished with a result.
-            GeneratorExit: Raised if the coroutine finished without a result.
-            Exception: Raised if the coroutine encountered an error.
+        Returns:
+            bool: True, if the tokens were taken.
         """
 
-        if self.removed:
-            stop = StopIteration()
-            stop.value = self._result
-            raise stop
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._waiters or self._tokens < n:
+                return False
+            self._tokens -= n
+            return True
 
-        if self._generator is not None:
-            self._generator_eventloop = _THREAD_LOCALS._current_eventloop
-            try:
-                awaitable = self._generator.send(msg) # Continue coroutine
-            except (StopIteration, GeneratorExit): # If frame finished
-                self._generator_eventloop = None
-                if msg is None: AbstractEventLoop.sendevent(self.ready, None, None, True) # Send ready event if frame finished without ever being awaited
-                raise # Propagate event
-            except Exception as err: # If frame raised exception
-                self._generator_eventloop = None
-                raise # Propagate event
-            else: # If frame awaits awaitable
-                self._generator_eventloop = None
-                awaitable._listeners.add(self) # Listen to events of awaitable
+    async def acquire(self, n=1):
+        """Take `n` tokens, waiting until they are available.
 
-                # Send ready event if not yet ready and awaitable is ready or doesn't have a ready event
-                if getattr(awaitable, 'ready', True) and not self.ready: # If awaitable is ready or awaitable doesn't have a ready event
-                    AbstractEventLoop.sendevent(self.ready, None, None, True)
+        Args:
+            n (float, optional): Defaults to 1. The number of tokens to take.
 
-    def _mark_freeing(self, value):
-        self._freeing = value
-        for child in self._children:
-            if isinstance(child, Frame):
-                child._mark_freeing(value)
+        Raises:
+            ValueError: If `n` exceeds the capacity of the bucket.
+        """
+
+        if n > self.capacity:
+            raise ValueError("Can't acquire more tokens than the capacity of the limiter")
+        with self._lock:
+            self._refill(time.monotonic())
+            if not self._waiters and self._tokens >= n:
+                self._tokens -= n
+                return
+            waiter = _Waiter("RateLimiter.acquire")
+            entry = (n, waiter)
+            self._waiters.append(entry)
+            self._arm_timer(time.monotonic())
+
+        try:
+            await waiter
+        except GeneratorExit: # If the awaiting frame was removed
+            with self._lock:
+                try:
+                    self._waiters.remove(entry)
+                except ValueError: # If the tokens were already granted, ...
+                    self._tokens = min(self.capacity, self._tokens + n) # Return them
+                granted = self._grant(time.monotonic())
+            for waiter in granted:
+                waiter.wake()
+            raise
+
+    def _refill(self, now):
+        """Add the tokens that accumulated since the last refill. This function must be called while holding the lock."""
 
-    def _send_free_event(self, free_args, process_counter):
-        process_counter.add(len(self._children))
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
 
-        # Send child frame free events
-        for child in self._children[:]:
-            if not child.removed and isinstance(child, Frame):
-                child._send_free_event(free_args, process_counter)
-            else:
-                process_counter.sub(1)
+    def _grant(self, now):
+        """Hand tokens to the first waiters in line and rearm or stop the timer.
 
-        # Send current frame free event
-        AbstractEventLoop.sendevent(self.free, free_args, process_counter, True)
+        This function must be called while holding the lock.
 
-    def _remove(self, process_counter=None, blocking=False, ondone=lambda result: None):
-        if self._freeing: # If this frame's free event is being processed, ...
-            self._remove_stage2(process_counter, blocking, ondone) # Remove the frame
-        else: # If this frame's free event wasn't send yet, ...
-            self._mark_freeing(True) # Mark this frame and all children for removal
+        Returns:
+            list: The waiters to wake up.
+        """
 
-            free_args = FreeEventArgs()
-            def after_free():
-                if free_args.cancel: # If the free event was canceled, ...
-                    self._mark_freeing(False) # Unmark this frame and all children from removal
-                    ondone(False) # Awake awaiting frames with value 'False'
-                    if process_counter:
-                        process_counter.sub(1)
-                elif self._removed: # If this frame was removed as a result of the free event, ...
-                    ondone(True) # Awake awaiting frames with value 'True'
-                    if process_counter:
-                        process_counter.sub(1)
-                else: # If the free event wasn't canceled and didn't remove this frame, ...
-                    self._remove_stage2(process_counter, blocking, ondone) # Remove this frame
-            self._send_free_event(free_args, _AtomicCounter(1, after_free))
+        self._refill(now)
+        granted = []
+        while self._waiters and self._waiters[0][0] <= self._tokens:
+            n, waiter = self._waiters.popleft()
+            self._tokens -= n
+            granted.append(waiter)
+        if self._waiters:
+            self._arm_timer(now)
+        elif self._timer is not None: # If nobody is waiting anymore, ...
+            if self._timer_armed:
+                self._timer.cancel()
+            self._timer, self._timer_armed = None, False
+        return granted
+
+    def _arm_timer(self, now):
+        """Start the timer to expire once the first waiter in line can be served, unless it's already running.
+
+        This function must be called while holding the lock.
+        """
 
-    def _remove_stage2(self, process_counter=None, blocking=False, ondone=lambda result: None):
-        if self.removed or not self._remove_lock.acquire(blocking=False): # If this frame was closed in response to the free event or removal is already in progress, ...
-            ondone(False)
-            if process_counter:
-                process_counter.sub(1) # Remove process: Frame._remove_stage2
+        if self._timer_armed:
+            return
+        self._timer_armed = True
+        deadline = now + max(0, self._waiters[0][0] - self._tokens) / self.rate
+        if self._timer is None:
+            self._timer = _THREAD_LOCALS._current_eventloop._start_timer(deadline - now, self._expire, ())
         else:
-            try:
-                # Remove child frames
-                genexit = None
-                if process_counter:
-                    process_counter.add(len(self._children))
-                while self._children:
-                    try:
-                        self._children[-1]._remove(process_counter, blocking)
-                    except GeneratorExit as err:
-                        genexit = err # Delay raising GeneratorExit
-
-                # Remove primitives
-                while self._primitives:
-                    self._primitives[-1].remove()
+            self._timer.restart(deadline)
 
-                # Stop framefunc
-                if self._generator: # If framefunc is a coroutine
-                    genevtlp = self._generator_eventloop # Avoid race condition between if and invoke
-                    if genevtlp == _THREAD_LOCALS._current_eventloop: # If the coroutine is running on the current eventloop
-                        # Calling coroutine.close() from within the coroutine is illegal, so we throw a GeneratorExit manually instead
-                        try:
-                            self._generator.close()
-                        except ValueError:
-                            genexit = GeneratorExit()
-                        self._generator = None
-                    elif genevtlp is not None: # If the coroutine is running on another eventloop
-                        if process_counter:
-                            process_counter.add(1) # Add process: Frame._remove_stage3
-                        genevtlp._invoke(0, self._remove_stage3, (process_counter,))
-                    else: # If the coroutine isn't running
-                        self._generator.close()
-                        self._generator = None
+    def _expire(self):
+        with self._lock:
+            self._timer_armed = False
+            granted = self._grant(time.monotonic())
+        for waiter in granted:
+            waiter.wake()
 
-                # Remove awaitable
-                super()._remove(process_counter, blocking, ondone)
-            finally:
-                self._remove_lock.release()
+class Batcher(object):
+    """A threadsafe collector that groups items into batches.
 
-                # Raise delayed GeneratorExit exception
-                if genexit:
-                    raise genexit
+    Items posted from any eventloop are collected into a batch until the batch holds `max_size` items or `max_delay`
+    seconds have passed since its first item was posted, whichever comes first. Completed batches are buffered until a
+    frame gets them. Each batch uses a single timer, which is cancelled if the batch fills up first.
 
-    def _remove_stage3(self, process_counter=None):
-        genevtlp = self._generator_eventloop # Avoid race condition between if and invoke
-        if genevtlp is None or genevtlp == _THREAD_LOCALS._current_eventloop: # If the coroutine isn't running or it's running on the current eventloop
-            self._generator.close()
-            if process_counter:
-                process_counter.sub(1) # Remove process: Frame._remove_stage3
-        else: # If the coroutine is running on another eventloop
-            genevtlp._invoke(0, self._remove_stage3, (process_counter,))
+    Example: ::
 
-class PFrame(Frame):
-    """A parallel :class:`Frame` that can run on any thread.
+        batcher = Batcher(max_size=100, max_delay=0.01)
 
-    Multithreading can be enabled for any frame by changing its base class to
-    :class:`PFrame`.
+        @Frame
+        async def writer():
+            async for batch in batcher:
+                database.insert_many(batch)
 
-    The only difference between :class:`Frame` and :class:`PFrame` is that
-    instances of :class:`PFrame` are not restricted to run on the same thread as
-    their parent frame.
+        batcher.post(record) # From any frame or parallel frame
 
     Args:
-        startup_behaviour (FrameStartupBehaviour, optional): Defaults to FrameStartupBehaviour.delayed.
-            Controls whether the frame is started immediately or queued on the eventloop.
-        thread_idx (int, optional): Defaults to None. If set, forces the scheduler to affiliate this frame with the given thread.
+        max_size (int): The maximum number of items per batch.
+        max_delay (float): The maximum time in seconds an item waits for its batch to fill up.
+    """
 
-    Raises:
-        ValueError: If `thread_idx` is outside the range of allocated threads.
+    def __init__(self, max_size, max_delay):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if max_delay < 0:
+            raise ValueError("max_delay must not be negative")
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._batch = []
+        self._timer = None
+        self._batches = collections.deque()
+        self._getters = collections.deque()
+        self._closed = False
 
-            The number of allocated threads is controlled by the `num_threads` parameter of :meth:`AbstractEventLoop.run`.
-    """
+    def __len__(self):
+        """The number of completed batches that haven't been received yet."""
+        return len(self._batches)
 
-    def __init__(self, startup_behaviour=FrameStartupBehaviour.delayed, thread_idx=None):
-        super().__init__(startup_behaviour, thread_idx)
-        if thread_idx is None:
-            self._eventloop_affinity = None
+    def __aiter__(self):
+        return self
 
+    async def __anext__(self):
+        """Get the next batch.
 
-class Primitive(object):
-    """An object owned by a frame of the specified frame class.
+        Raises:
+            StopAsyncIteration: If the batcher was closed and all batches have been received.
+        """
 
-    A primitive has to be created within the frame function of its owner or within the frame function of any child frame of its owning frame class.
-    If it is created within a child frame, it will still be registered with the closest parent of the owning frame class.
+        try:
+            return await self.get()
+        except ChannelClosedException:
+            raise StopAsyncIteration
 
-    Args:
-        owner (class): The owning frame class.
+    @property
+    def closed(self):
+        """Boolean property, indicating whether this batcher has been closed."""
+        return self._closed
 
-    Raises:
-        TypeError: Raised if owner is not a frame class.
-        Exception: Raised if a primitive is created outside the frame function of its owning frame class.
-    """
+    def post(self, item):
+        """Add an item to the current batch. This function is threadsafe.
 
-    def __init__(self, owner):
-        self._removed = False
+        Args:
+            item: The item to add.
 
-        # Validate parameters
-        if not issubclass(owner, Frame):
-            raise TypeError("'owner' must be of type Frame")
+        Raises:
+            ChannelClosedException: If the batcher has been closed.
+        """
 
-        # Find parent frame of class 'owner'
-        self._owner = find_parent(owner)
-        if self._owner is None:
-            raise InvalidOperationException(self.__class__.__name__ + " can't be defined outside " + owner.__name__)
+        with self._lock:
+            if self._closed:
+                raise ChannelClosedException("Can't post items to a closed batcher")
+            self._batch.append(item)
+            if len(self._batch) >= self.max_size:
+                getter = self._release()
+            else:
+                if len(self._batch) == 1: # If item started a new batch, ...
+                    self._timer = _THREAD_LOCALS._current_eventloop._start_timer(self.max_delay, self._expire,
+                                                                                 (self._batch,))
+                getter = None
+        if getter is not None:
+            getter.wake()
 
-        # Register with parent frame
-        self._owner._primitives.append(self)
+    def flush(self):
+        """Complete the current batch without waiting for it to fill up. This function is threadsafe."""
 
-    def _ondispose(self):
-        """Virtual function for cleaning up a derived class.
+        with self._lock:
+            getter = self._release() if self._batch else None
+        if getter is not None:
+            getter.wake()
 
-        This function is called before the class is deleted."""
+    def close(self):
+        """Complete the current batch and stop accepting items.
 
-        pass
+        Batches that have already been completed can still be received. All waiting consumers are woken up.
+        """
 
-    def remove(self):
-        """Remove this primitive from its owner.
+        with self._lock:
+            self._closed = True
+            getter = self._release() if self._batch else None
+            getters = list(self._getters)
+            self._getters.clear()
+        if getter is not None:
+            getter.wake()
+        for getter in getters:
+            getter.wake()
+
+    async def get(self):
+        """Get the oldest completed batch, waiting while no batch is complete.
 
         Returns:
-            bool: If True, this event was removed. If False the request was either canceled, or the event had already been removed before
+            list: The items of the batch, in the order they were posted.
+
+        Raises:
+            ChannelClosedException: If the batcher has been closed and all batches have been received.
         """
 
-        if self._removed:
-            return False
-        self._removed = True
-        self._owner._primitives.remove(self)
-        self._ondispose()
-        del self
-        return True
+        while True:
+            with self._lock:
+                if self._batches:
+                    return self._batches.popleft()
+                if self._closed:
+                    raise ChannelClosedException("Can't get batches from a closed batcher")
+                waiter = _Waiter("Batcher.get")
+                self._getters.append(waiter)
+            try:
+                await waiter
+            except GeneratorExit: # If the awaiting frame was removed
+                with self._lock:
+                    try:
+                        self._getters.remove(waiter)
+                    except ValueError: # If the waiter was already woken, ...
+                        # Wake the next waiter instead
+                        next_waiter = self._getters.popleft() if self._getters else None
+                    else:
+                        next_waiter = None
+                if next_waiter is not None:
+                    next_waiter.wake()
+                raise
+
+    def _release(self):
+        """Complete the current batch. This function must be called while holding the lock.
+
+        Returns:
+            _Waiter: The waiting consumer to wake up or None.
+        """
+
+        self._batches.append(self._batch)
+        self._batch = []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return self._getters.popleft() if self._getters else None
+
+    def _expire(self, batch):
+        with self._lock:
+            if batch is not self._batch: # If the batch was already completed, ...
+                return
+            self._timer = None
+            getter = self._release()
+        if getter is not None:
+            getter.wake()
 
 
 def get_current_eventloop_index():
@@ -1246,6 +3711,401 @@ def find_parent(parenttype):
     """
 
     parent = _THREAD_LOCALS._current_frame
-    while parent is not None and not isinstance(parent, parenttype):
+    while parent is not None and not isinstance(parent, Frame): # Awaitables other than frames don't cache their ancestors
+        if isinstance(parent, parenttype):
+            return parent
+        parent = parent._parent
+
+    # Walk up until reaching a frame that knows the answer, then memorize the answer in all visited frames
+    # Since frame parents never change, memorized answers never get stale. Inline frames are part of the parent chain,
+    # so switching the current inline frame only changes the frame the search starts from.
+    visited = []
+    while parent is not None:
+        ancestors = parent._ancestors
+        if ancestors is None:
+            ancestors = parent._ancestors = {}
+        elif parenttype in ancestors:
+            parent = ancestors[parenttype]
+            break
+        visited.append(ancestors)
+        if isinstance(parent, parenttype):
+            break
         parent = parent._parent
+    for ancestors in visited:
+        ancestors[parenttype] = parent
     return parent
+
+
+# The run time per chunk targeted by pmap(chunksize='auto'), in seconds
+PMAP_CHUNK_DURATION = 0.01
+
+@PFrame
+async def _pmap_chunk(func, items, start, stop):
+    """Map `func` over ``items[start:stop]`` and measure the time it takes."""
+
+    starttime = time.perf_counter()
+    results = [func(item) for item in items[start:stop]]
+    return start, results, time.perf_counter() - starttime
+
+async def _pmap_chunks(func, items, chunksize):
+    """Map `func` over `items` in parallel chunks.
+
+    Yields:
+        tuple: The index of the first item of a chunk and the chunk's results, in the order chunks finish.
+    """
+
+    num_threads = len(_THREAD_LOCALS._current_eventloop.eventloops)
+    start = 0
+    if chunksize == 'auto':
+        # Measure the runtime per item by mapping one item per thread
+        start = min(num_threads, len(items))
+        elapsed = 0.0
+        async for _, (chunkstart, results, seconds) in as_completed(*[_pmap_chunk(func, items, i, i + 1) for i in range(start)]):
+            elapsed += seconds
+            yield chunkstart, results
+
+        # Size chunks to run for about PMAP_CHUNK_DURATION seconds, but keep enough chunks to balance load between threads
+        chunksize = int(PMAP_CHUNK_DURATION * start / elapsed) if elapsed > 0.0 else len(items)
+        chunksize = max(1, min(chunksize, math.ceil((len(items) - start) / (4 * num_threads))))
+
+    chunks = [_pmap_chunk(func, items, i, min(i + chunksize, len(items))) for i in range(start, len(items), chunksize)]
+    async for _, (chunkstart, results, _) in as_completed(*chunks):
+        yield chunkstart, results
+
+@Frame
+async def _pmap(func, items, chunksize):
+    results = [None] * len(items)
+    async for start, chunkresults in _pmap_chunks(func, items, chunksize):
+        results[start:start + len(chunkresults)] = chunkresults
+    return results
+
+def pmap(func, iterable, chunksize='auto'):
+    """Apply a function to every item of an iterable in parallel.
+
+    Items are mapped in chunks by parallel frames, so that the overhead of creating a frame is shared by all items
+    of a chunk.
+
+    Example: ::
+
+        squares = await pmap(lambda x: x * x, range(10000))
+
+    Args:
+        func (Callable): The function to apply to each item.
+        iterable (Iterable): The items to map.
+        chunksize (int or str, optional): Defaults to 'auto'. The number of items mapped by each parallel frame.
+            If 'auto', the first items are mapped one by one to measure the runtime per item. The remaining items are
+            split into chunks that take about :data:`PMAP_CHUNK_DURATION` seconds each.
+
+    Returns:
+        Frame: A frame that finishes with the list of results in the order of `iterable`.
+
+    Raises:
+        ValueError: If `chunksize` is neither 'auto' nor a positive integer.
+    """
+
+    if chunksize != 'auto' and chunksize < 1:
+        raise ValueError("chunksize must be 'auto' or at least 1")
+    return _pmap(func, list(iterable), chunksize)
+
+async def pmap_unordered(func, iterable, chunksize='auto'):
+    """Apply a function to every item of an iterable in parallel and stream the results as they become available.
+
+    This is the streaming variant of :func:`pmap`. Results are yielded in the order chunks finish.
+
+    Example: ::
+
+        async for square in pmap_unordered(lambda x: x * x, range(10000)):
+            print(square)
+
+    Args:
+        func (Callable): The function to apply to each item.
+        iterable (Iterable): The items to map.
+        chunksize (int or str, optional): Defaults to 'auto'. The number of items mapped by each parallel frame.
+            See :func:`pmap`.
+
+    Yields:
+        The result of `func` for each item.
+
+    Raises:
+        ValueError: If `chunksize` is neither 'auto' nor a positive integer.
+    """
+
+    if chunksize != 'auto' and chunksize < 1:
+        raise ValueError("chunksize must be 'auto' or at least 1")
+    async for _, chunkresults in _pmap_chunks(func, list(iterable), chunksize):
+        for result in chunkresults:
+            yield result
+
+class Stage(object):
+    """A stage of a :func:`pipeline`.
+
+    The frame function of `factory` processes one item at a time and returns the item to pass to the next stage. The
+    stage runs `parallelism` workers of the factory's frame class, so PFrame stages process items on all eventloops.
+    Each worker repeatedly takes up to `batch_size` items from the stage's input buffer, processes them and moves their
+    results to the next stage's input buffer at once.
+
+    Args:
+        factory (Frame.Factory): A frame function that takes an item and returns the processed item.
+        parallelism (int, optional): Defaults to 1. The number of workers processing items simultaneously.
+        buffer (int, optional): Defaults to 16. The maximum number of items waiting in front of this stage. Previous
+            stages are suspended while the buffer is full.
+        batch_size (int, optional): Defaults to 1. The maximum number of items a worker takes and passes on at once.
+    """
+
+    def __init__(self, factory, parallelism=1, buffer=16, batch_size=1):
+        if parallelism < 1:
+            raise ValueError("parallelism must be at least 1")
+        if buffer < 1:
+            raise ValueError("buffer must be at least 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.factory = factory
+        self.parallelism = parallelism
+        self.buffer = buffer
+        self.batch_size = batch_size
+
+class StageStats(object):
+    """Throughput and queue occupancy of a :class:`Stage` in a running or finished :func:`pipeline`.
+
+    The stage with the highest queue occupancy relative to its buffer is the bottleneck of a pipeline. Stages behind it
+    wait for items with mostly empty queues.
+
+    Attributes:
+        name (str): The name of the stage's frame function.
+        processed (int): The number of processed items.
+        busy_time (float): The total time the stage's workers spent processing items, in seconds.
+        max_queued (int): The maximum number of items waiting in front of the stage when a worker took items.
+    """
+
+    def __init__(self, name, inbox):
+        self.name = name
+        self.processed = 0
+        self.busy_time = 0.0
+        self.max_queued = 0
+        self._inbox = inbox
+        self._lock = threading.Lock()
+        self._queued_total = 0
+        self._num_batches = 0
+        self._start_time = time.perf_counter()
+        self._stop_time = None
+
+    @property
+    def queued(self):
+        """The number of items currently waiting in front of the stage."""
+        return len(self._inbox)
+
+    @property
+    def mean_queued(self):
+        """The average number of items waiting in front of the stage when a worker took items."""
+        return self._queued_total / self._num_batches if self._num_batches else 0.0
+
+    @property
+    def throughput(self):
+        """The number of processed items per second since the pipeline started."""
+        elapsed = (self._stop_time or time.perf_counter()) - self._start_time
+        return self.processed / elapsed if elapsed > 0.0 else 0.0
+
+    def _record(self, num_items, busy_time, queued):
+        with self._lock:
+            self.processed += num_items
+            self.busy_time += busy_time
+            self.max_queued = max(self.max_queued, queued)
+            self._queued_total += queued
+            self._num_batches += 1
+
+    def __str__(self):
+        return "{}: {} items, {:.1f} items/s, busy {:.2f}s, queue {:.1f} mean, {} max, {} buffered".format(
+            self.name, self.processed, self.throughput, self.busy_time, self.mean_queued, self.max_queued,
+            self._inbox.maxsize)
+
+async def _stage_worker(self, stage, inbox, outbox, stats):
+    """Process items of `inbox` with the frame function of `stage` and put the results into `outbox`."""
+
+    func = stage.factory.framefunc
+    hasself = 'self' in inspect.signature(func).parameters
+    while True:
+        queued = len(inbox)
+        try:
+            items = await inbox.get_batch(stage.batch_size)
+        except ChannelClosedException: # If all items have been processed
+            return
+        starttime = time.perf_counter()
+        results = []
+        for item in items:
+            result = func(self, item) if hasself else func(item)
+            if inspect.isawaitable(result):
+                result = await result
+            results.append(result)
+        stats._record(len(items), time.perf_counter() - starttime, queued)
+        if outbox is not None:
+            await outbox.put_batch(results)
+
+@Frame
+async def _pipeline(source, stages, buffers, stats):
+    # Start workers
+    num_threads = len(_THREAD_LOCALS._current_eventloop.eventloops)
+    workers = []
+    for i, stage in enumerate(stages):
+        frameclass, frameclassargs = stage.factory.frameclass, stage.factory.frameclassargs
+        # Spread parallel workers over all eventloops. Channels wake workers on the eventloop they waited on, so workers
+        # that happened to start on the same eventloop would never spread out.
+        spread = (issubclass(frameclass, PFrame) and len(frameclassargs) < 2
+                  and 'thread_idx' not in stage.factory.frameclasskwargs)
+        outbox = buffers[i + 1] if i + 1 < len(stages) else None
+        stageworkers = []
+        for j in range(stage.parallelism):
+            frameclasskwargs = dict(stage.factory.frameclasskwargs)
+            if spread:
+                frameclasskwargs['thread_idx'] = j % num_threads
+            factory = frameclass.Factory(_stage_worker, frameclassargs, frameclasskwargs)
+            stageworkers.append(factory(stage, buffers[i], outbox, stats[i]))
+        workers.append(stageworkers)
+
+    # Feed source items into the first stage
+    batch_size = stages[0].batch_size
+    batch = []
+    if hasattr(source, '__aiter__'):
+        async for item in source:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await buffers[0].put_batch(batch)
+                batch = []
+    else:
+        for item in source:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await buffers[0].put_batch(batch)
+                batch = []
+    await buffers[0].put_batch(batch)
+
+    # Shut down stages in order, once their input was processed
+    for i, stage in enumerate(stages):
+        buffers[i].close()
+        await all_(*workers[i])
+        stats[i]._stop_time = time.perf_counter()
+    return stats
+
+def pipeline(source, *stages):
+    """Process items in multiple stages that run simultaneously.
+
+    Items of `source` pass through all stages in order. Stages are connected by bounded buffers, so a slow stage
+    suspends the stages in front of it instead of accumulating items. The results of the last stage are discarded, so
+    the last stage usually stores or sends its items.
+
+    Example: ::
+
+        @PFrame
+        async def parse(line):
+            return json.loads(line)
+
+        @Frame
+        async def write(record):
+            database.insert(record)
+
+        stats = await pipeline(open("records.json"), Stage(parse, parallelism=4, batch_size=64), write)
+        for stage in stats:
+            print(stage) # Reveals which stage is the bottleneck
+
+    Args:
+        source (Iterable or AsyncIterable): The items to process, for example a list or a streaming frame.
+        stages (Stage[] or Frame.Factory[]): The stages to pass items through. Frame functions are turned into stages
+            with default options.
+
+    Returns:
+        Frame: A frame that finishes with a list of :class:`StageStats` once all items passed the last stage. The
+        statistics are also available as ``frame.stats`` while the pipeline is running.
+
+    Raises:
+        ValueError: If no stages are passed.
+    """
+
+    if not stages:
+        raise ValueError("A pipeline needs at least one stage")
+    stages = [stage if isinstance(stage, Stage) else Stage(stage) for stage in stages]
+    buffers = [Channel(stage.buffer) for stage in stages]
+    stats = [StageStats(stage.factory.framefunc.__name__, buffer) for stage, buffer in zip(stages, buffers)]
+    frame = _pipeline(source, stages, buffers, stats)
+    frame.stats = stats
+    return frame
+
+@Frame
+async def _await_submission(factory, frameargs, framekwargs):
+    return await factory(*frameargs, **framekwargs)
+
+@PFrame
+async def _call_function(func, args, kwargs):
+    return func(*args, **kwargs)
+
+class FrameExecutor(concurrent.futures.Executor):
+    """A concurrent.futures.Executor that runs calls on the eventloops of a running event loop.
+
+    Frame factories are started as frames. Other callables are called from parallel frames, which are spread over all
+    eventloops. Calls submitted from other threads before the event loop picked up earlier calls are started together,
+    with a single wakeup of the event loop. See :meth:`AbstractEventLoop.submit`.
+
+    Example: ::
+
+        executor = FrameExecutor(loop)
+
+        # On a web server thread
+        thumbnails = list(executor.map(render_thumbnail, images, timeout=5))
+
+    Args:
+        eventloop (AbstractEventLoop): The event loop to run calls on. Calls can only be submitted while it is running.
+    """
+
+    def __init__(self, eventloop):
+        self.eventloop = eventloop
+        self._lock = threading.Lock()
+        self._futures = set()
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule a call. This function is threadsafe.
+
+        Args:
+            fn (Callable): A frame factory or function to call.
+            *args: Positional arguments to pass to `fn`.
+            **kwargs: Keyword arguments to pass to `fn`.
+
+        Returns:
+            concurrent.futures.Future: A future for the result of the call.
+
+        Raises:
+            RuntimeError: Raised when the executor has been shut down.
+            InvalidOperationException: Raised when the event loop isn't running.
+        """
+
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Can't submit calls after the executor has been shut down")
+            if isinstance(fn, Frame.Factory):
+                future = self.eventloop.submit(fn, *args, **kwargs)
+            else:
+                future = self.eventloop.submit(_call_function, fn, args, kwargs)
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """Stop accepting calls.
+
+        Waiting for calls to finish from a frame of the same event loop blocks that eventloop.
+
+        Args:
+            wait (bool, optional): Defaults to True. If True, wait until all submitted calls finished.
+            cancel_futures (bool, optional): Defaults to False. If True, cancel the calls that haven't started yet.
+        """
+
+        with self._lock:
+            self._shutdown = True
+            futures = list(self._futures)
+        if cancel_futures:
+            for future in futures:
+                future.cancel()
+        if wait:
+            concurrent.futures.wait(futures)
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
@@ -35,9 +35,12 @@ class EventLoop(asyncframes.AbstractEventLoop):
     def _post(self, delay, callback, args):
         if not self.loop.is_closed():
             if delay <= 0:
-                self.loop.call_soon(callback, *args)
+                return self.loop.call_soon(callback, *args)
             else:
-                self.loop.call_later(delay, callback, *args)
+                return self.loop.call_later(delay, callback, *args)
+
+    def _cancel(self, handle):
+        handle.cancel()
 
     def _invoke(self, delay, callback, args):
         if not self.loop.is_closed():
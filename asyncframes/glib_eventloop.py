@@ -44,6 +44,12 @@ class EventLoop(asyncframes.AbstractEventLoop):
             callback(*args)
         event.set_callback(fire, None)
         event.attach(self._context)
+        return event
+
+    def _cancel(self, event):
+        if event in self.pending_events:
+            self.pending_events.remove(event)
+            event.destroy()
 
     def _invoke(self, delay, callback, args):
         event = GLib.Timeout(delay * 1000) if delay > 0 else GLib.Idle()
@@ -31,6 +31,7 @@ class EventLoop(asyncframes.AbstractEventLoop, QObject, metaclass=EventLoopMeta)
         asyncframes.AbstractEventLoop.__init__(self)
         QObject.__init__(self)
         self.moveToThread(QThread.currentThread())
+        self.pending_timers = set()
 
     def _run(self):
         try:
@@ -55,7 +56,25 @@ class EventLoop(asyncframes.AbstractEventLoop, QObject, metaclass=EventLoopMeta)
         EventLoop.qt.removePostedEvents(None)
 
     def _post(self, delay, callback, args):
-        QTimer.singleShot(1000 * delay, functools.partial(callback, *args))
+        if delay <= 0:
+            QTimer.singleShot(0, functools.partial(callback, *args))
+            return None
+
+        # Create a timer object, so that the callback can be cancelled
+        timer = QTimer()
+        timer.setSingleShot(True)
+        self.pending_timers.add(timer)
+        def fire():
+            self.pending_timers.discard(timer)
+            callback(*args)
+        timer.timeout.connect(fire)
+        timer.start(int(1000 * delay))
+        return timer
+
+    def _cancel(self, timer):
+        if timer in self.pending_timers:
+            self.pending_timers.remove(timer)
+            timer.stop()
 
     def _invoke(self, delay, callback, args):
         self.metaObject().invokeMethod(self, "_invoke_slot", Qt.QueuedConnection, Q_ARG(float, delay), Q_ARG(object, functools.partial(callback, *args)))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the cost of many concurrent animations on a single (UI) thread.
+
+NUM_ANIMATIONS animations with a frame interval of 1/60 seconds are started a few milliseconds apart and run for
+DURATION seconds each. The benchmark reports the number of callbacks the eventloop backend ran, the number of animation
+callbacks, the CPU time per animation callback and the total run time.
+"""
+
+import time
+from asyncframes import Frame, all_, animate, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_ANIMATIONS = 1000
+DURATION = 2.0
+INTERVAL = 1.0 / 60
+
+class CountingEventLoop(EventLoop):
+    num_posts = 0
+    def _post(self, delay, callback, args):
+        CountingEventLoop.num_posts += 1
+        return super()._post(delay, callback, args)
+
+class Stats(object):
+    num_callbacks = 0
+
+def callback(progress):
+    Stats.num_callbacks += 1
+
+@Frame
+async def main():
+    animations = []
+    for i in range(NUM_ANIMATIONS):
+        animations.append(animate(DURATION, callback, INTERVAL))
+        if i % 100 == 99:
+            await sleep(0.005)
+    await all_(*animations)
+
+if __name__ == "__main__":
+    loop = CountingEventLoop()
+    start, start_cpu = time.perf_counter(), time.process_time()
+    loop.run(main, num_threads=1)
+    elapsed, elapsed_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    print("{} animations: {} backend callbacks, {} animation callbacks, {:.1f}us cpu per callback, {:.2f}s".format(
+        NUM_ANIMATIONS, CountingEventLoop.num_posts, Stats.num_callbacks, elapsed_cpu / Stats.num_callbacks * 1e6, elapsed))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the latency of waking up awaiting frames.
+
+The wakeup benchmark only times the interval between sending a non-blocking event and the awaiting frame resuming.
+The await chain benchmarks time complete parent -> child -> parent round trips, including the delayed start of every
+child frame. All benchmarks compare resuming listeners inline with always enqueuing them on the eventloop
+(AbstractEventLoop.max_inline_depth = 0).
+"""
+
+import time
+from asyncframes import AbstractEventLoop, Event, Frame, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_ITERATIONS = 20000
+
+class Wakeup(object):
+    sent = 0.0
+    latency = 0.0
+
+@Frame
+async def listener(e):
+    while True:
+        await e
+        Wakeup.latency += time.perf_counter() - Wakeup.sent
+
+@Frame
+async def wakeup():
+    e = Event('e')
+    l = listener(e)
+    await l.ready
+    for i in range(NUM_ITERATIONS):
+        Wakeup.sent = time.perf_counter()
+        AbstractEventLoop.sendevent(e, i) # Wake up listener without blocking
+        await sleep(0) # Give the listener a chance to run if it was enqueued
+    l.remove()
+
+@Frame
+async def child(i):
+    return i
+
+@Frame
+async def ancestor(depth):
+    return await (ancestor(depth - 1) if depth > 1 else child(0))
+
+@Frame
+async def parent():
+    for i in range(NUM_ITERATIONS):
+        await child(i)
+
+@Frame
+async def nested_parent(depth):
+    for i in range(NUM_ITERATIONS // depth):
+        await ancestor(depth)
+
+def measure(loop, frame, *frameargs, num_threads):
+    start = time.perf_counter()
+    loop.run(frame, *frameargs, num_threads=num_threads)
+    return (time.perf_counter() - start) / NUM_ITERATIONS * 1e6
+
+def measure_wakeup(loop, num_threads):
+    Wakeup.latency = 0.0
+    loop.run(wakeup, num_threads=num_threads)
+    return Wakeup.latency / NUM_ITERATIONS * 1e6
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for num_threads in (1, 4):
+        for max_inline_depth in (0, AbstractEventLoop.max_inline_depth):
+            EventLoop.max_inline_depth = max_inline_depth
+            print("num_threads={}, max_inline_depth={:2}: wakeup {:6.1f}us, parent->child->parent {:6.1f}us, 4 nested levels {:6.1f}us".format(
+                num_threads, max_inline_depth,
+                measure_wakeup(loop, num_threads),
+                measure(loop, parent, num_threads=num_threads),
+                measure(loop, nested_parent, 4, num_threads=num_threads)))
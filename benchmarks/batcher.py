@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure item-at-a-time versus batched consumption of work items.
+
+NUM_PRODUCERS parallel frames each produce NUM_ITEMS items at a steady rate. A single consumer frame writes the items to
+a simulated sink that costs WRITE_COST seconds per write, plus ITEM_COST seconds per item. Items are either passed
+through an unbounded Channel and written one at a time, or collected with ``Batcher(MAX_SIZE, MAX_DELAY)`` and written
+in batches. The benchmark reports the number of writes, the mean and maximum time from producing an item until it was
+written, and the total run time.
+"""
+
+import time
+from asyncframes import Frame, PFrame, Batcher, Channel, all_, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_PRODUCERS = 4
+NUM_ITEMS = 2000
+PRODUCE_INTERVAL = 0.001 # Seconds between items of each producer
+WRITE_COST = 0.0005
+ITEM_COST = 0.00001
+MAX_SIZE = 100
+MAX_DELAY = 0.01
+NUM_THREADS = 4
+
+class Sink(object):
+    def __init__(self):
+        self.num_writes = 0
+        self.latencies = []
+
+    def write(self, items):
+        time.sleep(WRITE_COST + ITEM_COST * len(items))
+        now = time.perf_counter()
+        self.num_writes += 1
+        self.latencies.extend(now - produced for produced in items)
+
+@PFrame
+async def channel_producer(channel):
+    for _ in range(NUM_ITEMS):
+        await channel.put(time.perf_counter())
+        await sleep(PRODUCE_INTERVAL)
+
+@PFrame
+async def batcher_producer(batcher):
+    for _ in range(NUM_ITEMS):
+        batcher.post(time.perf_counter())
+        await sleep(PRODUCE_INTERVAL)
+
+@Frame
+async def channel_consumer(channel, sink):
+    async for item in channel:
+        sink.write([item])
+
+@Frame
+async def batcher_consumer(batcher, sink):
+    async for batch in batcher:
+        sink.write(batch)
+
+@Frame
+async def main(queue, producer, consumer, sink):
+    c = consumer(queue, sink)
+    await all_(*[producer(queue) for _ in range(NUM_PRODUCERS)])
+    queue.close()
+    await c
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, create_queue, producer, consumer in (
+            ("item-at-a-time", Channel, channel_producer, channel_consumer),
+            ("Batcher", lambda: Batcher(MAX_SIZE, MAX_DELAY), batcher_producer, batcher_consumer)):
+        sink = Sink()
+        start = time.perf_counter()
+        loop.run(main, create_queue(), producer, consumer, sink, num_threads=NUM_THREADS)
+        elapsed = time.perf_counter() - start
+        print("{:14}: {:5} writes, latency mean {:7.1f}ms max {:7.1f}ms, {:5.2f}s".format(
+            name, sink.num_writes, 1e3 * sum(sink.latencies) / len(sink.latencies), 1e3 * max(sink.latencies), elapsed))
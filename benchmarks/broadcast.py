@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the latency of broadcasting an event to many frames pinned to different threads.
+
+NUM_LISTENERS frames are distributed round-robin over all eventloops and await the same event. The benchmark times the
+interval between sending or posting the event and the last listener resuming.
+"""
+
+import threading
+import time
+from asyncframes import Event, Frame, sleep, _Waiter
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_LISTENERS = 1000
+NUM_ROUNDS = 200
+NUM_THREADS = 4
+
+class Round(object):
+    lock = threading.Lock()
+    remaining = 0
+    end = 0.0
+    waiter = None
+
+async def listener_function(e):
+    while True:
+        await e
+        with Round.lock:
+            Round.remaining -= 1
+            if Round.remaining == 0:
+                Round.end = time.perf_counter()
+                Round.waiter.wake()
+
+listener_factories = [Frame(thread_idx=i)(listener_function) for i in range(NUM_THREADS)]
+
+@Frame
+async def main(blocking):
+    e = Event('e')
+    listeners = [listener_factories[i % NUM_THREADS](e) for i in range(NUM_LISTENERS)]
+    elapsed = 0.0
+    for _ in range(NUM_ROUNDS):
+        # Wait until all listeners await the event again
+        while len(e._listeners) < NUM_LISTENERS:
+            await sleep(0)
+
+        Round.remaining = NUM_LISTENERS
+        Round.waiter = _Waiter('done')
+        start = time.perf_counter()
+        if blocking:
+            e.send()
+        else:
+            e.post()
+        await Round.waiter
+        elapsed += Round.end - start
+    for listener in listeners:
+        listener.remove()
+    return elapsed / NUM_ROUNDS
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for blocking in (True, False):
+        latency = loop.run(main, blocking, num_threads=NUM_THREADS)
+        print("{:8} broadcast to {} listeners on {} threads: {:7.1f}us".format(
+            "blocking" if blocking else "posted", NUM_LISTENERS, NUM_THREADS, latency * 1e6))
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the cost of posting high-frequency progress events.
+
+Like examples/progressbar.py, a worker posts progress updates to an event that a reporter frame awaits. The benchmark
+compares plain events with coalesced and throttled events. It reports how many posts woke up the reporter and how long
+it took until the event queue was drained.
+"""
+
+import time
+from asyncframes import Event, Frame, PFrame
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_POSTS = 100000
+NUM_THREADS = 4
+
+class Stats(object):
+    num_received = 0
+
+@Frame
+async def reporter(progress):
+    while True:
+        await progress
+        Stats.num_received += 1
+
+@PFrame
+async def worker(progress):
+    for i in range(NUM_POSTS):
+        progress.post(i)
+
+@Frame
+async def main(eventkwargs):
+    progress = Event('progress', **eventkwargs)
+    await reporter(progress).ready
+    await worker(progress)
+
+    # Wait until all enqueued posts have been processed
+    done = Event('done')
+    done.post()
+    await done
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, eventkwargs in (("plain", {}), ("coalesce", dict(coalesce=True)), ("throttle=60", dict(throttle=60))):
+        Stats.num_received = 0
+        start = time.perf_counter()
+        loop.run(main, eventkwargs, num_threads=NUM_THREADS)
+        elapsed = time.perf_counter() - start
+        print("{:11}: {:6} of {} posts received, {:5.2f}s".format(name, Stats.num_received, NUM_POSTS, elapsed))
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure frames that compute the same results for the same arguments.
+
+NUM_ROUNDS times, the main frame concurrently loads NUM_CALLS resources drawn from NUM_KEYS distinct keys and waits for
+all of them. Loading a resource takes LOAD_TIME seconds of busy work. The loading frame factory either has no cache,
+only shares running frames (``cache=LRU(maxsize=0)``) or also caches results (``cache=LRU(maxsize=NUM_KEYS)``). The
+benchmark reports the number of frames that loaded a resource, the CPU time and the total run time.
+"""
+
+import random
+import time
+from asyncframes import Frame, PFrame, LRU, all_
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_ROUNDS = 10
+NUM_CALLS = 1000
+NUM_KEYS = 100
+LOAD_TIME = 0.001
+NUM_THREADS = 4
+
+class Stats(object):
+    num_loads = 0
+
+async def load(key):
+    Stats.num_loads += 1
+    end = time.perf_counter() + LOAD_TIME
+    while time.perf_counter() < end:
+        pass
+    return key
+
+@Frame
+async def main(load):
+    rnd = random.Random(0)
+    for _ in range(NUM_ROUNDS):
+        keys = [rnd.randrange(NUM_KEYS) for _ in range(NUM_CALLS)]
+        assert await all_(*[load(key) for key in keys]) == keys
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, factory in (
+            ("no cache", PFrame(load)),
+            ("LRU(maxsize=0)", PFrame(cache=LRU(maxsize=0))(load)),
+            ("LRU(maxsize={})".format(NUM_KEYS), PFrame(cache=LRU(maxsize=NUM_KEYS))(load))):
+        Stats.num_loads = 0
+        start, start_cpu = time.perf_counter(), time.process_time()
+        loop.run(main, factory, num_threads=NUM_THREADS)
+        elapsed, elapsed_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+        print("{:15}: {:5} loads, cpu {:5.2f}s, {:5.2f}s".format(name, Stats.num_loads, elapsed_cpu, elapsed))
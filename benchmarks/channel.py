@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the throughput of channels between parallel frames.
+
+Producers and consumers are PFrames running on a pool of worker threads. Every setup moves the same number of items
+through a bounded channel, once item by item (put/get) and once in batches (put_batch/get_batch).
+"""
+
+import time
+from asyncframes import Channel, ChannelClosedException, Frame, PFrame, all_
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_ITEMS = 100000
+MAXSIZE = 256
+BATCH_SIZE = 64
+NUM_THREADS = 4
+
+@PFrame
+async def producer(channel, num_items):
+    for i in range(num_items):
+        await channel.put(i)
+
+@PFrame
+async def batch_producer(channel, num_items):
+    for start in range(0, num_items, BATCH_SIZE):
+        await channel.put_batch(range(start, min(start + BATCH_SIZE, num_items)))
+
+@PFrame
+async def consumer(channel):
+    count = 0
+    async for _ in channel:
+        count += 1
+    return count
+
+@PFrame
+async def batch_consumer(channel):
+    count = 0
+    while True:
+        try:
+            count += len(await channel.get_batch(BATCH_SIZE))
+        except ChannelClosedException:
+            return count
+
+@Frame
+async def main(num_producers, num_consumers, batched):
+    channel = Channel(MAXSIZE)
+    consumers = [(batch_consumer if batched else consumer)(channel) for _ in range(num_consumers)]
+    await all_(*[(batch_producer if batched else producer)(channel, NUM_ITEMS // num_producers) for _ in range(num_producers)])
+    channel.close()
+    assert sum(await all_(*consumers)) == NUM_ITEMS // num_producers * num_producers
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, num_producers, num_consumers in (("1:1", 1, 1), ("N:1", 4, 1), ("N:M", 4, 4)):
+        for batched in (False, True):
+            start = time.perf_counter()
+            loop.run(main, num_producers, num_consumers, batched, num_threads=NUM_THREADS)
+            elapsed = time.perf_counter() - start
+            print("{} {:7}: {:9.0f} items/s".format(name, "batched" if batched else "single", NUM_ITEMS / elapsed))
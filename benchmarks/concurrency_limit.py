@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the cost of spawning many PFrames with and without a concurrency limit.
+
+Like examples/many_frames.py, every run creates NUM_FRAMES PFrames up front and awaits all of them.
+The benchmark reports the peak depth of the shared event queue, peak memory and total run time.
+"""
+
+import time
+import tracemalloc
+from asyncframes import Frame, PFrame, all_, _THREAD_LOCALS
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_FRAMES = 10000
+NUM_THREADS = 4
+
+class Stats(object):
+    max_queue_depth = 0
+
+async def sub_frame_function(i):
+    Stats.max_queue_depth = max(Stats.max_queue_depth, _THREAD_LOCALS._current_eventloop.event_queue.qsize())
+    time.sleep(0.0001)
+    return i % 2 == 0
+
+unlimited = PFrame(sub_frame_function)
+limited = PFrame(max_concurrency=8 * NUM_THREADS)(sub_frame_function)
+
+@Frame
+async def main_frame(sub_frame):
+    subframes = [sub_frame(i) for i in range(NUM_FRAMES)]
+    assert sum(1 if result == True else 0 for result in await all_(*subframes)) == NUM_FRAMES // 2
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, sub_frame in (("unlimited", unlimited), ("max_concurrency={}".format(8 * NUM_THREADS), limited)):
+        Stats.max_queue_depth = 0
+        tracemalloc.start()
+        start = time.perf_counter()
+        loop.run(main_frame, sub_frame, num_threads=NUM_THREADS)
+        elapsed = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{:18}: peak queue depth {:5}, peak memory {:6.1f}MB, {:5.2f}s".format(
+            name, Stats.max_queue_depth, peak_memory / 2**20, elapsed))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the cost of dispatching a single event to each class of awaitable.
+
+All measurements run on a single eventloop thread and only time the dispatch
+itself, not the creation of awaitables or the eventloop backend.
+"""
+
+import time
+from asyncframes import AbstractEventLoop, Event, Frame, all_, any_, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_ITERATIONS = 20000
+
+def measure(name, dispatch, create=lambda: None, cleanup=lambda awaitable: None):
+    elapsed = 0.0
+    for _ in range(NUM_ITERATIONS):
+        awaitable = create()
+        start = time.perf_counter()
+        dispatch(awaitable)
+        elapsed += time.perf_counter() - start
+        cleanup(awaitable)
+    print("{:32} {:6.2f}us".format(name, elapsed / NUM_ITERATIONS * 1e6))
+
+def send(awaitable, msg=None):
+    AbstractEventLoop.sendevent(awaitable, msg, None, True)
+
+@Frame
+async def listener(e):
+    while True:
+        await e
+
+@Frame
+async def main():
+    e = Event('e')
+    measure("Event", lambda _: send(e))
+
+    measure("sleep", send, lambda: sleep(3600))
+
+    e = Event('e')
+    await listener(e).ready
+    measure("Event -> Frame", lambda _: send(e))
+
+    def all_of_two_events():
+        a, b = Event('a', singleshot=True), Event('b', singleshot=True)
+        all_(a, b)
+        return a, b
+    def send_both(events):
+        send(events[0])
+        send(events[1])
+    measure("Event -> all_ (2 events)", send_both, all_of_two_events)
+
+    def any_of_two_events():
+        a, b = Event('a', singleshot=True), Event('b', singleshot=True)
+        any_(a, b)
+        return a, b
+    measure("Event -> any_ (2 events)", lambda events: send(events[0]), any_of_two_events, lambda events: events[1].remove())
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    loop.run(main, num_threads=1)
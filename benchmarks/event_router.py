@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure keyed dispatch to many waiting frames.
+
+NUM_KEYS frames each wait for an event with their own key, using an EventRouter, a dict of one Event per key, or one
+broadcast Event filtered with ``event.where()``. The main frame then posts events for NUM_POSTS keys. The benchmark
+reports the time to start all waiting frames and the time per post until the woken frame finished.
+"""
+
+import time
+from asyncframes import Frame, Event, EventRouter, all_
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_KEYS = 100000
+NUM_POSTS = 20
+NUM_THREADS = 4
+
+@Frame
+async def router_listener(router, key):
+    return await router[key]
+
+@Frame
+async def event_listener(events, key):
+    return await events[key]
+
+@Frame
+async def broadcast_listener(event, key):
+    key, value = await event.where(lambda args: args[0] == key)
+    return value
+
+def post_router(router, key, value):
+    router.post(key, value)
+
+def post_event(events, key, value):
+    events[key].post(value)
+
+def post_broadcast(event, key, value):
+    event.post((key, value))
+
+@Frame
+async def main(source, listener, post):
+    start = time.perf_counter()
+    listeners = [listener(source, key) for key in range(NUM_KEYS)]
+    await all_(*[l.ready for l in listeners])
+    setup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in range(NUM_POSTS):
+        post(source, key, key)
+        assert await listeners[key] == key
+    return setup, (time.perf_counter() - start) / NUM_POSTS
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, create_source, listener, post in (
+            ("EventRouter", lambda: EventRouter('router'), router_listener, post_router),
+            ("Event per key", lambda: {key: Event(str(key)) for key in range(NUM_KEYS)}, event_listener, post_event),
+            ("broadcast Event", lambda: Event('broadcast'), broadcast_listener, post_broadcast)):
+        setup, per_post = loop.run(main, create_source(), listener, post, num_threads=NUM_THREADS)
+        print("{:15}: {} keys, setup {:5.2f}s, {:9.1f}us per post".format(name, NUM_KEYS, setup, per_post * 1e6))
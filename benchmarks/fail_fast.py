@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the CPU time spent on siblings of a failed frame.
+
+NUM_WORKERS parallel frames each compute NUM_SLICES slices of SLICE seconds of busy work, while another frame raises an
+exception after FAIL_AFTER seconds. The main frame awaits all of them with ``all_()`` or ``all_(..., fail_fast=True)``.
+The benchmark reports how long the main frame waited for the doomed result, the number of work slices computed and the
+CPU time of the whole run.
+"""
+
+import time
+from asyncframes import Frame, PFrame, all_, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_WORKERS = 8
+NUM_SLICES = 100
+SLICE = 0.002
+FAIL_AFTER = 0.05
+NUM_THREADS = 4
+
+class Stats(object):
+    num_slices = 0
+
+@PFrame
+async def worker():
+    for _ in range(NUM_SLICES):
+        end = time.perf_counter() + SLICE
+        while time.perf_counter() < end:
+            pass
+        Stats.num_slices += 1
+        await sleep(0)
+
+@PFrame
+async def failing():
+    await sleep(FAIL_AFTER)
+    raise ValueError("failed")
+
+@Frame
+async def main(self, fail_fast):
+    self.exception_handler = lambda frame, err: None
+    start = time.perf_counter()
+    try:
+        await all_(failing(), *[worker() for _ in range(NUM_WORKERS)], fail_fast=fail_fast)
+    except ValueError:
+        pass
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for fail_fast in (False, True):
+        Stats.num_slices = 0
+        start_cpu = time.process_time()
+        waited = loop.run(main, fail_fast, num_threads=NUM_THREADS)
+        elapsed_cpu = time.process_time() - start_cpu
+        print("fail_fast={!s:5}: waited {:5.3f}s, {:4} of {} slices computed, cpu {:5.2f}s".format(
+            fail_fast, waited, Stats.num_slices, NUM_WORKERS * NUM_SLICES, elapsed_cpu))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure primitive construction in deep frame hierarchies.
+
+A window frame nests DEPTH inline container frames. Every container constructs NUM_PRIMITIVES primitives owned by the
+window, the way widgets of a GUI frame library register with their window. The benchmark reports the time per primitive
+construction for several depths.
+"""
+
+import contextlib
+import time
+from asyncframes import Frame, Primitive
+from asyncframes.asyncio_eventloop import EventLoop
+
+DEPTHS = (1, 10, 100, 300)
+NUM_PRIMITIVES = 100
+
+class Window(Frame):
+    pass
+
+class Container(Frame):
+    pass
+
+class Widget(Primitive):
+    def __init__(self):
+        super().__init__(Window)
+
+@Window
+async def main(depth):
+    elapsed = 0.0
+    with contextlib.ExitStack() as stack:
+        for _ in range(depth):
+            stack.enter_context(Container)
+            start = time.perf_counter()
+            for _ in range(NUM_PRIMITIVES):
+                Widget()
+            elapsed += time.perf_counter() - start
+    return elapsed / (depth * NUM_PRIMITIVES)
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for depth in DEPTHS:
+        print("depth {:3}: {:5.2f}us per primitive".format(depth, loop.run(main, depth) * 1e6))
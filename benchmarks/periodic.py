@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the cost and drift of many concurrent periodic frames.
+
+Every frame waits for NUM_TICKS ticks of a fixed interval, either by looping on ``await sleep(interval)`` or by iterating
+over ``every(interval)``. The benchmark reports how late the last tick of each frame arrived compared to
+``start + NUM_TICKS * interval``, the number of ticks that were reported as missed, the CPU time and the total run time.
+The short interval requests more ticks per second than the eventloops can process.
+"""
+
+import time
+from asyncframes import Frame, PFrame, all_, every, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_FRAMES = 10000
+NUM_TICKS = 10
+INTERVALS = (0.5, 0.1)
+NUM_THREADS = 4
+
+@PFrame
+async def sleep_loop(interval):
+    start = time.monotonic()
+    for _ in range(NUM_TICKS):
+        await sleep(interval)
+    return time.monotonic() - start - NUM_TICKS * interval, 0
+
+@PFrame
+async def every_loop(interval):
+    start = time.monotonic()
+    ticks, num_missed = 0, 0
+    async for missed in every(interval):
+        ticks += 1 + missed
+        num_missed += missed
+        if ticks >= NUM_TICKS:
+            break
+    return time.monotonic() - start - NUM_TICKS * interval, num_missed
+
+@Frame
+async def main(periodic_frame, interval):
+    return await all_(*[periodic_frame(interval) for _ in range(NUM_FRAMES)])
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for interval in INTERVALS:
+        for name, periodic_frame in (("sleep", sleep_loop), ("every", every_loop)):
+            start, start_cpu = time.perf_counter(), time.process_time()
+            results = loop.run(main, periodic_frame, interval, num_threads=NUM_THREADS)
+            elapsed, elapsed_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+            drifts = sorted(drift for drift, missed in results)
+            print("{}s {:5}: last tick late by {:5.3f}s median, {:5.3f}s max, {:6} missed ticks, cpu {:5.2f}s, {:5.2f}s".format(
+                interval, name, drifts[len(drifts) // 2], drifts[-1], sum(missed for drift, missed in results),
+                elapsed_cpu, elapsed))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure multi-stage processing of many items.
+
+NUM_ITEMS items pass through a parse, a transform and a write stage. Parsing blocks for PARSE_TIME seconds without
+holding the GIL (like I/O or a C extension would). The items are processed either one after another by creating a frame
+per stage and item, or by a pipeline with a parallel parse stage, with and without batching. The benchmark reports the
+total run time and the statistics of each pipeline stage.
+"""
+
+import time
+from asyncframes import Frame, PFrame, Stage, pipeline
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_ITEMS = 5000
+PARSE_TIME = 0.0002
+NUM_THREADS = 4
+
+@PFrame
+async def parse(line):
+    time.sleep(PARSE_TIME)
+    return int(line)
+
+@Frame
+async def transform(value):
+    return value * value
+
+@Frame
+async def write(value):
+    pass
+
+@Frame
+async def sequential(lines):
+    for line in lines:
+        await write(await transform(await parse(line)))
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    lines = [str(i) for i in range(NUM_ITEMS)]
+
+    start = time.perf_counter()
+    loop.run(sequential, lines, num_threads=NUM_THREADS)
+    print("frame per item           : {:5.2f}s".format(time.perf_counter() - start))
+
+    for batch_size in (1, 64):
+        start = time.perf_counter()
+        stats = loop.run(pipeline, lines, Stage(parse, parallelism=NUM_THREADS, batch_size=batch_size, buffer=256),
+                         Stage(transform, batch_size=batch_size, buffer=256), Stage(write, batch_size=batch_size, buffer=256),
+                         num_threads=NUM_THREADS)
+        print("pipeline(batch_size={:2}) : {:5.2f}s".format(batch_size, time.perf_counter() - start))
+        for stage in stats:
+            print("    " + str(stage))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the cost of mapping a function over many items in parallel.
+
+The baseline creates one PFrame per item, like examples/many_frames.py. pmap maps the same items in chunks, either
+sized automatically or with a fixed chunk size.
+"""
+
+import time
+from asyncframes import Frame, PFrame, all_, pmap
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_ITEMS = 20000
+NUM_THREADS = 4
+
+def cheap(i):
+    return i % 2 == 0
+
+def expensive(i):
+    time.sleep(0.0001)
+    return i % 2 == 0
+
+@PFrame
+async def sub_frame(func, i):
+    return func(i)
+
+@Frame
+async def one_frame_per_item(func):
+    results = await all_(*[sub_frame(func, i) for i in range(NUM_ITEMS)])
+    assert sum(results) == NUM_ITEMS // 2
+
+@Frame
+async def mapped(func, chunksize):
+    results = await pmap(func, range(NUM_ITEMS), chunksize)
+    assert sum(results) == NUM_ITEMS // 2
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for func in (cheap, expensive):
+        for name, frame, frameargs in (("one frame per item", one_frame_per_item, (func,)),
+                                       ("pmap chunksize=1", mapped, (func, 1)),
+                                       ("pmap chunksize=64", mapped, (func, 64)),
+                                       ("pmap chunksize=auto", mapped, (func, 'auto'))):
+            start = time.perf_counter()
+            loop.run(frame, *frameargs, num_threads=NUM_THREADS)
+            elapsed = time.perf_counter() - start
+            print("{:9} {:19}: {:9.0f} items/s".format(func.__name__, name, NUM_ITEMS / elapsed))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the work done by the losers of hedged computations.
+
+NUM_REQUESTS times, the main frame starts NUM_REPLICAS replicas of a computation and continues with the first result,
+using ``any_()``, which leaves the other replicas running, or ``race()``, which removes them. Each replica computes a
+random number of work slices of SLICE seconds of busy work. The benchmark reports the run time of the main frame, the
+number of work slices computed and the CPU time of the whole run.
+"""
+
+import random
+import time
+from asyncframes import Frame, PFrame, any_, race, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_REQUESTS = 50
+NUM_REPLICAS = 3
+MAX_SLICES = 20
+SLICE = 0.001
+NUM_THREADS = 4
+
+class Stats(object):
+    num_slices = 0
+
+@PFrame
+async def replica(num_slices):
+    for _ in range(num_slices):
+        end = time.perf_counter() + SLICE
+        while time.perf_counter() < end:
+            pass
+        Stats.num_slices += 1
+        await sleep(0)
+
+@Frame
+async def main(combinator):
+    rnd = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(NUM_REQUESTS):
+        await combinator(*[replica(rnd.randint(1, MAX_SLICES)) for _ in range(NUM_REPLICAS)])
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, combinator in (("any_", any_), ("race", race)):
+        Stats.num_slices = 0
+        start_cpu = time.process_time()
+        elapsed = loop.run(main, combinator, num_threads=NUM_THREADS)
+        elapsed_cpu = time.process_time() - start_cpu
+        print("{:4}: main frame {:5.2f}s, {:5} slices computed, cpu {:5.2f}s".format(
+            name, elapsed, Stats.num_slices, elapsed_cpu))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure rate limiting many parallel frames.
+
+NUM_FRAMES parallel frames each perform NUM_CALLS calls, limited to RATE calls per second in total. Calls are limited
+either by a hand-written loop that reserves the next free time slot and sleeps until then, or with
+``await RateLimiter(RATE).acquire()`` with a burst capacity of 10ms worth of calls. The benchmark reports the number of
+timers posted to the eventloop backends, the maximum number of simultaneously pending timers, the achieved call rate,
+the CPU time and the total run time.
+"""
+
+import threading
+import time
+from asyncframes import Frame, PFrame, RateLimiter, all_, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_FRAMES = 1000
+NUM_CALLS = 5
+RATE = 2000
+NUM_THREADS = 4
+
+class CountingEventLoop(EventLoop):
+    lock = threading.Lock()
+    num_timers = 0
+    pending_timers = 0
+    max_pending_timers = 0
+
+    def _post(self, delay, callback, args):
+        if delay > 0:
+            with CountingEventLoop.lock:
+                CountingEventLoop.num_timers += 1
+                CountingEventLoop.pending_timers += 1
+                CountingEventLoop.max_pending_timers = max(CountingEventLoop.max_pending_timers,
+                                                           CountingEventLoop.pending_timers)
+            callback, args = CountingEventLoop._expire, (callback, args)
+        return super()._post(delay, callback, args)
+
+    @staticmethod
+    def _expire(callback, args):
+        with CountingEventLoop.lock:
+            CountingEventLoop.pending_timers -= 1
+        callback(*args)
+
+class SleepLimiter(object):
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    async def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = self.next_slot = max(now, self.next_slot)
+            self.next_slot += self.interval
+        if slot > now:
+            await sleep(slot - now)
+
+@PFrame
+async def client(limiter):
+    for _ in range(NUM_CALLS):
+        await limiter.acquire()
+
+@Frame
+async def main(limiter):
+    await all_(*[client(limiter) for _ in range(NUM_FRAMES)])
+
+if __name__ == "__main__":
+    loop = CountingEventLoop()
+    for name, limiter in (("sleep loop", SleepLimiter(RATE)), ("RateLimiter", RateLimiter(RATE, capacity=RATE / 100))):
+        CountingEventLoop.num_timers = CountingEventLoop.pending_timers = CountingEventLoop.max_pending_timers = 0
+        start, start_cpu = time.perf_counter(), time.process_time()
+        loop.run(main, limiter, num_threads=NUM_THREADS)
+        elapsed, elapsed_cpu = time.perf_counter() - start, time.process_time() - start_cpu
+        print("{:11}: {:5} timers, at most {:4} pending, {:6.0f} calls/s, cpu {:5.2f}s, {:5.2f}s".format(
+            name, CountingEventLoop.num_timers, CountingEventLoop.max_pending_timers, NUM_FRAMES * NUM_CALLS / elapsed, elapsed_cpu, elapsed))
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure passing a large result set from a producer frame to a consumer frame.
+
+A parallel producer frame generates NUM_VALUES values of VALUE_SIZE bytes each and the main frame counts their total
+size. The producer either returns a list of all values, or is an async generator frame function that streams the
+values through buffers of different sizes. The benchmark reports the peak memory allocated while running and the total
+run time.
+"""
+
+import time
+import tracemalloc
+from asyncframes import Frame, PFrame
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_VALUES = 50000
+VALUE_SIZE = 1000
+BUFFER_SIZES = (1, 16, 256)
+NUM_THREADS = 4
+
+@PFrame
+async def produce_list():
+    return [bytes(VALUE_SIZE) for _ in range(NUM_VALUES)]
+
+def stream_producer(buffer):
+    @PFrame(buffer=buffer)
+    async def produce_stream():
+        for _ in range(NUM_VALUES):
+            yield bytes(VALUE_SIZE)
+    return produce_stream
+
+@Frame
+async def consume_list(producer):
+    return sum(len(value) for value in await producer())
+
+@Frame
+async def consume_stream(producer):
+    total = 0
+    async for value in producer():
+        total += len(value)
+    return total
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, consumer, producer in [("list", consume_list, produce_list)] + [
+            ("stream(buffer={})".format(buffer), consume_stream, stream_producer(buffer)) for buffer in BUFFER_SIZES]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        total = loop.run(consumer, producer, num_threads=NUM_THREADS)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert total == NUM_VALUES * VALUE_SIZE
+        print("{:19}: peak memory {:6.1f}MB, {:5.2f}s".format(name, peak / 1e6, elapsed))
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure submitting frames from threads that don't run an eventloop.
+
+NUM_CLIENTS client threads, like the request handler threads of a web server, each submit NUM_REQUESTS frames with
+``loop.submit()`` and wait for their results. Submissions are either started with one wakeup of the main eventloop per
+submission, or in batches, where a single wakeup starts all submissions that arrived since the previous wakeup. The
+benchmark reports the number of cross-thread wakeups of the main eventloop, the number of requests per second and the
+total run time.
+"""
+
+import threading
+import time
+from asyncframes import Frame, PFrame, sleep
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_CLIENTS = 8
+NUM_REQUESTS = 2000
+NUM_THREADS = 4
+
+class CountingEventLoop(EventLoop):
+    lock = threading.Lock()
+    num_wakeups = 0
+    batched = True
+
+    def submit(self, factory, *frameargs, **framekwargs):
+        future = super().submit(factory, *frameargs, **framekwargs)
+        if not self.batched:
+            self._invoke(0, self._start_submissions, ()) # Wake up the eventloop for every submission
+        return future
+
+    def _invoke(self, delay, callback, args):
+        if callback == self._start_submissions:
+            with CountingEventLoop.lock:
+                CountingEventLoop.num_wakeups += 1
+        super()._invoke(delay, callback, args)
+
+@PFrame
+async def handle(request):
+    return request + 1
+
+def client(loop):
+    futures = [loop.submit(handle, request) for request in range(NUM_REQUESTS)]
+    assert [future.result() for future in futures] == list(range(1, NUM_REQUESTS + 1))
+
+@Frame
+async def main(loop):
+    clients = [threading.Thread(target=client, args=(loop,)) for _ in range(NUM_CLIENTS)]
+    for thread in clients:
+        thread.start()
+    while any(thread.is_alive() for thread in clients):
+        await sleep(0.01)
+
+if __name__ == "__main__":
+    loop = CountingEventLoop()
+    for name, batched in (("unbatched", False), ("batched", True)):
+        loop.batched = batched
+        CountingEventLoop.num_wakeups = 0
+        start = time.perf_counter()
+        loop.run(main, loop, num_threads=NUM_THREADS)
+        elapsed = time.perf_counter() - start
+        print("{:9}: {:6} wakeups, {:6.0f} requests/s, {:5.2f}s".format(
+            name, CountingEventLoop.num_wakeups, NUM_CLIENTS * NUM_REQUESTS / elapsed, elapsed))
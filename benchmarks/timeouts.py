@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure the backlog of cancelled timers in a request/timeout pattern.
+
+Every request is bounded by a long timeout but finishes immediately, so every timer is cancelled. The benchmark reports
+the number of timer entries still scheduled in the asyncio backends of all eventloops after all requests finished, and the
+total run time.
+"""
+
+import time
+from asyncframes import Frame, PFrame, all_, sleep, timeout, _THREAD_LOCALS
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_REQUESTS = 10000
+NUM_CONCURRENT = 100
+NUM_THREADS = 4
+
+@PFrame
+async def request(i):
+    return i
+
+@Frame
+async def main():
+    for start in range(0, NUM_REQUESTS, NUM_CONCURRENT):
+        results = await all_(*[timeout(request(i), 60.0) for i in range(start, start + NUM_CONCURRENT)])
+        assert results == list(range(start, start + NUM_CONCURRENT))
+    await sleep(0.1) # Give all eventloops a chance to process pending cancellations
+    eventloops = _THREAD_LOCALS._current_eventloop.eventloops
+    return sum(len(eventloop.loop._scheduled) for eventloop in eventloops)
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    start = time.perf_counter()
+    scheduled = loop.run(main, num_threads=NUM_THREADS)
+    elapsed = time.perf_counter() - start
+    print("{} requests: {} timers left in backend heaps, {:.2f}s".format(NUM_REQUESTS, scheduled, elapsed))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) Sebastian Klaassen. All Rights Reserved.
+# Distributed under the MIT License. See LICENSE file for more info.
+
+"""Measure frames that wait for one specific value of a shared event.
+
+NUM_LISTENERS frames each wait for their own key of a shared event, either by re-awaiting the event until the key matches
+or with ``await event.where(predicate)``. The main frame then sends every key once. The benchmark reports the number of
+frame resumptions and the total run time.
+"""
+
+import time
+from asyncframes import Frame, Event, all_
+from asyncframes.asyncio_eventloop import EventLoop
+
+NUM_LISTENERS = 1000
+NUM_THREADS = 4
+
+class CountingFrame(Frame):
+    num_steps = 0
+    def _step(self, sender, msg):
+        CountingFrame.num_steps += 1
+        super()._step(sender, msg)
+
+@CountingFrame
+async def reawait_listener(event, key):
+    while await event != key:
+        pass
+
+@CountingFrame
+async def where_listener(event, key):
+    await event.where(lambda value: value == key)
+
+@Frame
+async def main(listener):
+    event = Event('key')
+    listeners = [listener(event, key) for key in range(NUM_LISTENERS)]
+    await all_(*[l.ready for l in listeners])
+    CountingFrame.num_steps = 0
+    start = time.perf_counter()
+    for key in range(NUM_LISTENERS):
+        event.send(key)
+    await all_(*listeners)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    loop = EventLoop()
+    for name, listener in (("re-await", reawait_listener), ("where", where_listener)):
+        elapsed = loop.run(main, listener, num_threads=NUM_THREADS)
+        print("{:8}: {:7} frame resumptions, {:.2f}s".format(name, CountingFrame.num_steps, elapsed))
@@ -2,6 +2,7 @@
 # Copyright (c) Sebastian Klaassen. All Rights Reserved.
 # Distributed under the MIT License. See LICENSE file for more info.
 
+import contextlib
 import datetime
 import io
 import logging
@@ -9,6 +10,7 @@ import math
 import threading
 import queue
 import re
+import sys
 import time
 import unittest
 import asyncframes
@@ -587,6 +589,725 @@ class TestAsyncFrames(unittest.TestCase):
             0.6: done
         """)
 
+    def test_buffered_events(self):
+        test = self
+        @Frame
+        async def listener(event):
+            while True:
+                test.log.debug(await event)
+        @Frame
+        async def main(event, num_posts, interval, delay=0):
+            await listener(event).ready
+            for i in range(num_posts):
+                event.post(i, delay)
+                if interval:
+                    await sleep(interval)
+            await sleep(0.3)
+
+        # Superseded posts are dropped
+        test.run_frame(main, Event('coalesced', coalesce=True), 100, 0, 0.1, expected_log="""
+            0.1: 99
+            0.3: done
+        """)
+
+        # At most one post is dispatched every 0.1 seconds
+        test.run_frame(main, Event('throttled', throttle=10), 5, 0.04, expected_log="""
+            0.0: 0
+            0.1: 2
+            0.2: 4
+            0.5: done
+        """)
+
+        # Posts are dispatched 0.2 seconds after the last post
+        test.run_frame(main, Event('debounced', debounce=0.2), 3, 0.1, expected_log="""
+            0.4: 2
+            0.6: done
+        """)
+
+    def test_timeout(self):
+        test = self
+        @Frame
+        async def work(name, seconds):
+            await sleep(seconds)
+            test.log.debug("{} finished".format(name))
+            return name
+        @Frame
+        async def request(self, inner):
+            test.assertIsNotNone(self.deadline)
+            inner.append(work('inner', 1.0))
+            test.assertEqual(inner[0].deadline, self.deadline) # Child frames inherit the deadline
+            inner_timeout = timeout(inner[0], 10.0)
+            test.assertEqual((inner_timeout._expiry, inner_timeout._timer), (self.deadline, None)) # Nested timeouts share the deadline's timer
+            await inner_timeout
+        @Frame
+        async def main():
+            # The awaitable wins and the timer is cancelled
+            t = timeout(work('fast', 0.1), 0.2)
+            test.assertEqual(await t, 'fast')
+            test.assertTrue(t._timer.removed)
+
+            # The timer wins and the frame is removed
+            slow = work('slow', 0.3)
+            with test.assertRaises(TimeoutError):
+                await timeout(slow, 0.1)
+            test.log.debug("slow timed out")
+            test.assertTrue(slow.removed)
+            await sleep(0.3)
+
+            # A deadline bounds the whole subtree
+            inner = []
+            r = request(inner)
+            with test.assertRaises(TimeoutError):
+                await deadline(r, time.monotonic() + 0.2)
+            test.log.debug("request timed out")
+            test.assertTrue(r.removed)
+            test.assertTrue(inner[0].removed)
+        test.run_frame(main, expected_log="""
+            0.1: fast finished
+            0.2: slow timed out
+            0.7: request timed out
+            0.7: done
+        """)
+
+    def test_removed_timeout(self):
+        test = self
+        @Frame
+        async def worker(go, seconds):
+            await go
+            try:
+                await timeout(sleep(5), seconds)
+            except TimeoutError:
+                test.log.debug("worker timed out")
+        @Frame
+        async def main():
+            # Removing a timeout drops the deadline it set
+            go = Event('go')
+            w = worker(go, 0.2)
+            t = timeout(w, 0.3)
+            await w.ready
+            test.assertIsNotNone(w.deadline)
+            await t.remove()
+            test.assertIsNone(w.deadline)
+            go.post()
+            await w
+
+            # Timeouts that relied on the timer of a removed timeout start their own timers
+            go = Event('go')
+            w = worker(go, 0.4)
+            t = timeout(w, 0.3)
+            await w.ready
+            go.post()
+            await sleep(0.1)
+            await t.remove()
+            await w
+        test.run_frame(main, expected_log="""
+            0.2: worker timed out
+            0.6: worker timed out
+            0.6: done
+        """)
+
+    def test_await_across_threads(self):
+        test = self
+        class SlowEvent(Event):
+            delay_main_thread = True
+            @property
+            def _listeners(self):
+                if self.delay_main_thread and threading.current_thread() is threading.main_thread():
+                    self.delay_main_thread = False
+                    time.sleep(0.05) # Let fire() send the event after waiter() yielded, but before it starts listening
+                return self.__dict__['_listeners']
+            @_listeners.setter
+            def _listeners(self, listeners):
+                self.__dict__['_listeners'] = listeners
+        @PFrame
+        async def fire(e):
+            time.sleep(0.01)
+            e.send('fired')
+        @Frame
+        async def waiter(e):
+            return await e
+        @Frame
+        async def main():
+            e = SlowEvent('e', singleshot=True)
+            fire(e)
+            w = waiter(e)
+            test.assertEqual(await any_(w, sleep(1)), (w, 'fired'))
+        test.loop.run(main, num_threads=NUM_THREADS)
+
+    def test_timeout_across_threads(self):
+        test = self
+        awaitable_bool = Awaitable.__bool__
+        def slow_bool(self):
+            result = awaitable_bool(self)
+            if threading.current_thread() is threading.main_thread():
+                time.sleep(0.001) # Give frames on other threads a chance to finish after the check
+            return result
+        @PFrame
+        async def request(i):
+            return i
+        @Frame
+        async def main():
+            for i in range(20):
+                test.assertEqual(await timeout(request(i), 1.0), i)
+        Awaitable.__bool__ = slow_bool
+        try:
+            test.loop.run(main, num_threads=NUM_THREADS)
+        finally:
+            Awaitable.__bool__ = awaitable_bool
+
+    def test_cancel_timers(self):
+        test = self
+        eventloop_class = test.loop.__class__
+        cancel = eventloop_class._cancel
+        cancelled = []
+        def counting_cancel(self, handle):
+            cancelled.append(handle)
+            cancel(self, handle)
+        @Frame
+        async def sleeper():
+            await sleep(10)
+        @Frame
+        async def main():
+            s = sleeper()
+            await s.ready
+            e = Event('e')
+            e.post('late', 10)
+            b = Event('buffered', debounce=10)
+            b.post('late')
+            await sleep(0.1) # Let other eventloops start the timers
+            await all_(s.remove(), e.remove(), b.remove())
+            await sleep(0.1) # Let other eventloops process cancellations
+            test.assertEqual(len(cancelled), 3)
+            test.assertEqual((e._timers, b._timers), (set(), set()))
+            if hasattr(test.loop, 'loop'): # If the backend is asyncio, ...
+                for eventloop in _THREAD_LOCALS._current_eventloop.eventloops:
+                    test.assertEqual([h for h in eventloop.loop._scheduled if not h.cancelled()], [])
+        eventloop_class._cancel = counting_cancel
+        try:
+            test.loop.run(main, num_threads=NUM_THREADS)
+        finally:
+            eventloop_class._cancel = cancel
+
+    def test_as_completed(self):
+        test = self
+        @PFrame
+        async def delayed(seconds):
+            await sleep(seconds)
+            return seconds
+        @Frame
+        async def iterate(awaitables):
+            async for sender, result in as_completed(*awaitables):
+                test.assertIn(sender, awaitables)
+                test.log.debug(result)
+        @Frame
+        async def main():
+            await iterate([delayed(0.3), delayed(0.1), delayed(0.2)])
+
+            # Remove the iterating frame while awaitables are pending
+            awaitables = [delayed(0.1), delayed(0.2)]
+            iterator = iterate(awaitables)
+            await sleep(0.15)
+            await iterator.remove()
+            test.assertEqual(len(awaitables[1]._listeners), 0)
+            test.assertEqual(await awaitables[1], 0.2)
+
+            # Iterate over finished awaitables
+            await iterate(awaitables)
+        test.run_frame(main, expected_log="""
+            0.1: 0.1
+            0.2: 0.2
+            0.3: 0.3
+            0.4: 0.1
+            0.5: 0.1
+            0.5: 0.2
+            0.5: done
+        """)
+
+    def test_as_completed_across_threads(self):
+        """Test iterating over PFrames that finish before the iterating frame starts listening.
+
+        Expected behaviour:
+        The iterating frame is woken up for every finished PFrame, even if the
+        PFrame finished on another thread while the iterating frame was
+        suspending.
+        """
+
+        test = self
+        main_thread = threading.get_ident()
+        awaitable_await = Awaitable.__await__
+        def slow_await(self):
+            if threading.get_ident() == main_thread:
+                time.sleep(0.01) # Give parallel frames time to finish before the awaiting frame starts listening
+            return (yield from awaitable_await(self))
+        @PFrame
+        async def identity(i):
+            return i
+        @Frame
+        async def iterate():
+            for _ in range(500):
+                results = [result async for _, result in as_completed(*[identity(i) for i in range(4)])]
+                test.assertEqual(sorted(results), list(range(4)))
+        @Frame
+        async def main():
+            iteration = iterate()
+            test.assertEqual((await any_(iteration, sleep(5)))[0], iteration)
+        Awaitable.__await__ = slow_await
+        try:
+            test.loop.run(main, num_threads=NUM_THREADS)
+        finally:
+            Awaitable.__await__ = awaitable_await
+
+    def test_custom_event_step(self):
+        test = self
+        class EvenEvent(Event):
+            def _step(self, sender, msg):
+                if msg % 2 == 0:
+                    super()._step(sender, msg)
+        @Frame
+        async def main():
+            e = EvenEvent('even event')
+            a = any_(e, sleep(0.1))
+            all_e = all_(e)
+            e.send(1)
+            test.assertEqual(bool(a), False)
+            e.send(2)
+            test.assertEqual(await a, (e, 2))
+            test.assertEqual(await all_e, [2])
+        test.run_frame(main)
+
+    def test_max_concurrency(self):
+        test = self
+        @PFrame(max_concurrency=2)
+        async def limited(i):
+            test.log.debug("start {}".format(i))
+            await sleep(0.1)
+            return i
+        limit = ConcurrencyLimit(1)
+        @Frame(max_concurrency=limit)
+        async def shared_a():
+            test.log.debug("start a")
+            await sleep(0.1)
+        @Frame(max_concurrency=limit)
+        async def shared_b():
+            test.log.debug("start b")
+        @Frame
+        async def main():
+            frames = [limited(i) for i in range(5)]
+            test.assertEqual((limited.limit.running, limited.limit.pending), (2, 3))
+            frames[3].remove() # Remove a pending frame
+            test.assertEqual(await all_(*frames), [0, 1, 2, None, 4])
+            test.assertEqual((limited.limit.running, limited.limit.pending), (0, 0))
+
+            await all_(shared_a(), shared_b())
+            test.assertEqual((limit.running, limit.pending), (0, 0))
+        test.run_frame(main, expected_log="""
+            0.0: start 0
+            0.0: start 1
+            0.1: start 2
+            0.1: start 4
+            0.2: start a
+            0.3: start b
+            0.3: done
+        """)
+
+    def test_cache(self):
+        test = self
+        cache = LRU(maxsize=2, ttl=0.5)
+        @PFrame(cache=cache, key=lambda name, delay: name)
+        async def load(name, delay):
+            test.log.debug("load %s", name)
+            await sleep(delay)
+            if name == 'error':
+                raise MyException()
+            return name.upper()
+        @Frame
+        async def main(self):
+            self.exception_handler = lambda frame, err: test.log.debug("Frame exception caught: %s", repr(err))
+
+            # Concurrent calls share one frame and later calls are served from the cache
+            test.assertEqual(await all_(load('a', 0.1), load('a', 0)), ['A', 'A'])
+            test.assertEqual(await load('a', 0.1), 'A')
+
+            # Removing one waiter doesn't remove the shared frame
+            b1, b2 = load('b', 0.1), load('b', 0.1)
+            await b1.remove()
+            test.assertEqual(await b2, 'B')
+
+            # Removing the last waiter removes the shared frame
+            c = load('c', 0.2)
+            await sleep(0.1)
+            await c.remove()
+            test.assertEqual(await load('c', 0.1), 'C')
+
+            # Exceptions reach the exception handlers of the caller and are not cached
+            test.assertIsInstance(await load('error', 0), MyException)
+            test.assertIsInstance(await load('error', 0), MyException)
+
+            # The least recently used result is evicted ('a') and results expire after ttl seconds ('b' and 'c')
+            test.assertEqual(len(cache), 2)
+            test.assertEqual(await load('a', 0), 'A')
+            await sleep(0.6)
+            test.assertEqual(await load('c', 0), 'C')
+        test.run_frame(main, expected_log="""
+            0.0: load a
+            0.1: load b
+            0.2: load c
+            0.3: load c
+            0.4: load error
+            0.4: Frame exception caught: MyException()
+            0.4: load error
+            0.4: Frame exception caught: MyException()
+            0.4: load a
+            1.0: load c
+            1.0: done
+        """)
+
+    def test_channel(self):
+        test = self
+        @Frame
+        async def producer(channel):
+            for i in range(4):
+                await channel.put(i)
+                test.log.debug("put {}".format(i))
+            await channel.put_batch([4, 5])
+            channel.close()
+        @Frame
+        async def consumer(channel):
+            await sleep(0.1)
+            test.assertEqual(await channel.get(), 0)
+            await sleep(0.1)
+            test.assertEqual(await channel.get_batch(), [1, 2])
+            test.assertEqual([item async for item in channel], [3, 4, 5])
+            with test.assertRaises(ChannelClosedException):
+                await channel.put(6)
+        @Frame
+        async def getter(channel):
+            return await channel.get()
+        @Frame
+        async def main():
+            channel = Channel(2)
+            await all_(producer(channel), consumer(channel))
+
+            # Remove consumers waiting in get() without losing items
+            channel = Channel(2)
+            first, second, third = getter(channel), getter(channel), getter(channel)
+            await all_(first.ready, second.ready, third.ready)
+            await third.remove() # Remove a consumer that is still waiting in line
+            test.assertEqual(len(channel._getters), 2)
+            await channel.put(0) # Wake up the first consumer
+            first.remove() # Remove the woken consumer before it resumes
+            test.assertEqual(await any_(second, sleep(1)), (second, 0)) # The wakeup was handed to the second consumer
+            test.assertEqual(len(channel._getters), 0)
+            await channel.put_batch(range(2))
+            channel.close()
+            test.assertEqual(await channel.get_batch(), [0, 1])
+            with test.assertRaises(ChannelClosedException):
+                await channel.get()
+        test.run_frame(main, expected_log="""
+            0.0: put 0
+            0.0: put 1
+            0.1: put 2
+            0.2: put 3
+            0.2: done
+        """)
+
+    def test_channel_across_threads(self):
+        test = self
+        NUM_ITEMS = 1000
+        @PFrame
+        async def producer(channel, offset):
+            for i in range(NUM_ITEMS):
+                await channel.put(offset + i)
+        @PFrame
+        async def consumer(channel):
+            return [item async for item in channel]
+        @Frame
+        async def main():
+            channel = Channel(16)
+            consumers = [consumer(channel) for _ in range(3)]
+            await all_(*[producer(channel, i * NUM_ITEMS) for i in range(4)])
+            channel.close()
+            items = sum(await all_(*consumers), [])
+            test.assertEqual(sorted(items), list(range(4 * NUM_ITEMS)))
+        test.loop.run(main, num_threads=NUM_THREADS)
+
+    def test_rate_limiter(self):
+        test = self
+        limiter = RateLimiter(10, capacity=2)
+        @Frame
+        async def client(i, n):
+            await limiter.acquire(n)
+            test.log.debug("client %d", i)
+        @PFrame
+        async def parallel_client(limiter):
+            await limiter.acquire()
+        @Frame
+        async def main():
+            # Clients are served in order, even if later clients need fewer tokens
+            await all_(client(0, 1), client(1, 1), client(2, 2), client(3, 1))
+            test.assertFalse(limiter.try_acquire())
+
+            # Removing a waiting client hands its place to the next client
+            c4, c5 = client(4, 2), client(5, 1)
+            await sleep(0.1)
+            test.assertEqual(limiter.waiting, 2)
+            await c4.remove()
+            await c5
+
+            with test.assertRaises(ValueError):
+                await limiter.acquire(3)
+
+            # Parallel frames on all eventloops share the limiter
+            parallel_limiter = RateLimiter(100, capacity=1)
+            start = time.monotonic()
+            await any_(all_(*[parallel_client(parallel_limiter) for _ in range(16)]), sleep(1))
+            test.assertGreaterEqual(time.monotonic() - start, 0.14)
+            test.assertLess(time.monotonic() - start, 0.5)
+            test.assertEqual(parallel_limiter.waiting, 0)
+        test.run_frame(main, expected_log="""
+            0.0: client 0
+            0.0: client 1
+            0.2: client 2
+            0.3: client 3
+            0.4: client 5
+            0.5: done
+        """)
+
+    def test_stream(self):
+        test = self
+        produced = []
+        @Frame(buffer=2)
+        async def numbers(count):
+            for i in range(count):
+                produced.append(i)
+                yield i
+        @PFrame(buffer=16)
+        async def parallel_numbers(count):
+            for i in range(count):
+                yield i
+        @Frame
+        async def endless():
+            try:
+                while True:
+                    yield await sleep(0.1)
+            finally:
+                test.log.debug("endless closed")
+        @Frame
+        async def consume(producer):
+            async for _ in producer:
+                pass
+        @Frame
+        async def main():
+            # The producer suspends while the buffer is full
+            producer = numbers(5)
+            await sleep(0.1)
+            test.assertEqual(produced, [0, 1, 2])
+            test.assertEqual([value async for value in producer], [0, 1, 2, 3, 4])
+
+            result = await any_(consume_all(parallel_numbers(1000)), sleep(1))
+            test.assertEqual(result[1], list(range(1000)))
+
+            # Removing the consumer removes the producer
+            producer = endless()
+            consumer = consume(producer)
+            await sleep(0.25)
+            await consumer.remove()
+            test.assertTrue(producer.removed)
+
+            with test.assertRaises(TypeError):
+                async for _ in sleep_frame():
+                    pass
+        @Frame
+        async def consume_all(producer):
+            return [value async for value in producer]
+        @Frame
+        async def sleep_frame():
+            await sleep(0)
+        test.run_frame(main, expected_log="""
+            0.3: endless closed
+            0.3: done
+        """)
+
+    def test_pipeline(self):
+        test = self
+        results = []
+        @PFrame
+        async def parse(line):
+            return int(line)
+        @Frame
+        async def square(self, x):
+            await sleep(0)
+            return x * x
+        @Frame
+        def store(x):
+            results.append(x)
+        @Frame(buffer=4)
+        async def numbers(count):
+            for i in range(count):
+                yield i
+        @Frame
+        async def main():
+            p = pipeline((str(i) for i in range(100)),
+                         Stage(parse, parallelism=4, batch_size=16), Stage(square, buffer=4, batch_size=8), store)
+            test.assertIs(p.stats[0].name, 'parse')
+            _, stats = await any_(p, sleep(5))
+            test.assertEqual(sorted(results), [i * i for i in range(100)])
+            test.assertEqual([stage.processed for stage in stats], [100, 100, 100])
+            test.assertLessEqual(stats[1].max_queued, 4)
+            test.assertTrue(all(str(stage).startswith(stage.name) for stage in stats))
+
+            # Streaming frames can be sources
+            results.clear()
+            await pipeline(numbers(10), store)
+            test.assertEqual(results, list(range(10)))
+
+            with test.assertRaises(ValueError):
+                pipeline([])
+        test.run_frame(main, expected_log="""
+            0.0: done
+        """)
+
+    def test_batcher(self):
+        test = self
+        batcher = Batcher(3, 0.1)
+        @Frame
+        async def consumer(batcher):
+            async for batch in batcher:
+                test.log.debug(batch)
+        @PFrame
+        async def producer(batcher, i):
+            for j in range(25):
+                batcher.post((i, j))
+        @Frame
+        async def collect(batcher):
+            items = []
+            async for batch in batcher:
+                test.assertLessEqual(len(batch), 10)
+                items.extend(batch)
+            return items
+        @Frame
+        async def main():
+            c = consumer(batcher)
+            await c.ready
+
+            # Full batches are released right away, partial batches after max_delay
+            for i in range(7):
+                batcher.post(i)
+            await sleep(0.2)
+            test.assertEqual(len(batcher), 0)
+
+            # A batch that fills up before its delay expires is released right away
+            batcher.post(7)
+            await sleep(0.05)
+            batcher.post(8)
+            batcher.post(9)
+            await sleep(0.1)
+            batcher.post(10)
+            batcher.flush()
+            await sleep(0)
+
+            # Closing the batcher releases the current batch and ends the iteration
+            batcher.post(11)
+            batcher.close()
+            await c
+            test.assertTrue(batcher.closed)
+            with test.assertRaises(ChannelClosedException):
+                batcher.post(12)
+
+            # Items can be posted from all eventloops
+            parallel_batcher = Batcher(10, 0.01)
+            c = collect(parallel_batcher)
+            await all_(*[producer(parallel_batcher, i) for i in range(4)])
+            parallel_batcher.close()
+            _, items = await any_(c, sleep(5))
+            test.assertEqual(sorted(items), [(i, j) for i in range(4) for j in range(25)])
+
+            with test.assertRaises(ValueError):
+                Batcher(0, 1)
+        test.run_frame(main, expected_log="""
+            0.0: [0, 1, 2]
+            0.0: [3, 4, 5]
+            0.1: [6]
+            0.2: [7, 8, 9]
+            0.3: [10]
+            0.3: [11]
+            0.3: done
+        """)
+
+    def test_submit(self):
+        test = self
+        results = {}
+        @PFrame
+        async def square(x):
+            await sleep(0.01)
+            return x * x
+        @Frame
+        async def fail():
+            raise MyException()
+        @Frame(cache=4)
+        async def negate(x):
+            return -x
+        def client():
+            # Frames are submitted from a thread that doesn't run an eventloop
+            results['unfinished'] = test.loop.submit(sleep, 10)
+            futures = [test.loop.submit(square, i) for i in range(100)]
+            results['squares'] = [future.result(5) for future in futures]
+            results['negate'] = test.loop.submit(negate, 3).result(5)
+            results['exception'] = test.loop.submit(fail).exception(5)
+
+            with FrameExecutor(test.loop) as executor:
+                results['map'] = list(executor.map(lambda x: x + 1, range(10), timeout=5))
+                results['factory'] = executor.submit(square, 5).result(5)
+            try:
+                executor.submit(square, 1)
+            except RuntimeError:
+                results['shutdown'] = True
+        @Frame
+        async def main():
+            thread = threading.Thread(target=client)
+            thread.start()
+            start = time.monotonic()
+            while thread.is_alive() and time.monotonic() - start < 5:
+                await sleep(0.01)
+            test.assertFalse(thread.is_alive())
+        with self.assertRaises(InvalidOperationException):
+            self.loop.submit(square, 1)
+        test.run_frame(main)
+        self.assertEqual(results['squares'], [i * i for i in range(100)])
+        self.assertEqual(results['negate'], -3)
+        self.assertIsInstance(results['exception'], MyException) # Exceptions of submitted frames don't stop the eventloop
+        self.assertEqual(results['map'], list(range(1, 11)))
+        self.assertEqual(results['factory'], 25)
+        self.assertTrue(results['shutdown'])
+        self.assertIsInstance(results['unfinished'].exception(0), InvalidOperationException) # Running when the eventloop stopped
+
+    def test_pmap(self):
+        test = self
+        NUM_ITEMS = 1000
+        numchunks = [0]
+        pmap_chunk = asyncframes._pmap_chunk
+        def counting_pmap_chunk(*args):
+            numchunks[0] += 1
+            return pmap_chunk(*args)
+        @Frame
+        async def main():
+            test.assertEqual(await pmap(lambda x: x * x, range(NUM_ITEMS)), [x * x for x in range(NUM_ITEMS)])
+            test.assertLess(numchunks[0], NUM_ITEMS // 10) # Cheap items are mapped in chunks
+
+            numchunks[0] = 0
+            test.assertEqual(await pmap(str, range(10), chunksize=3), [str(x) for x in range(10)])
+            test.assertEqual(numchunks[0], 4)
+
+            test.assertEqual(await pmap(str, []), [])
+            test.assertEqual(sorted([x async for x in pmap_unordered(lambda x: -x, range(NUM_ITEMS))]), sorted(-x for x in range(NUM_ITEMS)))
+            with test.assertRaises(ValueError):
+                await pmap(str, range(10), chunksize=0)
+        asyncframes._pmap_chunk = counting_pmap_chunk
+        try:
+            test.loop.run(main, num_threads=NUM_THREADS)
+        finally:
+            asyncframes._pmap_chunk = pmap_chunk
+
     def test_exceptions(self):
         test = self
         test.maxDiff = None
@@ -659,6 +1380,88 @@ class TestAsyncFrames(unittest.TestCase):
             0.0: Reraised MyException() of frame raise_immediately
         """)
 
+    def test_all_fail_fast(self):
+        test = self
+        @PFrame
+        async def failing(delay):
+            await sleep(delay)
+            raise MyException()
+        @PFrame
+        async def working(i):
+            await sleep(0.3)
+            test.log.debug("worker %d done", i)
+            return i
+        @Frame
+        async def main(self):
+            self.exception_handler = lambda frame, err: test.log.debug("Frame exception caught: %s", repr(err))
+
+            # Without fail_fast, all_ waits for all awaitables
+            results = await all_(failing(0.1), working(1))
+            test.assertEqual((type(results[0]), results[1]), (MyException, 1))
+
+            # With fail_fast, the first exception removes the remaining frames
+            workers = [working(i) for i in range(2, 4)]
+            try:
+                await all_(failing(0.1), *workers, fail_fast=True)
+            except MyException:
+                test.log.debug("all_ failed")
+            await sleep(0.3)
+            test.assertTrue(all(worker.removed for worker in workers)) # Removing parallel frames can be deferred
+
+            # Frames that failed before awaiting all_ end waiting immediately
+            f = failing(0)
+            test.assertIsInstance(await f, MyException)
+            worker = working(4)
+            with test.assertRaises(MyException):
+                await all_(worker, f, fail_fast=True)
+            await sleep(0.1)
+            test.assertTrue(worker.removed)
+        test.run_frame(main, expected_log="""
+            0.1: Frame exception caught: MyException()
+            0.3: worker 1 done
+            0.4: Frame exception caught: MyException()
+            0.4: all_ failed
+            0.7: Frame exception caught: MyException()
+            0.8: done
+        """)
+
+    def test_race(self):
+        test = self
+        @PFrame
+        async def replica(i, delay):
+            await sleep(delay)
+            test.log.debug("replica %d done", i)
+            return i
+        @Frame
+        async def main():
+            slow, fast = replica(0, 0.3), replica(1, 0.1)
+            test.assertEqual(await race(slow, fast), (fast, 1))
+            test.assertTrue(slow.removed)
+
+            event = Event('event')
+            test.assertEqual((await race(event, replica(2, 0.1)))[1], 2)
+            test.assertFalse(event._listeners)
+
+            replicas = [replica(i, 0.1 * (i - 2)) for i in range(3, 6)]
+            test.assertEqual(await first_n(2, *replicas), [(replicas[0], 3), (replicas[1], 4)])
+            test.assertTrue(replicas[2].removed)
+
+            # Awaitables that finished before racing win immediately
+            loser = replica(6, 0.1)
+            test.assertEqual(await race(loser, replicas[0]), (replicas[0], 3))
+
+            with test.assertRaises(ValueError):
+                first_n(3, replicas[0], replicas[0], replicas[1])
+            await sleep(0.3) # Removed replicas never finish
+            test.assertTrue(loser.removed) # The loser may still have been starting on another thread when it was removed
+        test.run_frame(main, expected_log="""
+            0.1: replica 1 done
+            0.2: replica 2 done
+            0.3: replica 3 done
+            0.4: replica 4 done
+            0.7: done
+        """)
+
     def test_animate(self):
         test = self
         @Frame
@@ -674,6 +1477,151 @@ class TestAsyncFrames(unittest.TestCase):
             0.2: done
         """)
 
+    def test_event_router(self):
+        test = self
+        @PFrame
+        async def waiter(router, key):
+            result = await router[key]
+            test.log.debug("{} {}".format(key, result))
+            return result
+        @PFrame
+        async def poster(router):
+            router.post('b', 2) # Post from a worker eventloop
+            router.post('x', 0) # Events for keys without waiting frames are dropped
+        @Frame
+        async def main():
+            router = EventRouter('router')
+            waiters = [waiter(router, key) for key in ('a', 'b', 'b', 'c')]
+            await all_(*[w.ready for w in waiters])
+            test.assertEqual(len(router), 3)
+            await poster(router)
+            test.assertEqual(await all_(waiters[1], waiters[2]), [2, 2])
+            test.assertFalse(waiters[0].removed or waiters[3].removed) # Only frames waiting for the posted key wake up
+            router.post('a', 1)
+            test.assertEqual(await waiters[0], 1)
+            test.assertEqual(len(router), 1)
+
+            # Removing a waiting frame unregisters its key
+            waiters[3].remove()
+            test.assertEqual(len(router), 0)
+
+            # Awaitables listen from the moment they're created
+            response = router['d']
+            router.post('d', 4)
+            await sleep(0.1)
+            test.assertEqual(await response, 4)
+        test.run_frame(main, expected_log="""
+            0.0: b 2
+            0.0: b 2
+            0.0: a 1
+            0.1: done
+        """)
+
+    def test_where(self):
+        test = self
+        class CountingFrame(Frame):
+            num_steps = 0
+            def _step(self, sender, msg):
+                CountingFrame.num_steps += 1
+                super()._step(sender, msg)
+        @CountingFrame
+        async def waiter(e):
+            value = await e.where(lambda value: value == 3)
+            test.log.debug(value)
+        @PFrame
+        async def pwaiter(e):
+            def slow_match(value):
+                if value == 'slow':
+                    time.sleep(0.05)
+                return value == 'match'
+            return await e.where(slow_match)
+        @Frame
+        async def main():
+            e = Event('e')
+            w = waiter(e)
+            await w.ready
+            num_steps = CountingFrame.num_steps
+            for value in range(6):
+                e.send(value)
+            test.assertEqual(CountingFrame.num_steps - num_steps, 1) # Non-matching events don't resume the frame
+            test.assertFalse(e._listeners or e._filters) # The filter stops listening after a match
+
+            # Removing the awaiting frame stops the filter
+            w = waiter(e)
+            await w.ready
+            w.remove()
+            test.assertFalse(e._listeners or e._filters)
+
+            # Filters don't miss events while they process another event on another eventloop
+            w = pwaiter(e)
+            await w.ready
+            e.post('slow')
+            e.post('match')
+            test.assertEqual(await any_(w, sleep(1)), (w, 'match'))
+        test.run_frame(main, expected_log="""
+            0.0: 3
+            0.0: done
+        """)
+
+    def test_shared_animation_driver(self):
+        test = self
+        ticks = {'a': [], 'b': []}
+        @Frame
+        async def main():
+            a = animate(0.35, lambda f: ticks['a'].append(time.monotonic()), 0.1)
+            await sleep(0.03) # Start b well before half an interval, so that timer jitter doesn't add a tick to b
+            b = animate(0.35, lambda f: ticks['b'].append(time.monotonic()), 0.1)
+            await all_(a, b)
+        test.loop.run(main, num_threads=NUM_THREADS)
+
+        # Animations with the same interval are ticked together, regardless of when they started
+        test.assertEqual((len(ticks['a']), len(ticks['b'])), (4, 4))
+        for tick_a, tick_b in zip(ticks['a'][:2], ticks['b'][:2]):
+            test.assertAlmostEqual(tick_a, tick_b, delta=0.01)
+        test.assertFalse(test.loop._animation_drivers[0.1].animations) # Finished animations are dropped
+
+    def test_failing_animation(self):
+        test = self
+        def fail(f):
+            raise MyException()
+        @Frame
+        async def main(self):
+            self.exception_handler = lambda frame, err: test.log.debug("Frame exception caught: %s", repr(err))
+            a = animate(0.35, fail, 0.1)
+            b = animate(0.35, lambda f: None, 0.1)
+            # A failing callback finishes its animation with the exception, without stopping the shared driver
+            results = await any_(all_(a, b), sleep(1))
+            test.assertIsInstance(results[1][0], MyException)
+        test.run_frame(main, expected_log="""
+            0.1: Frame exception caught: MyException()
+            0.3: done
+        """)
+
+    def test_every(self):
+        test = self
+        @Frame
+        async def ticker(ticks):
+            async for missed in ticks:
+                test.log.debug(missed)
+                time.sleep(0.02) # Slow listeners don't delay later ticks
+                if ticks._delivered_tick == 1:
+                    # A late listener receives the latest expired tick immediately and learns how many ticks it missed
+                    await sleep(0.23)
+        @Frame
+        async def main():
+            ticks = every(0.1)
+            t = ticker(ticks)
+            await sleep(0.45)
+            ticks.remove()
+            await t
+            test.assertFalse(ticks._timers) # Removing the event cancels its timer
+        test.run_frame(main, expected_log="""
+            0.1: 0
+            0.3: 1
+            0.4: 0
+            0.4: done
+        """)
+
     def test_unfinished_await(self):
         test = self
         @MyFrame
@@ -1029,6 +1977,86 @@ class TestAsyncFrames(unittest.TestCase):
             0.1: done
         """)
 
+    def test_send_chain(self):
+        """Test sending an event through a long chain of awaiting frames.
+
+        Expected behaviour:
+        Blocking events are processed iteratively, so the length of the chain
+        is not limited by the recursion limit. send() only returns once all
+        frames of the chain have been woken.
+        """
+
+        test = self
+        @Frame
+        async def link(awaitable):
+            return await awaitable
+        @Frame
+        async def main():
+            e = Event('my_event')
+            chain = e
+            for _ in range(5 * sys.getrecursionlimit()):
+                chain = link(chain)
+            await chain.ready
+            e.send('my event args')
+            test.assertEqual(chain.removed, True)
+            test.assertEqual(await chain, 'my event args')
+        test.run_frame(main)
+
+    def test_post_chain(self):
+        """Test posting an event through a chain of awaiting frames that is deeper than AbstractEventLoop.max_inline_depth.
+
+        Expected behaviour:
+        Awaiting frames on the same eventloop are resumed inline until
+        max_inline_depth is reached. Deeper frames are enqueued.
+        """
+
+        test = self
+        inline_depths = []
+        @Frame
+        async def link(awaitable):
+            result = await awaitable
+            inline_depths.append(_THREAD_LOCALS._inline_depth)
+            return result
+        @Frame
+        async def main():
+            e = Event('my_event')
+            chain = e
+            for _ in range(4 * AbstractEventLoop.max_inline_depth):
+                chain = link(chain)
+            await chain.ready
+            e.post('my event args')
+            test.assertEqual(await chain, 'my event args')
+        test.run_frame(main)
+        test.assertEqual(len(inline_depths), 4 * AbstractEventLoop.max_inline_depth)
+        test.assertEqual(max(inline_depths), AbstractEventLoop.max_inline_depth)
+
+    def test_inline_wakeup_after_removal(self):
+        """Test resuming a frame inline when an awaited frame finishes.
+
+        Expected behaviour:
+        The awaiting frame is only resumed once the finished frame has been completely removed.
+        """
+
+        test = self
+        disposed = []
+        class DisposingFrame(Frame):
+            def _ondispose(self):
+                disposed.append(self)
+        @DisposingFrame
+        async def child():
+            await sleep()
+        @Frame
+        async def main(self):
+            for _ in range(2):
+                c = child()
+                await c
+                test.assertGreater(_THREAD_LOCALS._inline_depth, 0)
+                test.assertEqual(disposed, [c])
+                test.assertFalse(c._remove_lock.locked())
+                test.assertNotIn(c, self._children)
+                disposed.clear()
+        test.run_frame(main)
+
     def test_send_across_threads(self):
         test = self
         @Frame(thread_idx=2)
@@ -1052,6 +2080,43 @@ class TestAsyncFrames(unittest.TestCase):
             0.0: done
         """)
 
+    def test_broadcast_across_threads(self):
+        test = self
+        num_listeners = 10 * NUM_THREADS
+        broadcasting = threading.local()
+        invoked_callbacks = []
+        eventloop_class = test.loop.__class__
+        invoke = eventloop_class._invoke
+        def counting_invoke(self, delay, callback, args):
+            if getattr(broadcasting, 'active', False):
+                invoked_callbacks.append(callback) # Record callbacks invoked while broadcasting
+            invoke(self, delay, callback, args)
+        async def listener(e):
+            await e
+            return get_current_eventloop_index()
+        listener_factories = [Frame(thread_idx=i)(listener) for i in range(NUM_THREADS)]
+        @Frame
+        async def main():
+            for blocking in (True, False):
+                e = Event('e')
+                listeners = [listener_factories[i % NUM_THREADS](e) for i in range(num_listeners)]
+                await all_(*[l.ready for l in listeners])
+                broadcasting.active = True
+                try:
+                    AbstractEventLoop.sendevent(e, None, None, blocking)
+                finally:
+                    broadcasting.active = False
+                test.assertEqual(await all_(*listeners), [i % NUM_THREADS for i in range(num_listeners)])
+
+                # Listeners of other threads are woken with one invoke per eventloop
+                test.assertEqual(len(invoked_callbacks), NUM_THREADS - 1)
+                invoked_callbacks.clear()
+        eventloop_class._invoke = counting_invoke
+        try:
+            test.loop.run(main, num_threads=NUM_THREADS)
+        finally:
+            eventloop_class._invoke = invoke
+
     def test_ready_across_threads(self):
         test = self
         @Frame(thread_idx=2)
@@ -1147,6 +2212,66 @@ class TestAsyncFrames(unittest.TestCase):
             0.1: done
         """)
 
+    def test_remove_running_pframes(self):
+        """Test removing PFrames while their coroutines are running on a loaded pool of worker threads.
+
+        Expected behaviour:
+        The eventloop running a PFrame's coroutine closes the coroutine and
+        finishes removal once the current step returns. Removal doesn't poll
+        that eventloop with posts or invokes of any kind.
+        """
+
+        test = self
+        num_threads = 16
+        num_frames = 4 * num_threads
+        removal = threading.local()
+        removal_callbacks = []
+        closed = []
+        eventloop_class = test.loop.__class__
+        post, invoke = eventloop_class._post, eventloop_class._invoke
+        remove_stage2, finish_removal = Frame._remove_stage2, Frame._finish_removal
+        def counting_post(self, delay, callback, args):
+            if getattr(removal, 'depth', 0):
+                removal_callbacks.append(callback) # Record callbacks posted by frame removal
+            post(self, delay, callback, args)
+        def counting_invoke(self, delay, callback, args):
+            if getattr(removal, 'depth', 0):
+                removal_callbacks.append(callback) # Record callbacks invoked by frame removal
+            invoke(self, delay, callback, args)
+        def tracking(method):
+            def tracked(self, *args, **kwargs):
+                removal.depth = getattr(removal, 'depth', 0) + 1
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    removal.depth -= 1
+            return tracked
+        @PFrame
+        async def worker(self):
+            try:
+                while True:
+                    time.sleep(0.01)
+                    await sleep(0) # Resume on any worker thread
+            finally:
+                closed.append(self)
+        @Frame
+        async def main():
+            workers = [worker() for _ in range(num_frames)]
+            await sleep(0.1)
+            test.assertEqual(await all_(*[w.remove() for w in workers]), [True] * num_frames)
+            test.assertEqual(all(w.removed for w in workers), True)
+            test.assertEqual(all(w._generator is None for w in workers), True)
+            test.assertEqual(sorted(closed, key=id), sorted(workers, key=id)) # Each coroutine was closed exactly once
+        eventloop_class._post, eventloop_class._invoke = counting_post, counting_invoke
+        Frame._remove_stage2, Frame._finish_removal = tracking(remove_stage2), tracking(finish_removal)
+        try:
+            test.loop.run(main, num_threads=num_threads)
+        finally:
+            eventloop_class._post, eventloop_class._invoke = post, invoke
+            Frame._remove_stage2, Frame._finish_removal = remove_stage2, finish_removal
+        # Removal may only wake up main() once all workers have been removed
+        test.assertLessEqual(len(removal_callbacks), 1)
+
     def test_inline_frame(self):
         test = self
         @Frame
@@ -1199,6 +2324,50 @@ class TestAsyncFrames(unittest.TestCase):
             0.0: done
         """)
 
+    def test_find_parent(self):
+        test = self
+        class Window(Frame): pass
+        class Container(Frame): pass
+        class Box(Container): pass
+
+        @Window
+        async def window():
+            w = find_parent(Window)
+            test.assertIsNone(find_parent(Container))
+            with Container as c1:
+                test.assertIs(find_parent(Container), c1)
+                with Box as b1:
+                    test.assertIs(find_parent(Container), b1)
+                    test.assertIs(find_parent(Box), b1)
+                    test.assertIs(find_parent(Window), w)
+                    await sleep(0)
+                    test.assertIs(Primitive(Container)._owner, b1)
+                test.assertIs(find_parent(Container), c1)
+                test.assertIsNone(find_parent(Box))
+            # Answers memorized while inline frames were active must not leak into the enclosing frame or new inline frames
+            test.assertIsNone(find_parent(Container))
+            with Box as b2:
+                test.assertIs(find_parent(Container), b2)
+                test.assertIs(Primitive(Window)._owner, w)
+            test.assertIsNone(find_parent(Box))
+
+            # A lookup memorizes the answer in every frame it passed
+            with contextlib.ExitStack() as stack:
+                for _ in range(200):
+                    innermost = stack.enter_context(Container)
+                test.assertIs(find_parent(Window), w)
+                test.assertIs(find_parent(Container), innermost)
+                test.assertIs(innermost._parent._ancestors[Window], w)
+            test.log.debug("window done")
+
+        @Frame
+        async def main():
+            await window()
+        test.run_frame(main, expected_log="""
+            0.0: window done
+            0.0: done
+        """)
+
     @unittest.skip("Parallel testing tends to fail randomly due to unstable timing")
     def test_thread_independence(self):
         test = self